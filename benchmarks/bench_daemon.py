@@ -0,0 +1,132 @@
+"""
+授权守护进程的压测：逐级提高并发，报告每级的 requests/sec 与 p50 / p99 延迟。
+
+默认在本进程里起一个 AuthDaemon（Unix socket）；--socket / --port 指向已运行的守护进程时只做客户端。
+每个并发单位是一条连接上的闭环客户端（发一个请求、等响应、再发下一个），
+请求在若干需求节点、若干 (capability, scope) 之间轮转，包含 GRANT 和 DENY。
+
+运行：
+  python -m benchmarks.bench_daemon --concurrency 1 4 16 64 --requests 2000
+  python -m benchmarks.bench_daemon --batch 8        # 走 authorize_many，每次 8 个请求
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.safe_boundary.daemon import AuthClient, AuthDaemon, AuthEngine
+
+_REQUESTS: List[Tuple[str, str]] = [
+    ("exec:test", "repo_sim/tests/**"),
+    ("read:repo", "repo_sim/src/auth/login.py"),
+    ("write:src", "repo_sim/src/auth/login.py"),
+    ("write:src", "repo_sim/src/utils/crypto.py"),
+    ("network:egress", "pip install somepkg"),
+]
+
+
+def _percentile(xs: List[float], q: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q / 100.0 * len(xs)))]
+
+
+async def _setup(client: AuthClient, nodes: int) -> List[str]:
+    rids = []
+    for i in range(nodes):
+        rid = f"bench-{i}"
+        await client.call("instruction", rid=rid, goal="fix_failing_test", constraints=["no-network"], anchors={})
+        await client.call("run_tests", rid=rid, ok=False, stdout="FAILED tests/test_auth.py::test_login")
+        rids.append(rid)
+    return rids
+
+
+async def _worker(client: AuthClient, rids: List[str], n: int, offset: int, batch: int, lat: List[float]) -> None:
+    for k in range(n):
+        rid = rids[(offset + k) % len(rids)]
+        t0 = time.perf_counter()
+        if batch > 1:
+            reqs = [_REQUESTS[(offset + k + j) % len(_REQUESTS)] for j in range(batch)]
+            await client.authorize_many(rid, reqs)
+        else:
+            cap, scope = _REQUESTS[(offset + k) % len(_REQUESTS)]
+            await client.authorize(rid, cap, scope)
+        lat.append(time.perf_counter() - t0)
+
+
+async def _level(conn: Dict[str, Any], rids: List[str], concurrency: int, total: int, batch: int) -> Dict[str, Any]:
+    clients = [await AuthClient.connect(**conn) for _ in range(concurrency)]
+    per = max(1, total // concurrency)
+    lat: List[float] = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_worker(c, rids, per, i * 7, batch, lat) for i, c in enumerate(clients)))
+    elapsed = time.perf_counter() - t0
+    for c in clients:
+        await c.close()
+    decisions = len(lat) * batch
+    return {
+        "concurrency": concurrency,
+        "calls": len(lat),
+        "decisions": decisions,
+        "calls_per_sec": round(len(lat) / elapsed, 1),
+        "decisions_per_sec": round(decisions / elapsed, 1),
+        "latency_ms": {
+            "p50": round(_percentile(lat, 50) * 1000, 3),
+            "p99": round(_percentile(lat, 99) * 1000, 3),
+            "mean": round(statistics.fmean(lat) * 1000, 3),
+        },
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    daemon: Optional[AuthDaemon] = None
+    tmpdir: Optional[str] = None
+    if args.port is not None:
+        conn: Dict[str, Any] = {"host": args.host, "port": args.port}
+    elif args.socket is not None:
+        conn = {"path": args.socket}
+    else:
+        tmpdir = tempfile.mkdtemp(prefix="sb_daemon_")
+        path = os.path.join(tmpdir, "daemon.sock")
+        daemon = AuthDaemon(AuthEngine(), workers=args.workers)
+        await daemon.start(path=path)
+        conn = {"path": path}
+
+    try:
+        setup = await AuthClient.connect(**conn)
+        rids = await _setup(setup, args.nodes)
+        levels = [await _level(conn, rids, c, args.requests, args.batch) for c in args.concurrency]
+        stats = await setup.call("stats")
+        await setup.close()
+        return {"params": {k: v for k, v in vars(args).items()}, "levels": levels, "daemon": stats}
+    finally:
+        if daemon is not None:
+            await daemon.close()
+        if tmpdir is not None:
+            for fn in os.listdir(tmpdir):
+                os.remove(os.path.join(tmpdir, fn))
+            os.rmdir(tmpdir)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    ap.add_argument("--requests", type=int, default=4000, help="calls per concurrency level")
+    ap.add_argument("--nodes", type=int, default=16, help="requirement nodes shared by all clients")
+    ap.add_argument("--batch", type=int, default=1, help=">1: use authorize_many with this many requests per call")
+    ap.add_argument("--workers", type=int, default=1, help="executor threads of the in-process daemon")
+    ap.add_argument("--socket", help="connect to a running daemon on this unix socket")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, help="connect to a running daemon on host:port")
+    args = ap.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+safe_boundary 流水线的规模化基准：在 1k / 10k / 100k 模块的合成仓库上测
+  - graph_build：DepGraphStore 冷构建
+  - expand_scope：depth_limit 受限的 anchors 扩展
+  - compute_boundary：compute_safe_boundary（不走缓存）
+  - authorize：单请求授权（边界缓存命中后的稳态）
+每项报告耗时与 tracemalloc 峰值内存；结果以 JSON 输出，便于不同版本之间对比。
+
+运行：
+  python -m benchmarks.bench_scaling --sizes 1000 10000 --out bench_scaling.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from benchmarks.synth_repo import generate
+from src.safe_boundary.authorize import authorize
+from src.safe_boundary.boundary import boundary_cache, compute_safe_boundary
+from src.safe_boundary.depgraph import DepGraphStore
+from src.safe_boundary.models import Evidence, OrgPolicy, Request, RequirementNode
+from src.safe_boundary.scope_expand import dep_graph_handle, expand_scope
+from src.safe_boundary.templates import t_max
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    xs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        xs.append(time.perf_counter() - t0)
+    return {"mean_s": statistics.fmean(xs), "min_s": min(xs), "max_s": max(xs), "runs": repeat}
+
+
+def _peak_mem(fn: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _measure(fn: Callable[[], Any], repeat: int, memory: bool) -> Dict[str, Any]:
+    # 计时与内存分两次跑：tracemalloc 本身会明显拖慢计时
+    out: Dict[str, Any] = _timed(fn, repeat)
+    if memory:
+        out["peak_bytes"] = _peak_mem(fn)
+    return out
+
+
+def bench_size(n_modules: int, args: argparse.Namespace) -> Dict[str, Any]:
+    tmp = tempfile.mkdtemp(prefix="sb_scale_")
+    try:
+        t0 = time.perf_counter()
+        repo = generate(
+            tmp, n_modules, fanout=args.fanout, depth=args.depth, modules_per_pkg=args.modules_per_pkg,
+            hot_fraction=args.hot_fraction, hot_share=args.hot_share, test_ratio=args.test_ratio, seed=args.seed,
+        )
+        gen_s = time.perf_counter() - t0
+        res: Dict[str, Any] = {"files": repo.files, "modules": len(repo.modules), "tests": len(repo.tests),
+                               "generate_s": gen_s}
+
+        def build() -> DepGraphStore:
+            s = DepGraphStore(tmp, prefix="repo_sim", workers=args.workers)
+            s.build()
+            return s
+
+        res["graph_build"] = _measure(build, 1, args.memory)
+
+        store = build()
+        old = dep_graph_handle().swap(store)
+        try:
+            rng = random.Random(args.seed)
+            org = OrgPolicy()
+            anchors_list = [{"path": rng.choice(repo.modules)} for _ in range(args.samples)]
+            it = iter(range(10 ** 9))
+
+            def expand() -> None:
+                expand_scope(anchors_list[next(it) % len(anchors_list)], org=org, depth_limit=2)
+
+            res["expand_scope"] = _measure(expand, args.samples, args.memory)
+
+            nodes = []
+            for i, a in enumerate(anchors_list):
+                n = RequirementNode(rid=f"r{i}", goal="fix_failing_test", anchors=dict(a), constraints={"no-network"})
+                n.add_evidence(Evidence(kind="test_fail", payload={"raw": "FAILED"}))
+                nodes.append(n)
+
+            def boundary() -> None:
+                compute_safe_boundary(nodes[next(it) % len(nodes)], org)
+
+            res["compute_boundary"] = _measure(boundary, args.samples, args.memory)
+
+            node = nodes[0]
+            target_dir = node.anchors["path"].rsplit("/", 1)[0]
+            reqs = [
+                Request("write:src", f"repo_sim/{target_dir}/mod_x.py"),
+                Request("write:src", f"repo_sim/{rng.choice(repo.modules)}"),
+                Request("exec:test", "repo_sim/tests/**"),
+                Request("network:egress", "pip install x"),
+            ]
+            boundary_cache().clear()
+            authorize(reqs[0], node, org)  # 预热缓存
+
+            def auth() -> None:
+                authorize(reqs[next(it) % len(reqs)], node, org)
+
+            res["authorize"] = _measure(auth, args.requests, args.memory)
+            res["boundary_cache"] = boundary_cache().stats()
+        finally:
+            if old is not None:
+                dep_graph_handle().swap(old)
+            else:
+                dep_graph_handle().discard()
+        return res
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--fanout", type=int, default=4)
+    ap.add_argument("--depth", type=int, default=2)
+    ap.add_argument("--modules-per-pkg", type=int, default=50)
+    ap.add_argument("--hot-fraction", type=float, default=0.01)
+    ap.add_argument("--hot-share", type=float, default=0.3)
+    ap.add_argument("--test-ratio", type=float, default=0.2)
+    ap.add_argument("--samples", type=int, default=50, help="anchors sampled for expand/boundary")
+    ap.add_argument("--requests", type=int, default=2000, help="authorize calls per size")
+    ap.add_argument("--workers", type=int, default=1, help="graph build workers (1 = serial)")
+    ap.add_argument("--no-memory", dest="memory", action="store_false")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write JSON results to this file")
+    args = ap.parse_args(argv)
+
+    # T_max 先在基准之外求一次（冷求解不计入边界计算耗时）
+    t_max("fix_failing_test")
+
+    results = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ts": time.time(),
+            "params": {k: v for k, v in vars(args).items() if k != "out"},
+        },
+        "sizes": {},
+    }
+    for n in args.sizes:
+        print(f"[bench] size={n} ...", file=sys.stderr)
+        results["sizes"][str(n)] = bench_size(n, args)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+测试影响分析：只跑受影响测试（分片并行） vs 全量串行
+
+合成仓库里挑几个模块当作“改动文件”（冷门模块 / 热点模块），
+用 testrunner.run_impacted_tests 只跑反向依赖闭包里的测试，并实测一次全量单进程运行对比。
+
+运行：
+  python -m benchmarks.bench_test_impact --modules 300 --test-ratio 0.5 --shards 4 --test-sleep 0.02
+"""
+from __future__ import annotations
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchmarks.synth_repo import generate
+from src.demo_agent.testrunner import run_impacted_tests
+from src.safe_boundary.depgraph import DepGraphStore
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modules", type=int, default=300)
+    ap.add_argument("--fanout", type=int, default=3)
+    ap.add_argument("--test-ratio", type=float, default=0.5)
+    ap.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--test-sleep", type=float, default=0.02, help="extra seconds per test (simulated work)")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="sb_bench_")
+    try:
+        repo = generate(tmp, args.modules, fanout=args.fanout, modules_per_pkg=50,
+                        hot_fraction=0.05, hot_share=0.3, test_ratio=args.test_ratio)
+        if args.test_sleep > 0:
+            for t in repo.tests:
+                with open(os.path.join(tmp, t), "a", encoding="utf-8") as f:
+                    f.write(f"    import time\n    time.sleep({args.test_sleep})\n")
+        store = DepGraphStore(tmp, prefix="repo", workers=1)
+        store.build()
+        durations = os.path.join(tmp, ".cache", "test_durations.json")
+        print(f"[bench] synthetic repo: {repo.files} files, {len(repo.tests)} tests  shards={args.shards}")
+
+        # 只挑有对应测试的模块（test_mod_<i>.py <-> mod_<i>.py）
+        tested = [m for m in repo.modules if f"tests/test_{os.path.basename(m)}" in repo.tests]
+        cases = [
+            ("leaf module", tested[-1]),
+            ("mid module", tested[len(tested) // 2]),
+            ("hot module", tested[0]),
+        ]
+        for label, changed in cases:
+            rep = run_impacted_tests([changed], store=store, shards=args.shards,
+                                     measure_full=True, durations_path=durations)
+            sel = rep.selection
+            print(f"[bench] {label:12s}: {len(sel.selected):4d}/{len(sel.all_tests)} tests  "
+                  f"impacted={rep.elapsed_s:.2f}s  full={rep.full_suite_s or 0.0:.2f}s  "
+                  f"saved={rep.time_saved_s or 0.0:.2f}s  ok={rep.ok}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
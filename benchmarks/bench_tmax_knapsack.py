@@ -0,0 +1,91 @@
+"""
+T_max 求解器：回溯选择表版 vs 旧版（每个 dp 格子存完整 chosen_caps 列表）
+
+同时校验两者在随机能力表上的结果完全一致（包括同分时的取舍）。
+
+运行：
+  python -m benchmarks.bench_tmax_knapsack --caps 10 200 1000 --budget 500
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+from typing import Dict, List, Set, Tuple
+
+from src.safe_boundary.template_search import CapAttr, solve_tmax_knapsack
+
+
+def legacy_solve(goal: str, C: List[str], attrs_by_goal: Dict[str, Dict[str, CapAttr]],
+                 risk_budget_by_goal: Dict[str, int], hard_ban: Set[str]) -> List[str]:
+    """旧实现（去掉日志）：dp[b] = (count, utility_sum, chosen_caps)"""
+    budget = risk_budget_by_goal.get(goal, 3)
+    attrs = attrs_by_goal.get(goal, {})
+    items: List[Tuple[str, int, int]] = []
+    for cap in C:
+        if cap in hard_ban:
+            continue
+        a = attrs.get(cap, CapAttr(risk=2, utility=0))
+        items.append((cap, a.risk, a.utility))
+
+    dp: List[Tuple[int, int, List[str]]] = [(0, 0, []) for _ in range(budget + 1)]
+    for cap, risk, util in items:
+        for b in range(budget, -1, -1):
+            nb = b - risk
+            if nb < 0:
+                continue
+            prev_cnt, prev_u, prev_list = dp[nb]
+            cand = (prev_cnt + 1, prev_u + util, prev_list + [cap])
+            cur = dp[b]
+            if (cand[0] > cur[0]) or (cand[0] == cur[0] and cand[1] > cur[1]):
+                dp[b] = cand
+    best = max(dp, key=lambda x: (x[0], x[1]))
+    chosen_set = set(best[2])
+    return [cap for cap in C if cap in chosen_set]
+
+
+def make_table(n_caps: int, seed: int, max_risk: int = 10, max_util: int = 5) -> Tuple[List[str], Dict[str, CapAttr], Set[str]]:
+    rng = random.Random(seed)
+    C = [f"cap:{i}" for i in range(n_caps)]
+    # utility 取值范围小，刻意制造大量同分，检验取舍一致
+    attrs = {c: CapAttr(risk=rng.randint(1, max_risk), utility=rng.randint(0, max_util)) for c in C}
+    hard_ban = {c for c in C if rng.random() < 0.05}
+    return C, attrs, hard_ban
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--caps", type=int, nargs="+", default=[10, 100, 500, 1000])
+    ap.add_argument("--budget", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--check", type=int, default=200, help="random tables checked for identical results")
+    args = ap.parse_args()
+
+    for seed in range(args.check):
+        rng = random.Random(seed)
+        C, attrs, ban = make_table(rng.randint(1, 40), seed)
+        budgets = {"g": rng.randint(0, 60)}
+        new = solve_tmax_knapsack("g", C, {"g": attrs}, budgets, ban, debug=False)
+        old = legacy_solve("g", C, {"g": attrs}, budgets, ban)
+        assert new == old, (seed, new, old)
+    print(f"[bench] {args.check} random tables: results identical")
+
+    for n in args.caps:
+        C, attrs, ban = make_table(n, seed=n)
+        budgets = {"g": args.budget}
+        t_new = _time(lambda: solve_tmax_knapsack("g", C, {"g": attrs}, budgets, ban, debug=False), args.repeat)
+        t_old = _time(lambda: legacy_solve("g", C, {"g": attrs}, budgets, ban), args.repeat)
+        print(f"[bench] caps={n:5d} budget={args.budget}: legacy={t_old:.4f}s  backpointer={t_new:.4f}s  "
+              f"speedup={t_old / t_new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
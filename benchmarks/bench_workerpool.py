@@ -0,0 +1,60 @@
+"""
+工具调用延迟：每次起新解释器（subprocess） vs 预热的 worker 进程池
+
+对 repo_sim 反复执行 run_tests / exec:build / exec:lint，报告两种方式的 p50 / p99 / 均值，
+差值即解释器启动 + pytest 与项目 import 的开销。
+
+运行：
+  python -m benchmarks.bench_workerpool --iters 20 --workers 2
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from src.demo_agent.tools import REPO_ROOT
+from src.demo_agent.workerpool import JOB_KINDS, WorkerPool
+from src.safe_boundary.models import Lease
+
+
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+def _summary(xs: List[float]) -> Dict[str, float]:
+    return {"p50_ms": round(_pct(xs, 0.5) * 1000, 1), "p99_ms": round(_pct(xs, 0.99) * 1000, 1),
+            "mean_ms": round(statistics.fmean(xs) * 1000, 1)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--iters", type=int, default=20)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--max-jobs", type=int, default=100)
+    args = ap.parse_args()
+
+    leases = {kind: Lease(cap, ["repo_sim/**"], time.time() + 3600, "bench") for kind, (cap, _, _) in JOB_KINDS.items()}
+    t0 = time.perf_counter()
+    with WorkerPool(size=args.workers, max_jobs=args.max_jobs) as pool:
+        print(f"[bench] pool start: {args.workers} worker(s) in {time.perf_counter() - t0:.2f}s")
+        for kind, (_, argv, _) in JOB_KINDS.items():
+            cold, warm = [], []
+            for _ in range(args.iters):
+                t = time.perf_counter()
+                p = subprocess.run([sys.executable, *argv], cwd=REPO_ROOT, capture_output=True)
+                cold.append(time.perf_counter() - t)
+                r = pool.run(kind, leases[kind])
+                warm.append(r.elapsed_s)
+                assert r.ok == (p.returncode == 0), f"{kind}: pool ok={r.ok} subprocess rc={p.returncode}\n{r.stdout}"
+            c, w = _summary(cold), _summary(warm)
+            print(f"[bench] {kind:10s} cold p50={c['p50_ms']}ms p99={c['p99_ms']}ms | "
+                  f"warm p50={w['p50_ms']}ms p99={w['p99_ms']}ms | saved/job={c['mean_ms'] - w['mean_ms']:.1f}ms")
+        print(f"[bench] pool stats: {pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+RequirementGraph 多线程压力测试：多个“子 Agent”线程并行处理兄弟需求，另有读线程不断取快照。
+
+每个写线程负责自己的一组 rid，按剧本循环：
+  instruction -> run_tests(fail) -> authorize(write:src) -> code_patch -> run_tests(pass)
+读线程随机挑节点：view() 取一致快照，再 authorize / snapshot()。
+
+结束后校验：
+  - 没有线程抛异常
+  - 事件总数 = 写线程各自记录的事件数之和；事件时间线 ts 单调
+  - 每个 rid 的事件顺序与剧本一致
+  - 每个节点的证据数、state、anchors 与剧本一致；active 集合为空
+  - 二级索引（state / goal / evidence_kind）与节点内容一致
+  - 读线程拿到的快照里，version 相同的快照 anchors 也相同（没有读到“半更新”）
+
+运行：
+  python -m benchmarks.stress_graph --writers 8 --readers 4 --nodes-per-writer 50
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.safe_boundary.authorize import authorize
+from src.safe_boundary.graph import EventLog, RequirementGraph
+from src.safe_boundary.models import OrgPolicy, Request
+
+_SCRIPT = ["USER_INSTRUCTION", "RUN_TESTS", "CODE_PATCH", "RUN_TESTS", "TASK_COMPLETE"]
+
+
+def _writer(graph: RequirementGraph, org: OrgPolicy, wid: int, n: int, errors: List[BaseException],
+            grants: List[int]) -> None:
+    try:
+        ok = 0
+        for i in range(n):
+            rid = f"w{wid}-r{i}"
+            test = f"tests/test_w{wid}_{i}.py"
+            graph.on_user_instruction(rid, "fix_failing_test", {"no-network"}, {})
+            graph.on_run_tests(rid, ok=False, stdout=f"FAILED {test}::test_case_{i}")
+            d = authorize(Request("write:src", f"repo_sim/{test}"), graph.view(rid), org)
+            ok += d.ok
+            graph.on_code_patch(rid, path=test, diff_summary=f"patch {i}")
+            graph.on_run_tests(rid, ok=True, stdout=f"PASSED {test}::test_case_{i}")
+        grants[wid] = ok
+    except BaseException as exc:  # noqa: BLE001 - 压测里要把所有异常带回主线程
+        errors.append(exc)
+
+
+def _reader(graph: RequirementGraph, org: OrgPolicy, stop: threading.Event, seed: int,
+            errors: List[BaseException], seen: Dict[Tuple[str, int], Any], counter: List[int]) -> None:
+    rng = random.Random(seed)
+    try:
+        while not stop.is_set():
+            rids = list(graph.nodes)
+            if not rids:
+                continue
+            rid = rng.choice(rids)
+            v = graph.view(rid)
+            key = (rid, v.version)
+            anchors = tuple(sorted(v.anchors.items()))
+            prev = seen.setdefault(key, anchors)
+            if prev != anchors:
+                raise AssertionError(f"inconsistent snapshot for {key}: {prev} vs {anchors}")
+            authorize(Request("read:repo", "repo_sim/src/auth/login.py"), v, org)
+            if rng.random() < 0.01:
+                graph.snapshot(events_from=max(0, len(graph.events) - 10))
+            counter[0] += 1
+    except BaseException as exc:  # noqa: BLE001
+        errors.append(exc)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    graph = RequirementGraph(events=EventLog(window=args.window))
+    org = OrgPolicy()
+    errors: List[BaseException] = []
+    grants = [0] * args.writers
+    seen: Dict[Tuple[str, int], Any] = {}
+    reads = [0]
+    stop = threading.Event()
+
+    readers = [threading.Thread(target=_reader, args=(graph, org, stop, k, errors, seen, reads))
+               for k in range(args.readers)]
+    writers = [threading.Thread(target=_writer, args=(graph, org, w, args.nodes_per_writer, errors, grants))
+               for w in range(args.writers)]
+    t0 = time.perf_counter()
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    for t in readers:
+        t.join()
+
+    problems: List[str] = [f"{type(e).__name__}: {e}" for e in errors]
+    total_nodes = args.writers * args.nodes_per_writer
+
+    events = list(graph.events)
+    if len(events) != total_nodes * len(_SCRIPT):
+        problems.append(f"event count {len(events)} != {total_nodes * len(_SCRIPT)}")
+    if any(b.ts < a.ts for a, b in zip(events, events[1:])):
+        problems.append("event timestamps are not monotonic")
+    per_rid: Dict[str, List[str]] = {}
+    for e in events:
+        per_rid.setdefault(e.rid, []).append(e.etype)
+    bad_order = [rid for rid, seq in per_rid.items() if seq != _SCRIPT]
+    if bad_order:
+        problems.append(f"{len(bad_order)} rid(s) with out-of-order events, e.g. {bad_order[0]}: {per_rid[bad_order[0]]}")
+
+    for rid, node in graph.nodes.items():
+        kinds = [e.kind for e in node.evidences]
+        if kinds != ["test_fail", "diff", "test_pass"] or node.state != "completed":
+            problems.append(f"{rid}: evidences={kinds} state={node.state}")
+            break
+        wid, i = rid[1:].split("-r")
+        if node.anchors.get("test") != f"tests/test_w{wid}_{i}.py::test_case_{i}":
+            problems.append(f"{rid}: anchors={node.anchors}")
+            break
+    if len(graph.nodes) != total_nodes:
+        problems.append(f"node count {len(graph.nodes)} != {total_nodes}")
+    if graph.active:
+        problems.append(f"{len(graph.active)} node(s) still active")
+    # 二级索引与节点内容一致
+    for kind in ("test_fail", "diff", "test_pass"):
+        if graph.count("evidence_kind", kind) != total_nodes:
+            problems.append(f"evidence_kind index {kind}: {graph.count('evidence_kind', kind)} != {total_nodes}")
+    if len(graph.find(state="completed", goal="fix_failing_test")) != total_nodes:
+        problems.append("state/goal index out of sync")
+    if sum(grants) != total_nodes:
+        problems.append(f"write:src grants {sum(grants)} != {total_nodes}")
+
+    graph.events.close()
+    return {
+        "writers": args.writers,
+        "readers": args.readers,
+        "nodes": total_nodes,
+        "events": len(events),
+        "snapshot_reads": reads[0],
+        "elapsed_s": round(elapsed, 3),
+        "events_per_sec": round(len(events) / elapsed, 1) if elapsed > 0 else 0.0,
+        "problems": problems,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--writers", type=int, default=8)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--nodes-per-writer", type=int, default=50)
+    ap.add_argument("--window", type=int, default=256, help="EventLog in-memory window (small: exercise spilling)")
+    ap.add_argument("--rounds", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    # 切换间隔调小，让线程交错更频繁
+    sys.setswitchinterval(1e-5)
+    failed = False
+    for k in range(args.rounds):
+        res = run(args)
+        print(json.dumps({"round": k, **res}, ensure_ascii=False))
+        failed = failed or bool(res["problems"])
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
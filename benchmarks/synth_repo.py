@@ -0,0 +1,114 @@
+"""
+合成仓库生成器：批量生成带 import 关系的 Python 仓库，用于压测依赖图 / 作用域扩展 / 授权。
+
+布局（depth=2 时）：
+  <root>/src/pkg_<a>/sub_<b>/mod_<i>.py   模块；每个 import fanout 个“编号更小”的模块（无环）
+  <root>/tests/test_mod_<i>.py            测试文件；import 被测模块
+
+可调参数：
+  - n_modules / modules_per_pkg：模块数与每个叶子包的模块数
+  - depth：包嵌套层数（>=1）
+  - fanout：每个模块的 import 数（出度）
+  - hot_fraction / hot_share：入度倾斜 —— hot_share 比例的 import 指向前 hot_fraction 的“热点”模块
+  - test_ratio：生成测试文件的模块比例
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import List
+import os
+import random
+
+
+@dataclass
+class SynthRepo:
+    root: str
+    files: int
+    modules: List[str] = field(default_factory=list)   # 模块路径（相对 root，如 "src/pkg_0/mod_0.py"）
+    tests: List[str] = field(default_factory=list)     # 测试路径（相对 root）
+
+
+def _pkg_parts(pkg_idx: int, depth: int, branching: int = 10) -> List[str]:
+    # 把叶子包编号展开成 depth 层目录名：pkg_<a>/sub_<b>/...
+    parts = []
+    for level in range(depth - 1):
+        parts.append(f"sub_{pkg_idx % branching}")
+        pkg_idx //= branching
+    parts.append(f"pkg_{pkg_idx}")
+    return list(reversed(parts))
+
+
+def _write(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def generate(
+    root: str,
+    n_modules: int,
+    *,
+    fanout: int = 4,
+    modules_per_pkg: int = 100,
+    depth: int = 1,
+    hot_fraction: float = 0.0,
+    hot_share: float = 0.0,
+    test_ratio: float = 0.0,
+    seed: int = 0,
+) -> SynthRepo:
+    rng = random.Random(seed)
+    repo = SynthRepo(root=root, files=0)
+    names: List[str] = []
+    made_dirs = set()
+
+    for i in range(n_modules):
+        parts = _pkg_parts(i // modules_per_pkg, max(1, depth))
+        # 每一层目录都要有 __init__.py
+        for k in range(1, len(parts) + 1):
+            d = os.path.join(root, "src", *parts[:k])
+            if d not in made_dirs:
+                os.makedirs(d, exist_ok=True)
+                _write(os.path.join(d, "__init__.py"), "")
+                made_dirs.add(d)
+                repo.files += 1
+
+        lines = []
+        if names:
+            n_hot = max(1, int(len(names) * hot_fraction)) if hot_fraction > 0 else 0
+            picked = set()
+            for _ in range(min(fanout, len(names))):
+                if n_hot and rng.random() < hot_share:
+                    dep = names[rng.randrange(n_hot)]
+                else:
+                    dep = names[rng.randrange(len(names))]
+                picked.add(dep)
+            for dep in sorted(picked):
+                lines.append(f"import {dep}")
+        lines.append("")
+        # 一些函数体，让 ast.parse 有点实际工作量
+        for k in range(5):
+            lines.append(f"def f_{k}(x):")
+            lines.append(f"    return [y * {k} for y in range(x) if y % 3]")
+            lines.append("")
+
+        rel = "/".join(["src", *parts, f"mod_{i}.py"])
+        _write(os.path.join(root, *rel.split("/")), "\n".join(lines))
+        repo.files += 1
+        repo.modules.append(rel)
+        mod_name = ".".join(["src", *parts, f"mod_{i}"])
+        names.append(mod_name)
+
+        if test_ratio > 0 and rng.random() < test_ratio:
+            tdir = os.path.join(root, "tests")
+            if tdir not in made_dirs:
+                os.makedirs(tdir, exist_ok=True)
+                made_dirs.add(tdir)
+            trel = f"tests/test_mod_{i}.py"
+            _write(os.path.join(root, "tests", f"test_mod_{i}.py"),
+                   f"import {mod_name}\n\ndef test_mod_{i}():\n    assert {mod_name}.f_1(4) is not None\n")
+            repo.files += 1
+            repo.tests.append(trel)
+    return repo
+
+
+def generate_repo(root: str, n_modules: int, fanout: int = 4, modules_per_pkg: int = 100, seed: int = 0) -> int:
+    """兼容旧接口：生成单层包结构，返回写入的文件数（含 __init__.py）"""
+    return generate(root, n_modules, fanout=fanout, modules_per_pkg=modules_per_pkg, seed=seed).files
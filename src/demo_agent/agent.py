@@ -5,54 +5,67 @@
 """
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import List
-from rich.console import Console
+import logging
 
-from src.safe_boundary.models import OrgPolicy, Request, RequirementNode, Lease
+from src.safe_boundary.models import OrgPolicy, Request, RequirementNode
 from src.safe_boundary.authorize import authorize
+from src.safe_boundary.lease import LeaseStore
 from src.safe_boundary.audit import log_event
 from src.safe_boundary.graph import RequirementGraph
 from . import tools
 
-console = Console()
+# 决策/工具输出走 logging（惰性格式化）；库使用时默认不输出，由 scenario 等入口配置 handler
+log = logging.getLogger("demo_agent.agent")
+# 与 safe_boundary（logutil）一样挂 NullHandler：调用方没配置 logging 时，DENY 等 WARNING 不会经 lastResort 打到 stderr
+logging.getLogger("demo_agent").addHandler(logging.NullHandler())
 
 @dataclass
 class DemoAgent:
     org: OrgPolicy
     graph: RequirementGraph
-    leases: List[Lease] = field(default_factory=list)
-
-    def _prune_leases(self) -> None:
-        self.leases = [l for l in self.leases if not l.is_expired()]
+    leases: LeaseStore = field(default_factory=LeaseStore)
+    # True：重跑测试时用真实 pytest（只跑受影响的测试），否则用模拟的 tools.run_tests
+    real_tests: bool = False
 
     def step_request(self, req: Request, r: RequirementNode, ttl: int = 300) -> bool:
-        self._prune_leases()
+        if r.state == "completed":
+            self.leases.revoke_rid(r.rid)
+
+        # 快速路径：已有未到期 lease 覆盖该请求，直接复用，不重新计算边界
+        lease = self.leases.check(req, r.rid)
+        if lease is not None:
+            log.info("GRANT %s scope=%s (lease hit)", req.capability, req.scope)
+            log_event({"type": "GRANT", "rid": r.rid, "capability": req.capability, "scope": req.scope,
+                       "lease_expires_at": lease.expires_at, "lease_hit": True})
+            return True
+
         decision = authorize(req, r, self.org, ttl_seconds=ttl)
 
         if decision.ok:
             lease = decision.lease
             assert lease is not None
-            self.leases.append(lease)
-            console.print(f"[green]GRANT[/green] {req.capability} scope={req.scope}")
-            log_event({"type": "GRANT", "rid": r.rid, "capability": req.capability, "scope": req.scope})
+            self.leases.add(lease)
+            log.info("GRANT %s scope=%s", req.capability, req.scope)
+            log_event({"type": "GRANT", "rid": r.rid, "capability": req.capability, "scope": req.scope,
+                       "lease_expires_at": lease.expires_at})
             return True
 
-        console.print(f"[red]DENY[/red] {req.capability} scope={req.scope}")
-        console.print(f"  reason: {decision.reason}")
+        log.warning("DENY %s scope=%s", req.capability, req.scope)
+        log.warning("  reason: %s", decision.reason)
         if decision.suggestion:
             for s in decision.suggestion:
-                console.print(f"  suggestion: {s}")
+                log.warning("  suggestion: %s", s)
         log_event({"type": "DENY", "rid": r.rid, "capability": req.capability, "scope": req.scope,
                    "reason": decision.reason, "suggestion": decision.suggestion})
         return False
 
     def run_fix_failing_test(self, r: RequirementNode) -> None:
-        console.rule("[bold]Scenario: fix failing test (graph updates)[/bold]")
+        log.info("Scenario: fix failing test (graph updates)")
 
         # t1: 运行测试（证据产生 + anchors 更新）
         if self.step_request(Request("exec:test", "repo_sim/tests/**"), r, ttl=120):
             tr = tools.run_tests()
-            console.print(f"[cyan]tool[/cyan] run_tests -> ok={tr.ok}")
+            log.info("tool run_tests -> ok=%s", tr.ok)
             self.graph.on_run_tests(r.rid, ok=tr.ok, stdout=tr.stdout)
 
         if r.state == "completed":
@@ -66,7 +79,7 @@ class DemoAgent:
     return True
 """
             wr = tools.apply_patch(patch_path, new_content)
-            console.print(f"[cyan]tool[/cyan] apply_patch -> ok={wr.ok}")
+            log.info("tool apply_patch -> ok=%s", wr.ok)
             self.graph.on_code_patch(r.rid, path=patch_path, diff_summary="return False -> True")
 
         # t3: 故意请求联网（应被 no-network 拒绝）
@@ -74,9 +87,14 @@ class DemoAgent:
 
         # t4: 重跑测试（通过 -> TASK_COMPLETE）
         if self.step_request(Request("exec:test", "repo_sim/tests/**"), r, ttl=120):
-            tr2 = tools.run_tests()
-            console.print(f"[cyan]tool[/cyan] run_tests -> ok={tr2.ok}")
-            self.graph.on_run_tests(r.rid, ok=tr2.ok, stdout=tr2.stdout)
+            if self.real_tests:
+                tr2 = tools.run_impacted_tests(self.graph, r.rid, self.leases)
+                log.info("tool run_impacted_tests -> %s", tr2.stdout)
+            else:
+                tr2 = tools.run_tests()
+                log.info("tool run_tests -> ok=%s", tr2.ok)
+                self.graph.on_run_tests(r.rid, ok=tr2.ok, stdout=tr2.stdout)
 
         if r.state == "completed":
-            console.print("[green]Requirement completed (state=completed).[/green]")
+            revoked = self.leases.revoke_rid(r.rid)
+            log.info("Requirement completed (state=completed). revoked %d lease(s).", revoked)
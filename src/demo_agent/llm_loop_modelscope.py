@@ -2,7 +2,7 @@ from __future__ import annotations
 import json
 from src.demo_agent.llm_modelscope import chat_once
 from src.safe_boundary.models import Request, RequirementNode, OrgPolicy
-from src.safe_boundary.authorize import authorize
+from src.safe_boundary.authorize import authorize_many
 from src.safe_boundary.graph import RequirementGraph
 from src.demo_agent import tools as local_tools
 
@@ -36,10 +36,17 @@ def run_llm_agent(user_instruction: str, r: RequirementNode, org: OrgPolicy, gra
         if not msg.tool_calls:
             return msg.content or ""
 
-        for tc in msg.tool_calls:
-            args = json.loads(tc.function.arguments or "{}")
-            req = toolcall_to_request(tc.function.name, args)
-            decision = authorize(req, r, org, ttl_seconds=300)
+        calls = [(tc, json.loads(tc.function.arguments or "{}")) for tc in msg.tool_calls]
+        reqs = [toolcall_to_request(tc.function.name, args) for tc, args in calls]
+        # 一轮里的多个 tool_call 一次性批量授权；工具执行改变了节点（证据/anchors）时，剩余请求重新批量授权
+        decisions = authorize_many(reqs, r, org, ttl_seconds=300)
+        decided_at = r.version
+
+        for i, (tc, args) in enumerate(calls):
+            if r.version != decided_at:
+                decisions[i:] = authorize_many(reqs[i:], r, org, ttl_seconds=300)
+                decided_at = r.version
+            decision = decisions[i]
 
             if not decision.ok:
                 out = f"DENIED: {decision.reason}\nSUGGEST: {decision.suggestion}"
@@ -1,6 +1,12 @@
 from __future__ import annotations
+import logging
+import os
+
 from rich.console import Console
+from rich.logging import RichHandler
 
+from src.safe_boundary.audit import AUDIT_DIR
+from src.safe_boundary.logutil import enable_tmax_trace
 from src.safe_boundary.models import OrgPolicy
 from src.safe_boundary.extract import extract_requirement
 from src.safe_boundary.graph import RequirementGraph
@@ -10,8 +16,21 @@ from src.demo_agent.llm_modelscope import make_client
 
 console = Console()
 
+def _setup_logging() -> None:
+    # demo 入口：把 agent 的决策/工具日志打到终端（库默认不输出）
+    handler = RichHandler(console=console, show_time=False, show_path=False)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    agent_log = logging.getLogger("demo_agent")
+    agent_log.addHandler(handler)
+    agent_log.setLevel(logging.INFO)
+    # 需要 T_max 的 DP 轨迹时：SAFE_BOUNDARY_TMAX_TRACE=<file>
+    trace = os.getenv("SAFE_BOUNDARY_TMAX_TRACE")
+    if trace:
+        enable_tmax_trace(trace)
+
 def _print_graph(graph: RequirementGraph, title: str) -> None:
-    snap = graph.snapshot()
+    # 只取最后一个事件（时间线可能很长，且部分已溢出到磁盘）
+    snap = graph.snapshot(events_from=max(0, len(graph.events) - 1))
     console.rule(f"[bold]{title}[/bold]")
     console.print(f"active_rid={snap['active_rid']}")
     for rid, n in snap["nodes"].items():
@@ -24,6 +43,8 @@ def _print_graph(graph: RequirementGraph, title: str) -> None:
         console.print(f"last_event={last['etype']} payload={last['payload']}")
 
 def run_fix_failing_test_scenario():
+    _setup_logging()
+
     # t0: 用户指令
     user_instruction = "修复失败测试，禁止联网"
     goal, anchors, constraints = extract_requirement(user_instruction)
@@ -44,3 +65,7 @@ def run_fix_failing_test_scenario():
         console.print(final)
 
     _print_graph(graph, "Final Requirement Graph")
+
+    # 需求图事件时间线落盘：与 audit.jsonl 一起可被 replay 回放
+    os.makedirs(AUDIT_DIR, exist_ok=True)
+    graph.save_events(os.path.join(AUDIT_DIR, "graph_events.jsonl"))
@@ -0,0 +1,338 @@
+"""
+真实测试执行（pytest 子进程）+ 测试影响分析
+
+- select_tests：从变更文件出发沿反向依赖图（scope_expand 的 rev_deps）求传递闭包，只挑受影响的测试文件；
+  没有变更、或变更文件不在依赖图里时退化为全量
+- changed_under_leases：节点 diff 证据里、且被该节点 write:src lease 覆盖的文件
+- run_impacted_tests：把选中的测试按历史耗时分片，多个 pytest 子进程并行跑；
+  输出逐行汇总进 RequirementGraph.begin_test_run（边跑边更新 anchors）
+- 每次运行把各测试文件耗时记到 .cache/test_durations.json，用来分片和估计全量耗时，
+  报告里给出相对全量运行节省的时间（measure_full=True 时实测全量）
+"""
+from __future__ import annotations
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from xml.etree import ElementTree as ET
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.safe_boundary.depgraph import DepGraphStore
+from src.safe_boundary.graph import RequirementGraph, TestRun
+from src.safe_boundary.lease import LeaseStore
+from src.safe_boundary.models import Request, RequirementNode
+from src.safe_boundary.scope_expand import anchor_file, dep_graph_handle
+from src.safe_boundary.testlog import Failure, TestLogParser, junit_path
+
+DURATIONS_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".cache", "test_durations.json")
+)
+
+# pytest 退出码 5：没有收集到测试（不算失败）
+_NO_TESTS_COLLECTED = 5
+
+
+def is_test_file(key: str) -> bool:
+    name = key.rsplit("/", 1)[-1]
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+@dataclass
+class ImpactSelection:
+    changed: List[str]                                      # 变更文件（依赖图 key）
+    selected: List[str]                                     # 选中的测试文件（依赖图 key）
+    all_tests: List[str] = field(default_factory=list)      # 仓库里全部测试文件
+    full: bool = False                                      # 是否退化为全量
+
+
+def _store_key(store: DepGraphStore, path: str) -> str:
+    """仓库相对路径 / 锚点值 -> store 的文件 key"""
+    p = path.replace("\\", "/").split("::", 1)[0].lstrip("/")
+    if store.prefix and not p.startswith(store.prefix + "/"):
+        p = f"{store.prefix}/{p}"
+    return p
+
+
+def select_tests(changed: Iterable[str], store: Optional[DepGraphStore] = None) -> ImpactSelection:
+    store = store or dep_graph_handle().get()
+    all_tests = sorted(k for k in store.files if is_test_file(k))
+    keys = sorted({_store_key(store, c) for c in changed})
+    if not keys or any(not store.has_file(k) for k in keys):
+        return ImpactSelection(changed=keys, selected=list(all_tests), all_tests=all_tests, full=True)
+
+    seen = set(keys)
+    frontier = list(keys)
+    while frontier:
+        nxt = []
+        for k in frontier:
+            for r in store.rev.get(k, ()):
+                if r not in seen:
+                    seen.add(r)
+                    nxt.append(r)
+        frontier = nxt
+    return ImpactSelection(changed=keys, selected=sorted(k for k in seen if is_test_file(k)), all_tests=all_tests)
+
+
+def changed_under_leases(node: RequirementNode, leases: LeaseStore, now: Optional[float] = None) -> List[str]:
+    """节点 diff 证据中的文件，且当前仍有覆盖它的 write:src lease"""
+    out = []
+    for e in node.evidences:
+        if e.kind != "diff":
+            continue
+        key = anchor_file(e.payload.get("file", ""))
+        if leases.check(Request("write:src", key), node.rid, now) is not None:
+            out.append(key)
+    return sorted(set(out))
+
+
+# ---- 耗时记录与分片 ----
+
+@dataclass
+class TestTimings:
+    """历史耗时：每个测试文件的用例耗时之和 + 单个 pytest 进程的固定开销（启动、收集）"""
+
+    __test__ = False  # 不是 pytest 用例
+
+    files: Dict[str, float] = field(default_factory=dict)
+    overhead_s: float = 0.0
+
+    @classmethod
+    def load(cls, path: Optional[str] = DURATIONS_PATH) -> "TestTimings":
+        if not path or not os.path.isfile(path):
+            return cls()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            return cls({k: float(v) for k, v in doc.get("files", {}).items()}, float(doc.get("overhead_s", 0.0)))
+        except (OSError, ValueError, AttributeError):
+            return cls()
+
+    def save(self, path: Optional[str] = DURATIONS_PATH) -> None:
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"files": self.files, "overhead_s": self.overhead_s}, f, sort_keys=True)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def get(self, test: str, default: float) -> float:
+        return self.files.get(test, default)
+
+    def default(self, tests: List[str]) -> Optional[float]:
+        known = [self.files[t] for t in tests if t in self.files]
+        return sum(known) / len(known) if known else None
+
+    def estimate_serial(self, tests: List[str]) -> Optional[float]:
+        """在一个 pytest 进程里串行跑完 tests 的估计耗时；没有任何历史时返回 None"""
+        default = self.default(tests)
+        if default is None:
+            return None
+        return self.overhead_s + sum(self.get(t, default) for t in tests)
+
+
+def shard_tests(tests: List[str], n: int, timings: TestTimings) -> List[List[str]]:
+    """按耗时贪心分片（最长的先放进当前最空的分片）；没有历史耗时的按均值估计"""
+    n = max(1, min(n, len(tests)))
+    default = timings.default(tests) or 1.0
+    shards: List[Tuple[float, int, List[str]]] = [(0.0, i, []) for i in range(n)]
+    for t in sorted(tests, key=lambda t: -timings.get(t, default)):
+        load, i, files = min(shards)
+        files.append(t)
+        shards[i] = (load + timings.get(t, default), i, files)
+    return [files for _, _, files in shards if files]
+
+
+def _junit_durations(path: str, store: DepGraphStore) -> Dict[str, float]:
+    """从 junit xml 汇总每个测试文件的耗时"""
+    out: Dict[str, float] = {}
+    try:
+        root = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return out
+    for tc in root.iter("testcase"):
+        rel, _ = junit_path(tc.get("classname", ""), tc.get("file"))
+        key = _store_key(store, rel)
+        out[key] = out.get(key, 0.0) + float(tc.get("time") or 0.0)
+    return out
+
+
+# ---- 执行 ----
+
+@dataclass
+class TestRunReport:
+    __test__ = False  # 不是 pytest 用例
+
+    ok: bool
+    selection: ImpactSelection
+    shards: int = 0
+    elapsed_s: float = 0.0
+    failures: List[str] = field(default_factory=list)
+    returncodes: List[int] = field(default_factory=list)
+    timed_out: bool = False
+    full_suite_s: Optional[float] = None     # 全量耗时（估计或实测）
+    full_suite_measured: bool = False
+
+    @property
+    def time_saved_s(self) -> Optional[float]:
+        if self.full_suite_s is None:
+            return None
+        return self.full_suite_s - self.elapsed_s
+
+    def summary(self) -> str:
+        sel = self.selection
+        parts = [
+            f"ok={self.ok}",
+            f"tests={len(sel.selected)}/{len(sel.all_tests)}" + (" (full)" if sel.full else ""),
+            f"shards={self.shards}",
+            f"elapsed={self.elapsed_s:.2f}s",
+        ]
+        if self.full_suite_s is not None:
+            kind = "measured" if self.full_suite_measured else "estimated"
+            parts.append(f"full_suite={self.full_suite_s:.2f}s ({kind}) saved={self.time_saved_s:.2f}s")
+        if self.failures:
+            parts.append(f"failures={len(self.failures)}")
+        if self.timed_out:
+            parts.append("TIMEOUT")
+        return " ".join(parts)
+
+
+def _pytest_cmd(files: List[str], junit: Optional[str]) -> List[str]:
+    cmd = [sys.executable, "-m", "pytest", "-q", "-rfE", "-p", "no:cacheprovider"]
+    if junit:
+        cmd.append(f"--junitxml={junit}")
+    return cmd + files
+
+
+def _pump(i: int, proc: "subprocess.Popen[str]", q: "queue.Queue[Tuple[int, Optional[str]]]") -> None:
+    assert proc.stdout is not None
+    for line in proc.stdout:
+        q.put((i, line))
+    q.put((i, None))
+
+
+def _run_shards(
+    shards: List[List[str]],
+    store: DepGraphStore,
+    sink: "TestLogParser | TestRun",
+    timeout: float,
+    tmpdir: str,
+) -> Tuple[List[int], List[float], List[Failure], bool]:
+    """
+    并行启动各分片（每片一个 pytest 子进程，junit xml 写到 tmpdir/shard{i}.xml），
+    逐行把输出交给 sink.feed（只在当前线程调用）；返回 (退出码, 各分片墙钟耗时, 发现的失败, 是否超时)
+    """
+    q: "queue.Queue[Tuple[int, Optional[str]]]" = queue.Queue()
+    procs = []
+    t0 = time.perf_counter()
+    for i, files in enumerate(shards):
+        rels = [store.rel_in_root(k) for k in files]
+        p = subprocess.Popen(
+            _pytest_cmd(rels, os.path.join(tmpdir, f"shard{i}.xml")), cwd=store.root,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding="utf-8", errors="replace",
+        )
+        procs.append(p)
+        threading.Thread(target=_pump, args=(i, p, q), daemon=True).start()
+
+    walls = [0.0] * len(procs)
+    found: List[Failure] = []
+    deadline = time.monotonic() + timeout
+    open_streams = len(procs)
+    timed_out = False
+    while open_streams:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        try:
+            i, line = q.get(timeout=min(remaining, 0.5))
+        except queue.Empty:
+            continue
+        if line is None:
+            walls[i] = time.perf_counter() - t0
+            open_streams -= 1
+            continue
+        found.extend(sink.feed(line))
+
+    if timed_out:
+        for p in procs:
+            p.kill()
+    return [p.wait() for p in procs], walls, found, timed_out
+
+
+def _record_timings(timings: TestTimings, shards: List[List[str]], walls: List[float],
+                    store: DepGraphStore, tmpdir: str) -> None:
+    """用各分片的 junit 耗时更新每个文件；墙钟减去用例耗时之和即进程固定开销"""
+    overheads = []
+    for i, files in enumerate(shards):
+        per_file = _junit_durations(os.path.join(tmpdir, f"shard{i}.xml"), store)
+        timings.files.update(per_file)
+        if per_file and walls[i] > 0:
+            overheads.append(max(0.0, walls[i] - sum(per_file.values())))
+    if overheads:
+        timings.overhead_s = sum(overheads) / len(overheads)
+
+
+def run_impacted_tests(
+    changed: Iterable[str],
+    *,
+    store: Optional[DepGraphStore] = None,
+    shards: Optional[int] = None,
+    graph: Optional[RequirementGraph] = None,
+    rid: Optional[str] = None,
+    timeout: float = 600.0,
+    measure_full: bool = False,
+    durations_path: Optional[str] = DURATIONS_PATH,
+) -> TestRunReport:
+    """
+    只跑 changed 影响到的测试。graph/rid 给定时输出流式写入该节点（begin_test_run / finish）。
+    没有选中任何测试时不启动子进程，也不写图（调用方自己决定是否需要全量）。
+    全量耗时默认按历史估计（单进程串行：固定开销 + 各文件耗时之和）；measure_full=True 时实测。
+    """
+    store = store or dep_graph_handle().get()
+    sel = select_tests(changed, store)
+    report = TestRunReport(ok=True, selection=sel)
+    timings = TestTimings.load(durations_path)
+    if not sel.selected:
+        report.full_suite_s = timings.estimate_serial(sel.all_tests)
+        return report
+
+    parts = shard_tests(sel.selected, shards or os.cpu_count() or 1, timings)
+    report.shards = len(parts)
+    run = graph.begin_test_run(rid) if graph is not None and rid is not None else None
+    sink = run if run is not None else TestLogParser("pytest")
+
+    with tempfile.TemporaryDirectory(prefix="sb_pytest_") as tmpdir:
+        t0 = time.perf_counter()
+        codes, walls, found, timed_out = _run_shards(parts, store, sink, timeout, tmpdir)
+        report.elapsed_s = time.perf_counter() - t0
+        _record_timings(timings, parts, walls, store, tmpdir)
+
+    report.returncodes = codes
+    report.timed_out = timed_out
+    report.ok = not timed_out and all(c in (0, _NO_TESTS_COLLECTED) for c in codes)
+    if run is not None:
+        run.finish(report.ok)
+        report.failures = [f.nodeid for f in run.failures]
+    else:
+        report.failures = [f.nodeid for f in found + sink.close()]
+
+    if measure_full:
+        with tempfile.TemporaryDirectory(prefix="sb_pytest_") as tmpdir:
+            t0 = time.perf_counter()
+            _, walls, _, _ = _run_shards([sel.all_tests], store, TestLogParser("pytest"), timeout, tmpdir)
+            report.full_suite_s = time.perf_counter() - t0
+            _record_timings(timings, [sel.all_tests], walls, store, tmpdir)
+        report.full_suite_measured = True
+    else:
+        report.full_suite_s = timings.estimate_serial(sel.all_tests)
+    timings.save(durations_path)
+    return report
@@ -10,9 +10,11 @@ demo 为了可运行，用 repo_sim 目录做“伪仓库”。
 """
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Optional, Tuple
 import os
 
+from src.safe_boundary.scope_expand import refresh_dep_graph
+
 REPO_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "repo_sim")
 REPO_ROOT = os.path.abspath(REPO_ROOT)
 
@@ -34,6 +36,24 @@ def run_tests() -> ToolResult:
         return ToolResult(ok=True, stdout="PASSED tests/test_auth.py::test_login")
     return ToolResult(ok=False, stdout="FAILED tests/test_auth.py::test_login")
 
+def run_impacted_tests(graph, rid: str, leases, shards: Optional[int] = None) -> ToolResult:
+    """
+    真实 pytest：只跑该节点 write lease 下改动文件影响到的测试（testrunner），输出直接流进 graph
+    """
+    from . import testrunner
+    node = graph.view(rid)
+    report = testrunner.run_impacted_tests(
+        testrunner.changed_under_leases(node, leases), graph=graph, rid=rid, shards=shards,
+    )
+    return ToolResult(ok=report.ok, stdout=report.summary())
+
+def run_pooled(pool, kind: str, lease, args=None) -> ToolResult:
+    """
+    在预热的 worker 进程池里执行 run_tests / exec:build / exec:lint（workerpool），lease 不覆盖时抛 JobRejected
+    """
+    r = pool.run(kind, lease, args)
+    return ToolResult(ok=r.ok, stdout=r.stdout, stderr="timeout" if r.timed_out else "")
+
 def apply_patch(rel_path: str, new_content: str) -> ToolResult:
     """
     写文件（模拟）
@@ -42,6 +62,8 @@ def apply_patch(rel_path: str, new_content: str) -> ToolResult:
     os.makedirs(os.path.dirname(abs_path), exist_ok=True)
     with open(abs_path, "w", encoding="utf-8") as f:
         f.write(new_content)
+    # 文件变了：增量刷新依赖图（只重新解析这一个文件）
+    refresh_dep_graph([f"repo_sim/{rel_path}"])
     return ToolResult(ok=True, stdout=f"wrote {rel_path}")
 
 def network_install(pkg: str) -> ToolResult:
@@ -0,0 +1,519 @@
+"""
+预热的工具执行进程池：run_tests / exec:build / exec:lint 不再每次起一个新解释器。
+
+- worker 由 forkserver 派生，启动后 import preload 里的模块（pytest 等）并预加载被测项目的模块
+  （不改全局 multiprocessing 上下文的 forkserver 预加载设置，不影响进程里的其他用户）
+- 任务在 worker 进程内用 runpy 执行（等价于 "python -m <module> args"），fd 级别捕获 stdout/stderr
+- 每个任务带上授权它的 Lease：能力必须匹配、作用域必须被覆盖、不能过期，否则 JobRejected；
+  调用方追加的参数也要检查：路径参数必须落在仓库内且被 lease 覆盖，选项只接受白名单里的
+- 任务结束后卸载本次新 import 的模块（测试文件等），恢复 sys.path / cwd；
+  项目文件有改动时丢掉预加载的项目模块，下次按新代码重新 import
+- 单任务超时：直接 kill 该 worker 并在后台补一个新的（run() 立即返回）
+- 回收：一个 worker 跑满 max_jobs 个任务，或 RSS 超过 max_rss_mb，就退休并在后台补新 worker
+- 补 worker 失败按退避重试，仍失败记进 stats；池里一个活 worker 都没有时 run() 直接报错，不会卡死
+"""
+from __future__ import annotations
+import multiprocessing as mp
+import os
+import queue
+import runpy
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from src.safe_boundary.models import Lease, Request
+
+from .tools import REPO_ROOT
+
+# 任务类型 -> (所需能力, 默认命令行, 默认作用域（相对仓库根）)
+JOB_KINDS: Dict[str, Tuple[str, List[str], str]] = {
+    "run_tests":  ("exec:test",  ["-m", "pytest", "-q", "-rfE", "-p", "no:cacheprovider"], "tests/**"),
+    "exec:build": ("exec:build", ["-m", "compileall", "-q", "."], "**"),
+    "exec:lint":  ("exec:lint",  ["-m", "tabnanny", "."], "**"),
+}
+
+# 调用方可追加的选项（其余以 - 开头的参数一律拒绝，如 pytest 的 -p / --rootdir / -c）
+# SAFE_FLAGS：不带值的开关；VALUE_OPTIONS：带一个值（"-k expr" 或 "--maxfail=1"）
+SAFE_FLAGS: Dict[str, frozenset] = {
+    "run_tests":  frozenset({"-q", "-qq", "-v", "-x", "-s", "-l", "-rfE", "--tb=short", "--tb=line", "--tb=no", "--no-header"}),
+    "exec:build": frozenset({"-q", "-f"}),
+    "exec:lint":  frozenset({"-q", "-v"}),
+}
+VALUE_OPTIONS: Dict[str, frozenset] = {
+    "run_tests":  frozenset({"-k", "--maxfail"}),
+    "exec:build": frozenset(),
+    "exec:lint":  frozenset(),
+}
+
+# 每个任务回传的输出上限（保留末尾）
+MAX_OUTPUT = 1024 * 1024
+
+# 补 worker 的重试次数（两次之间按 0.5s、1s ... 退避）
+SPAWN_RETRIES = 3
+
+
+class JobRejected(Exception):
+    """lease 不允许该任务（能力不符 / 作用域未覆盖 / 已过期）"""
+
+
+@dataclass(slots=True)
+class JobResult:
+    ok: bool
+    returncode: int
+    stdout: str
+    elapsed_s: float
+    worker_pid: int
+    capability: str
+    bound_rid: str
+    timed_out: bool = False
+    recycled: bool = False   # 该任务之后 worker 被回收
+
+
+# ---- worker 进程 ----
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _project_modules(root: str) -> Dict[str, float]:
+    """已 import 的、文件在 root 下的模块 -> 文件 mtime"""
+    out: Dict[str, float] = {}
+    prefix = root + os.sep
+    for name, mod in list(sys.modules.items()):
+        path = getattr(mod, "__file__", None)
+        if path and os.path.abspath(path).startswith(prefix):
+            try:
+                out[name] = os.stat(path).st_mtime
+            except OSError:
+                out[name] = -1.0
+    return out
+
+
+def _evict_shadowed(root: str) -> None:
+    """
+    卸载和仓库顶层包同名、但不在仓库里的模块（例如 worker 自身所在的 src 包），
+    否则被测项目的 "import src.xxx" 会解析到工具自己的代码
+    """
+    tops = {fn[:-3] if fn.endswith(".py") else fn for fn in os.listdir(root)}
+    prefix = root + os.sep
+    shadow_dirs = set()
+    for name, mod in list(sys.modules.items()):
+        top = name.split(".", 1)[0]
+        if top not in tops:
+            continue
+        path = getattr(mod, "__file__", None) or next(iter(getattr(mod, "__path__", []) or []), "")
+        path = os.path.abspath(path)
+        if not path.startswith(prefix):
+            del sys.modules[name]
+            if name == top:
+                # 包：.../<top>/__init__.py 的上两级；单文件模块：.../<top>.py 的上一级
+                shadow_dirs.add(os.path.dirname(os.path.dirname(path)) if path.endswith("__init__.py")
+                                else os.path.dirname(path))
+    # 同名的常规包会压过仓库里的命名空间包，来源目录也要从 sys.path 去掉
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") not in shadow_dirs or os.path.abspath(p or ".") == root]
+
+
+def _preload_project(root: str) -> None:
+    """import 仓库里的非测试模块（失败的跳过）"""
+    import importlib
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith((".", "__")) and d != "tests"]
+        for fn in filenames:
+            if not fn.endswith(".py") or fn.startswith("test_") or fn == "setup.py":
+                continue
+            rel = os.path.relpath(os.path.join(dirpath, fn), root)[:-3]
+            parts = rel.split(os.sep)
+            if parts[-1] == "__init__":
+                parts.pop()
+            if not parts:
+                continue
+            try:
+                importlib.import_module(".".join(parts))
+            except BaseException:  # noqa: BLE001 - 预加载失败不影响任务执行
+                pass
+
+
+def _run_argv(argv: Sequence[str]) -> int:
+    """在当前进程里执行 "python <argv>"（只支持 -m module 形式），返回退出码"""
+    if len(argv) < 2 or argv[0] != "-m":
+        print(f"unsupported argv: {list(argv)}", file=sys.stderr)
+        return 2
+    sys.argv = [argv[1], *argv[2:]]
+    try:
+        runpy.run_module(argv[1], run_name="__main__", alter_sys=True)
+    except SystemExit as exc:
+        code = exc.code
+        if code is None:
+            return 0
+        if isinstance(code, int):
+            return code
+        print(code, file=sys.stderr)
+        return 1
+    except BaseException:  # noqa: BLE001 - 任务里的任何异常都只影响这一个任务
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def _captured(argv: Sequence[str]) -> Tuple[int, str]:
+    """fd 1/2 重定向到临时文件后执行（子进程、C 扩展的输出也能捕获）"""
+    with tempfile.TemporaryFile() as tmp:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved = os.dup(1), os.dup(2)
+        os.dup2(tmp.fileno(), 1)
+        os.dup2(tmp.fileno(), 2)
+        try:
+            code = _run_argv(argv)
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+        size = tmp.seek(0, os.SEEK_END)
+        tmp.seek(max(0, size - MAX_OUTPUT))
+        return code, tmp.read().decode("utf-8", errors="replace")
+
+
+def _worker_main(conn: Any, root: str, preload: Sequence[str], preload_project: bool) -> None:
+    os.chdir(root)
+    sys.path.insert(0, root)
+    _evict_shadowed(root)
+    for name in preload:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    if preload_project:
+        _preload_project(root)
+    project = _project_modules(root)
+    baseline = set(sys.modules)
+    base_path = list(sys.path)
+    base_argv = list(sys.argv)
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            argv = conn.recv()
+        except EOFError:
+            break
+        if argv is None:
+            break
+        # 项目文件改过：预加载的项目模块全部作废（依赖它们的模块可能持有旧对象）
+        if any(_mtime(sys.modules.get(n)) != m for n, m in project.items()):
+            for n in project:
+                sys.modules.pop(n, None)
+                baseline.discard(n)
+            project = {}
+
+        code, out = _captured(argv)
+
+        for name in set(sys.modules) - baseline:
+            del sys.modules[name]
+        sys.path[:] = base_path
+        sys.argv[:] = base_argv
+        os.chdir(root)
+        conn.send((code, out, _rss_bytes()))
+
+
+def _mtime(mod: Any) -> float:
+    path = getattr(mod, "__file__", None)
+    if not path:
+        return -2.0
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return -1.0
+
+
+# ---- 主进程侧 ----
+
+class _Worker:
+    def __init__(self, ctx: Any, root: str, preload: Sequence[str], preload_project: bool) -> None:
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, root, tuple(preload), preload_project), daemon=True)
+        self.proc.start()
+        child.close()
+        self.jobs = 0
+        self.pid = self.proc.pid
+
+    def wait_ready(self, timeout: float) -> bool:
+        if not self.conn.poll(timeout):
+            return False
+        try:
+            msg = self.conn.recv()
+        except EOFError:
+            return False
+        return isinstance(msg, tuple) and msg[0] == "ready"
+
+    def stop(self, timeout: float = 2.0) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join()
+        self.conn.close()
+
+    def kill(self) -> None:
+        self.proc.kill()
+        self.proc.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        root: str = REPO_ROOT,
+        size: int = 2,
+        *,
+        max_jobs: int = 100,
+        max_rss_mb: float = 512.0,
+        timeout: float = 120.0,
+        preload: Sequence[str] = ("pytest",),
+        preload_project: bool = True,
+        start_method: Optional[str] = None,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.prefix = os.path.basename(self.root)
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss = int(max_rss_mb * 1024 * 1024)
+        self.timeout = timeout
+        self.preload = tuple(preload)
+        self.preload_project = preload_project
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        # 只取上下文、不改它：set_forkserver_preload 是进程级设置，会影响别处的 forkserver 用法
+        self._ctx = mp.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        # 所有活着的 worker（空闲 + 正在跑任务），close() 据此全部结束
+        self._workers: Set[_Worker] = set()
+        self._pending = 0                      # 正在补的 worker 数
+        self._spawn_error: Optional[str] = None
+        self._stats = {"jobs": 0, "timeouts": 0, "wait_timeouts": 0, "rejected": 0,
+                       "spawned": 0, "spawn_failed": 0, "recycled": 0, "crashed": 0}
+
+    # ---- 生命周期 ----
+
+    def start(self) -> "WorkerPool":
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+        return self
+
+    def __enter__(self) -> "WorkerPool":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._retire(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        # 还在跑任务的 worker 直接 kill（对应的 run() 按 worker 退出返回）
+        with self._lock:
+            busy = list(self._workers)
+        for w in busy:
+            self._retire(w, kill=True)
+
+    def _spawn(self) -> _Worker:
+        w = _Worker(self._ctx, self.root, self.preload, self.preload_project)
+        with self._lock:
+            self._workers.add(w)
+        if not w.wait_ready(60.0):
+            self._retire(w, kill=True)
+            raise RuntimeError(f"worker {w.pid} failed to start")
+        with self._lock:
+            self._stats["spawned"] += 1
+        return w
+
+    def _retire(self, w: _Worker, *, kill: bool = False) -> None:
+        with self._lock:
+            self._workers.discard(w)
+        if kill:
+            w.kill()
+        else:
+            w.stop()
+
+    def _replace(self) -> None:
+        """
+        补一个新 worker 进空闲队列（run() 里的回收 / 超时 / 崩溃都在后台补，不拖长 run()）。
+        失败按退避重试 SPAWN_RETRIES 次；仍失败只记进 stats（spawn_failed / spawn_error），不抛出
+        """
+        with self._lock:
+            self._pending += 1
+
+        def spawn() -> None:
+            try:
+                for attempt in range(SPAWN_RETRIES):
+                    if attempt:
+                        time.sleep(0.5 * 2 ** (attempt - 1))
+                    if self._closed:
+                        return
+                    try:
+                        w = self._spawn()
+                    except Exception as exc:  # noqa: BLE001 - 记下原因后重试
+                        with self._lock:
+                            self._stats["spawn_failed"] += 1
+                            self._spawn_error = repr(exc)
+                        continue
+                    if self._closed:
+                        self._retire(w)
+                    else:
+                        self._idle.put(w)
+                    return
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+        threading.Thread(target=spawn, daemon=True).start()
+
+    def _acquire(self, deadline: float) -> Optional[_Worker]:
+        """取一个空闲 worker，最多等到 deadline（超时返回 None）；池里已没有活 worker 时立即报错"""
+        while True:
+            if self._closed:
+                raise RuntimeError("worker pool is closed")
+            with self._lock:
+                alive = len(self._workers) + self._pending
+                error = self._spawn_error
+            if alive == 0:
+                raise RuntimeError(f"worker pool has no live workers (last spawn error: {error})")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                # 分段等：期间 worker 可能全部补失败，要能及时发现
+                return self._idle.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, idle=self._idle.qsize(), live=len(self._workers),
+                        spawn_error=self._spawn_error)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    # ---- 任务 ----
+
+    def _check_lease(self, capability: str, lease: Lease, scope: str) -> None:
+        if lease.is_expired():
+            raise JobRejected(f"lease for {lease.capability} (rid={lease.bound_rid}) has expired")
+        if not lease.covers(Request(capability, scope)):
+            raise JobRejected(f"lease {lease.capability} {lease.scope_patterns} does not cover {capability} {scope}")
+
+    def _check_args(self, kind: str, capability: str, lease: Lease, args: Sequence[str]) -> None:
+        """调用方参数：选项必须在白名单里；路径（可带 ::test 选择器）必须在仓库内且被 lease 覆盖"""
+        flags, valued = SAFE_FLAGS[kind], VALUE_OPTIONS[kind]
+        i = 0
+        while i < len(args):
+            a = args[i]
+            i += 1
+            if a.startswith("-"):
+                if a in flags or ("=" in a and a.split("=", 1)[0] in valued):
+                    continue
+                if a in valued and i < len(args):
+                    i += 1
+                    continue
+                raise JobRejected(f"option not allowed for {kind}: {a}")
+            path = a.split("::", 1)[0]
+            full = os.path.normpath(os.path.join(self.root, path))
+            if full != self.root and not full.startswith(self.root + os.sep):
+                raise JobRejected(f"path outside {self.prefix}: {a}")
+            rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+            self._check_lease(capability, lease, self.prefix if rel == "." else f"{self.prefix}/{rel}")
+
+    def run(
+        self,
+        kind: str,
+        lease: Lease,
+        args: Optional[Sequence[str]] = None,
+        *,
+        scope: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> JobResult:
+        """
+        kind：JOB_KINDS 里的任务类型；args 追加在默认命令行后面（如 pytest 的测试文件）
+        scope：任务作用域（默认按任务类型，如 "repo_sim/tests/**"），必须被 lease 覆盖
+        timeout：从调用开始计时，等空闲 worker 的时间也算在内
+        """
+        if self._closed:
+            raise RuntimeError("worker pool is closed")
+        if kind not in JOB_KINDS:
+            raise ValueError(f"unknown job kind: {kind}")
+        capability, argv, default_scope = JOB_KINDS[kind]
+        scope = scope or f"{self.prefix}/{default_scope}"
+        try:
+            self._check_lease(capability, lease, scope)
+            self._check_args(kind, capability, lease, args or ())
+        except JobRejected:
+            self._count("rejected")
+            raise
+        argv = [*argv, *(args or ())]
+        timeout = self.timeout if timeout is None else timeout
+
+        t0 = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        w = self._acquire(deadline)
+        if w is None:
+            self._count("wait_timeouts")
+            return JobResult(ok=False, returncode=-1, stdout=f"no idle worker within {timeout:.1f}s",
+                             elapsed_s=time.perf_counter() - t0, worker_pid=0,
+                             capability=lease.capability, bound_rid=lease.bound_rid, timed_out=True)
+        result = JobResult(ok=False, returncode=-1, stdout="", elapsed_s=0.0, worker_pid=w.pid,
+                           capability=lease.capability, bound_rid=lease.bound_rid)
+        try:
+            w.conn.send(argv)
+            if not w.conn.poll(max(0.0, deadline - time.monotonic())):
+                result.timed_out = True
+                result.stdout = f"job timed out after {timeout:.1f}s"
+                self._retire(w, kill=True)
+                self._count("timeouts")
+                self._replace()
+                return result
+            code, out, rss = w.conn.recv()
+        except (EOFError, OSError) as exc:
+            result.stdout = f"worker {w.pid} died: {exc!r}"
+            self._retire(w, kill=True)
+            self._count("crashed")
+            self._replace()
+            return result
+        finally:
+            result.elapsed_s = time.perf_counter() - t0
+
+        self._count("jobs")
+        w.jobs += 1
+        result.ok = code == 0
+        result.returncode = code
+        result.stdout = out
+        if self._closed:
+            self._retire(w)
+        elif w.jobs >= self.max_jobs or rss > self.max_rss:
+            result.recycled = True
+            self._count("recycled")
+            self._retire(w)
+            self._replace()
+        else:
+            self._idle.put(w)
+        return result
@@ -2,17 +2,194 @@
 审计日志：把每次授权/拒绝记录下来，便于复查/重放。
 
 demo 写到 .audit/ 目录下的 jsonl 文件。
+
+写入走后台线程（AuditWriter）：
+- log_event 在调用方线程序列化成一行 JSON（不能序列化的事件直接在调用方报错），再放进队列，授权路径不等待磁盘
+- 后台线程按批写入（攒够 max_batch 条或每 flush_interval 秒一次），可选每批 fsync
+- 文件超过 max_bytes 或打开超过 max_age 秒时轮转为 audit.jsonl.<n>
+- flush()/close() 保证队列里的事件全部落盘；进程退出时自动 close
 """
 from __future__ import annotations
-import os, json, time
-from typing import Any, Dict
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
 
 AUDIT_DIR = ".audit"
+AUDIT_FILE = "audit.jsonl"
+
+_STOP = object()
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        directory: str = AUDIT_DIR,
+        filename: str = AUDIT_FILE,
+        *,
+        max_batch: int = 256,
+        flush_interval: float = 0.2,
+        fsync: bool = False,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self.directory = directory
+        self.filename = filename
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.last_error: Optional[BaseException] = None
+
+        self._q: "queue.Queue[Any]" = queue.Queue()
+        self._f = None
+        self._opened_at = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, self.filename)
+
+    # ---- 调用方 API ----
+
+    def log(self, event: Dict[str, Any]) -> None:
+        if self._closed:
+            raise RuntimeError("AuditWriter is closed")
+        # 在这里序列化：不能 JSON 化的事件（如 payload 里有 set）由调用方收到 TypeError，不会打死后台线程
+        self._q.put(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """阻塞到此前入队的事件全部写入文件；超时返回 False"""
+        if self._closed:
+            return True
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._q.put(done)
+        return done.wait(timeout)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(_STOP)
+        self._thread.join()
+
+    # ---- 后台线程 ----
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch: List[str] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            item = first
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                if batch:
+                    self._write_batch(batch)
+            finally:
+                # 即使写入出错也要唤醒 flush()，不能让调用方永远等下去
+                for w in waiters:
+                    w.set()
+            if stop:
+                self._close_file()
+                return
+
+    def _open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _close_file(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _rotate_if_needed(self) -> None:
+        f = self._f
+        if f is None:
+            return
+        too_big = self.max_bytes is not None and f.tell() >= self.max_bytes
+        too_old = self.max_age is not None and time.time() - self._opened_at >= self.max_age
+        if not (too_big or too_old):
+            return
+        self._close_file()
+        n = 1
+        while os.path.exists(f"{self.path}.{n}"):
+            n += 1
+        os.replace(self.path, f"{self.path}.{n}")
+
+    def _write_batch(self, batch: List[str]) -> None:
+        try:
+            if self._f is None:
+                self._open()
+            f = self._f
+            assert f is not None
+            f.write("".join(batch))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            self._rotate_if_needed()
+        except Exception as exc:  # noqa: BLE001
+            # 不让后台线程退出；错误留给调用方检查
+            self.last_error = exc
+            print(f"[audit] write failed: {exc}", file=sys.stderr)
+
+
+_WRITER: Optional[AuditWriter] = None
+_WRITER_LOCK = threading.Lock()
+
+
+def get_writer() -> AuditWriter:
+    global _WRITER
+    if _WRITER is None:
+        with _WRITER_LOCK:
+            if _WRITER is None:
+                _WRITER = AuditWriter()
+                atexit.register(_WRITER.close)
+    return _WRITER
+
+
+def set_writer(writer: Optional[AuditWriter]) -> Optional[AuditWriter]:
+    """替换默认 writer（如自定义 fsync/轮转参数），返回旧的（调用方负责 close）"""
+    global _WRITER
+    with _WRITER_LOCK:
+        old, _WRITER = _WRITER, writer
+    if writer is not None:
+        atexit.register(writer.close)
+    return old
+
 
 def log_event(event: Dict[str, Any]) -> None:
-    os.makedirs(AUDIT_DIR, exist_ok=True)
-    path = os.path.join(AUDIT_DIR, "audit.jsonl")
     event = dict(event)
     event["ts"] = time.time()
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    get_writer().log(event)
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    return get_writer().flush(timeout) if _WRITER is not None else True
@@ -0,0 +1,320 @@
+"""
+审计日志索引：按 rid / capability / type / 时间桶 快速查询 .audit/audit.jsonl
+
+jsonl 仍然是唯一的事实来源（log_event 写出的记录格式不变）；
+每个日志文件旁边维护一个 sidecar 索引（<file>.idx，本身也是 jsonl，只追加）：
+  - 第一行是头（格式、时间桶、日志开头的指纹），之后每次 update() 追加一段
+    {"start", "end", "postings": 字段取值 -> 行起始偏移}，只写新增部分
+  - 同一个 AuditIndex 对象只在第一次使用时读一遍 sidecar，之后都在内存里合并
+  - 段数过多时整体压实重写一次（摊还）
+  - update()：只扫描上次索引之后新追加的部分（日志被替换/截断时整体重建）
+  - query()：对各条件的偏移列表求交集，再通过 mmap 按偏移读出对应行，不扫描全文
+  - 时间范围：先用时间桶（ts // bucket_seconds）粗筛，再按 ts 精确过滤
+
+AuditStore 把目录下的 audit.jsonl.<n>（轮转出的旧文件）和 audit.jsonl 当成一个整体查询。
+
+命令行：
+  python -m src.safe_boundary.audit_index --rid r0 --type DENY
+  python -m src.safe_boundary.audit_index --capability write:src --since 1770000000 --until 1770000900
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+from .audit import AUDIT_DIR, AUDIT_FILE
+
+_INDEX_FORMAT = 2
+_FIELDS = ("rid", "capability", "type")
+_HEAD_BYTES = 256
+# sidecar 段数超过这个值就压实成一段
+_MAX_SEGMENTS = 64
+
+
+def _head_hash(path: str, n: int) -> str:
+    """日志前 n 字节的指纹（日志只追加，前缀不变）"""
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(n), digest_size=8).hexdigest()
+
+
+def _intersect(a: List[int], b: List[int]) -> List[int]:
+    # 两个有序偏移列表求交集
+    if len(a) > len(b):
+        a, b = b, a
+    sb = set(b)
+    return [x for x in a if x in sb]
+
+
+def _empty_postings() -> Dict[str, Dict[str, List[int]]]:
+    return {f: {} for f in _FIELDS + ("bucket",)}
+
+
+class AuditIndex:
+    """单个 jsonl 文件的 sidecar 索引"""
+
+    def __init__(self, log_path: str, bucket_seconds: int = 60) -> None:
+        self.log_path = log_path
+        self.index_path = log_path + ".idx"
+        self.bucket_seconds = bucket_seconds
+        self.indexed_bytes = 0
+        # 日志开头的指纹：覆盖前 head_len 字节（日志不足 _HEAD_BYTES 时随增长补齐）
+        self.head = ""
+        self.head_len = 0
+        self.segments = 0
+        self._loaded = False
+        # field -> value -> [offset, ...]（偏移递增）
+        self.postings: Dict[str, Dict[str, List[int]]] = _empty_postings()
+
+    # ---- sidecar 读写 ----
+
+    def _reset(self) -> None:
+        self.indexed_bytes = 0
+        self.head = ""
+        self.head_len = 0
+        self.segments = 0
+        self.postings = _empty_postings()
+
+    def _header(self) -> Dict[str, Any]:
+        return {"format": _INDEX_FORMAT, "bucket_seconds": self.bucket_seconds}
+
+    def load(self) -> bool:
+        """读 sidecar 并合并各段；格式不符或损坏时返回 False（调用方重建）"""
+        self._loaded = True
+        self._reset()
+        if not os.path.isfile(self.index_path):
+            return False
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                if json.loads(f.readline() or "{}") != self._header():
+                    return False
+                for line in f:
+                    seg = json.loads(line) if line.endswith("\n") else None
+                    if seg is None or seg["start"] != self.indexed_bytes:
+                        # 上次追加没写完 / 段不连续：丢弃其后的内容，下次写入时整体重写
+                        self.segments = 0
+                        break
+                    self._merge(seg["postings"])
+                    self.indexed_bytes = seg["end"]
+                    self.head, self.head_len = seg["head"], seg["head_len"]
+                    self.segments += 1
+        except (OSError, ValueError, KeyError, TypeError):
+            self._reset()
+            return False
+        return True
+
+    def _merge(self, postings: Dict[str, Dict[str, List[int]]]) -> None:
+        for f, vals in postings.items():
+            mine = self.postings.setdefault(f, {})
+            for v, offs in vals.items():
+                mine.setdefault(v, []).extend(offs)
+
+    def save(self) -> None:
+        """整体重写（压实）：头 + 一段包含全部 postings"""
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self._header()) + "\n")
+            if self.indexed_bytes:
+                f.write(json.dumps(self._segment(0, self.postings), ensure_ascii=False) + "\n")
+        os.replace(tmp, self.index_path)
+        self.segments = 1 if self.indexed_bytes else 0
+
+    def _segment(self, start: int, postings: Dict[str, Dict[str, List[int]]]) -> Dict[str, Any]:
+        return {"start": start, "end": self.indexed_bytes, "head": self.head, "head_len": self.head_len,
+                "postings": postings}
+
+    def _append_segment(self, start: int, postings: Dict[str, Dict[str, List[int]]]) -> None:
+        if self.segments == 0 or self.segments >= _MAX_SEGMENTS or not os.path.isfile(self.index_path):
+            self.save()
+            return
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self._segment(start, postings), ensure_ascii=False) + "\n")
+        self.segments += 1
+
+    # ---- 增量建索引 ----
+
+    def _head_ok(self, size: int) -> bool:
+        if size < self.indexed_bytes:
+            return False
+        return not self.head_len or _head_hash(self.log_path, self.head_len) == self.head
+
+    def update(self) -> int:
+        """把新追加的行加入索引，返回新增行数"""
+        if not os.path.isfile(self.log_path):
+            self._reset()
+            return 0
+        size = os.path.getsize(self.log_path)
+        if not self._loaded:
+            self.load()
+        if self.indexed_bytes and not self._head_ok(size):
+            # 日志被截断或替换：重建
+            self._reset()
+        if size == self.indexed_bytes or size == 0:
+            return 0
+
+        added = 0
+        start = self.indexed_bytes
+        new = _empty_postings()
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = self.indexed_bytes
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                if end < 0:
+                    # 最后一行还没写完：下次再索引
+                    break
+                line = mm[pos:end]
+                if line.strip():
+                    try:
+                        ev = json.loads(line)
+                    except ValueError:
+                        ev = None
+                    if isinstance(ev, dict):
+                        self._add(new, ev, pos)
+                        added += 1
+                pos = end + 1
+            self.indexed_bytes = pos
+        if pos == start:
+            return 0
+        # 指纹覆盖的前缀不足 _HEAD_BYTES 时随日志增长补齐（前缀不变，不会误判为替换）
+        head_len = min(_HEAD_BYTES, self.indexed_bytes)
+        if head_len > self.head_len:
+            self.head, self.head_len = _head_hash(self.log_path, head_len), head_len
+        self._merge(new)
+        self._append_segment(start, new)
+        return added
+
+    def _add(self, postings: Dict[str, Dict[str, List[int]]], ev: Dict[str, Any], offset: int) -> None:
+        for f in _FIELDS:
+            v = ev.get(f)
+            if v is not None:
+                postings[f].setdefault(str(v), []).append(offset)
+        ts = ev.get("ts")
+        if isinstance(ts, (int, float)):
+            postings["bucket"].setdefault(str(int(ts // self.bucket_seconds)), []).append(offset)
+
+    # ---- 查询 ----
+
+    def _candidates(self, filters: Dict[str, str], since: Optional[float], until: Optional[float]) -> Optional[List[int]]:
+        result: Optional[List[int]] = None
+        for f, v in filters.items():
+            offs = self.postings.get(f, {}).get(str(v), [])
+            result = offs if result is None else _intersect(result, offs)
+            if not result:
+                return []
+        if since is not None or until is not None:
+            lo = int(since // self.bucket_seconds) if since is not None else None
+            hi = int(until // self.bucket_seconds) if until is not None else None
+            offs: List[int] = []
+            for b, bo in self.postings["bucket"].items():
+                bi = int(b)
+                if (lo is None or bi >= lo) and (hi is None or bi <= hi):
+                    offs.extend(bo)
+            offs.sort()
+            result = offs if result is None else _intersect(result, offs)
+        return result
+
+    def query(
+        self,
+        *,
+        rid: Optional[str] = None,
+        capability: Optional[str] = None,
+        type: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        self.update()
+        filters = {k: v for k, v in (("rid", rid), ("capability", capability), ("type", type)) if v is not None}
+        offsets = self._candidates(filters, since, until)
+        if not os.path.isfile(self.log_path) or os.path.getsize(self.log_path) == 0:
+            return
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if offsets is None:
+                # 没有任何条件：顺序读出全部已索引的行
+                offsets = self._all_offsets(mm)
+            for off in offsets:
+                end = mm.find(b"\n", off)
+                ev = json.loads(mm[off:end if end >= 0 else len(mm)])
+                ts = ev.get("ts")
+                if since is not None and (ts is None or ts < since):
+                    continue
+                if until is not None and (ts is None or ts > until):
+                    continue
+                yield ev
+
+    def _all_offsets(self, mm: mmap.mmap) -> List[int]:
+        out: List[int] = []
+        pos = 0
+        while pos < self.indexed_bytes:
+            end = mm.find(b"\n", pos)
+            if end < 0:
+                break
+            if mm[pos:end].strip():
+                out.append(pos)
+            pos = end + 1
+        return out
+
+
+class AuditStore:
+    """目录级查询：按时间顺序覆盖轮转文件 audit.jsonl.<n> 和当前文件 audit.jsonl"""
+
+    def __init__(self, directory: str = AUDIT_DIR, filename: str = AUDIT_FILE, bucket_seconds: int = 60) -> None:
+        self.directory = directory
+        self.filename = filename
+        self.bucket_seconds = bucket_seconds
+        self._indexes: Dict[str, AuditIndex] = {}
+
+    def log_files(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        pat = re.compile(re.escape(self.filename) + r"\.(\d+)$")
+        rotated = []
+        for fn in os.listdir(self.directory):
+            m = pat.match(fn)
+            if m:
+                rotated.append((int(m.group(1)), fn))
+        files = [os.path.join(self.directory, fn) for _, fn in sorted(rotated)]
+        current = os.path.join(self.directory, self.filename)
+        if os.path.isfile(current):
+            files.append(current)
+        return files
+
+    def _index(self, path: str) -> AuditIndex:
+        idx = self._indexes.get(path)
+        if idx is None:
+            idx = AuditIndex(path, bucket_seconds=self.bucket_seconds)
+            self._indexes[path] = idx
+        return idx
+
+    def update(self) -> int:
+        return sum(self._index(p).update() for p in self.log_files())
+
+    def query(self, **kw: Any) -> Iterator[Dict[str, Any]]:
+        for p in self.log_files():
+            yield from self._index(p).query(**kw)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="query .audit/audit.jsonl via sidecar index")
+    ap.add_argument("--dir", default=AUDIT_DIR)
+    ap.add_argument("--rid")
+    ap.add_argument("--capability")
+    ap.add_argument("--type", choices=["GRANT", "DENY"])
+    ap.add_argument("--since", type=float)
+    ap.add_argument("--until", type=float)
+    ap.add_argument("--limit", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    store = AuditStore(args.dir)
+    n = 0
+    for ev in store.query(rid=args.rid, capability=args.capability, type=args.type, since=args.since, until=args.until):
+        print(json.dumps(ev, ensure_ascii=False))
+        n += 1
+        if args.limit and n >= args.limit:
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,17 @@ Grant(q, r, E) iff q ∈ SafeBoundary(r) and EvidenceSupported(q, E)
 """
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Sequence
 import time
 
-from .models import Evidence, Lease, OrgPolicy, Request, RequirementNode, SafeBoundary
-from .boundary import compute_safe_boundary
-from .evidence import evidence_supported
+from .models import Lease, OrgPolicy, Request, RequirementNode, SafeBoundary
+from .boundary import cached_safe_boundary
+from .capabilities import register_cap
+from .evidence import EvidenceIndex, evidence_supported
 
-@dataclass
+_NETWORK_EGRESS = register_cap("network:egress")
+
+@dataclass(slots=True)
 class Decision:
     ok: bool
     lease: Optional[Lease] = None
@@ -22,8 +25,29 @@ class Decision:
     safe_boundary: Optional[SafeBoundary] = None
 
 def authorize(req: Request, r: RequirementNode, org: OrgPolicy, ttl_seconds: int = 300) -> Decision:
-    sb = compute_safe_boundary(r, org)
+    sb = cached_safe_boundary(r, org)
+    return _decide(req, r, sb, None, len(r.evidences), time.time() + ttl_seconds)
+
+def authorize_many(reqs: Sequence[Request], r: RequirementNode, org: OrgPolicy, ttl_seconds: int = 300) -> List[Decision]:
+    """
+    批量授权：同一个节点的一批请求只算一次 SafeBoundary、只扫描一次证据。
+    结果与逐个调用 authorize 相同（按输入顺序返回）。
+    同一批次发放的 lease 记录同一个证据快照位置。
+    """
+    sb = cached_safe_boundary(r, org)
+    index = EvidenceIndex.for_node(r)
+    snapshot = len(r.evidences)
+    expires_at = time.time() + ttl_seconds
+    return [_decide(req, r, sb, index, snapshot, expires_at) for req in reqs]
 
+def _decide(
+    req: Request,
+    r: RequirementNode,
+    sb: SafeBoundary,
+    index: Optional[EvidenceIndex],
+    snapshot: int,
+    expires_at: float,
+) -> Decision:
     # 1) 边界检查
     if not sb.allows(req):
         return Decision(
@@ -34,7 +58,7 @@ def authorize(req: Request, r: RequirementNode, org: OrgPolicy, ttl_seconds: int
         )
 
     # 2) 证据检查
-    if not evidence_supported(req, r, r.evidences):
+    if not evidence_supported(req, r, r.evidences, index):
         return Decision(
             ok=False,
             reason="需要更多证据支持该请求（EvidenceSupported=false）",
@@ -45,18 +69,18 @@ def authorize(req: Request, r: RequirementNode, org: OrgPolicy, ttl_seconds: int
     # 3) 授权：发放 lease（scope + TTL + evidence snapshot）
     lease = Lease(
         capability=req.capability,
-        scope_patterns=sb.allowed.get(req.capability, []),
-        expires_at=time.time() + ttl_seconds,
+        scope_patterns=list(sb.allowed.get(req.capability, [])),
+        expires_at=expires_at,
         bound_rid=r.rid,
-        evidence_snapshot=list(r.evidences),
+        evidence_upto=snapshot,
     )
     return Decision(ok=True, lease=lease, safe_boundary=sb)
 
 def _diagnose_violation(req: Request, sb: SafeBoundary, r: RequirementNode) -> str:
     # 能力越界
-    if req.capability not in sb.allowed:
+    if not sb.has(req.cid):
         # 可能是约束导致被剔除，也可能是模板里就没有
-        if req.capability == "network:egress" and "no-network" in r.constraints:
+        if req.cid == _NETWORK_EGRESS and "no-network" in r.constraints:
             return "拒绝：违反约束 no-network（network:egress 被硬禁止）"
         return f"拒绝：能力越界（{req.capability} 不在当前 goal={r.goal} 的安全能力范围内）"
 
@@ -64,11 +88,11 @@ def _diagnose_violation(req: Request, sb: SafeBoundary, r: RequirementNode) -> s
     return f"拒绝：作用域越界（{req.scope} 不在 {req.capability} 的允许作用域内）"
 
 def _suggest(req: Request, sb: SafeBoundary, r: RequirementNode) -> List[str]:
-    if req.capability == "network:egress" and "no-network" in r.constraints:
+    if req.cid == _NETWORK_EGRESS and "no-network" in r.constraints:
         return [
             "如果确实需要联网：请用户解除 no-network 约束，或创建新需求节点显式升级权限",
             "优先尝试离线方案（使用本地缓存/锁文件/镜像）",
         ]
-    if req.capability not in sb.allowed:
+    if not sb.has(req.cid):
         return ["检查是否需要该能力完成任务", "考虑拆分任务并创建新需求节点"]
     return ["检查该路径是否与当前 anchors 相关", "扩展 anchors 以包含该路径（或创建新需求）"]
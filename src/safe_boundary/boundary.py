@@ -4,40 +4,148 @@ ComputeSafeBoundary：CapabilityBound ∩ ScopeBound ∩ ¬ConstraintBound
 这里实现你 method_details 里的核心算法骨架。
 """
 from __future__ import annotations
-from typing import Dict, List
+from collections import OrderedDict
+import threading
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Tuple
+from .capabilities import names_of
 from .models import RequirementNode, SafeBoundary, OrgPolicy
-from .templates import t_max
-from .policy import build_constraint_bound
-from .scope_expand import expand_scope
+from .templates import t_max_mask, template_fingerprint
+from .policy import build_constraint_bound, forbidden_capability_mask
+from .scope_expand import expand_scope, graph_version
 
 def compute_safe_boundary(r: RequirementNode, org: OrgPolicy) -> SafeBoundary:
-    cap_bound = t_max(r.goal)
-    scope_bound = expand_scope(r.anchors, org=org)
+    # 能力层：CapabilityBound ∩ ¬ConstraintBound 用位图一次算完
     constraint_bound = build_constraint_bound(r.constraints, org=org)
+    caps = t_max_mask(r.goal) & ~constraint_bound.forbidden_caps
+    scope_bound = expand_scope(r.anchors, org=org)
 
-    allowed: Dict[str, List[str]] = {}
+    # 允许作用域：scope_bound - forbidden_paths（与能力无关，只算一次）
+    # demo 用“从 scope_bound 中剔除与 forbidden_paths 同类的 pattern”
+    allowed_scope = []
+    for sp in scope_bound:
+        # 简化：如果 pattern 包含 forbidden 的关键词就过滤
+        blocked = False
+        for fp in constraint_bound.forbidden_paths:
+            key = fp.split("/")[0].replace("**", "").replace("*", "")
+            if key and key in sp:
+                blocked = True
+                break
+        if not blocked:
+            allowed_scope.append(sp)
 
-    for c in cap_bound:
-        # 能力禁区：直接跳过
-        if c in constraint_bound.forbidden_capabilities:
-            continue
-
-        # 允许作用域：scope_bound - forbidden_paths
-        # demo 用“从 scope_bound 中剔除与 forbidden_paths 同类的 pattern”
-        allowed_scope = []
-        for sp in scope_bound:
-            # 简化：如果 pattern 包含 forbidden 的关键词就过滤
-            blocked = False
-            for fp in constraint_bound.forbidden_paths:
-                key = fp.split("/")[0].replace("**", "").replace("*", "")
-                if key and key in sp:
-                    blocked = True
-                    break
-            if not blocked:
-                allowed_scope.append(sp)
-
-        # 组合禁区（demo 没细化）
-        if allowed_scope:
-            allowed[c] = allowed_scope
+    allowed: Dict[str, List[str]] = {}
+    # 组合禁区（demo 没细化）
+    if allowed_scope:
+        for c in names_of(caps):
+            allowed[c] = list(allowed_scope)
 
     return SafeBoundary(allowed=allowed)
+
+
+def capability_mask(r: RequirementNode) -> int:
+    """只做能力层判定时用：T_max(goal) ∩ ¬能力禁区 的位图，不展开作用域"""
+    return t_max_mask(r.goal) & ~forbidden_capability_mask(r.constraints)
+
+
+def capability_masks(nodes: Iterable[RequirementNode]) -> Dict[str, int]:
+    """批量版 capability_mask：同一 goal / 同一约束集合只算一次"""
+    by_goal: Dict[str, int] = {}
+    by_constraints: Dict[FrozenSet[str], int] = {}
+    out: Dict[str, int] = {}
+    for r in nodes:
+        tm = by_goal.get(r.goal)
+        if tm is None:
+            tm = by_goal[r.goal] = t_max_mask(r.goal)
+        key = frozenset(r.constraints)
+        fm = by_constraints.get(key)
+        if fm is None:
+            fm = by_constraints[key] = forbidden_capability_mask(key)
+        out[r.rid] = tm & ~fm
+    return out
+
+
+# ---- 边界缓存 ----
+
+def boundary_fingerprint(r: RequirementNode, org: OrgPolicy) -> Tuple[Hashable, ...]:
+    """
+    SafeBoundary 只依赖这些输入：goal / anchors / constraints / 组织策略 / 能力模板 / 依赖图。
+    evidences / state 不影响边界本身（由 EvidenceSupported 和调用方负责）。
+    """
+    anchors: FrozenSet[Tuple[str, str]] = frozenset(r.anchors.items())
+    return (r.goal, anchors, frozenset(r.constraints), org.fingerprint(), template_fingerprint(), graph_version())
+
+
+class BoundaryCache:
+    """
+    compute_safe_boundary 的记忆化（LRU）。
+
+    - key：boundary_fingerprint(r, org)
+    - 节点每次被 RequirementGraph 的 on_* 事件修改都会换 version；
+      version 不变时直接复用上次算好的 fingerprint，省掉重新哈希 anchors
+      （anchors / constraints / OrgPolicy.forbidden_paths 都不可原地修改，赋值即换 version；
+      模板表被替换时 template_fingerprint 变化；fingerprint 记忆与边界共用 maxsize 的 LRU）
+    - 返回的 SafeBoundary 是共享对象，调用方不要修改
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Hashable, ...], SafeBoundary]" = OrderedDict()
+        # rid -> ((node.version, org.version, template_fingerprint, graph_version), fingerprint)，LRU
+        self._fp_by_rid: "OrderedDict[str, Tuple[Tuple[Hashable, ...], Tuple[Hashable, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fingerprint(self, r: RequirementNode, org: OrgPolicy) -> Tuple[Hashable, ...]:
+        # 版本号只读一次：并发更新时宁可多算一次，也不能把新内容记到旧版本下
+        versions = (r.version, org.version, template_fingerprint(), graph_version())
+        with self._lock:
+            memo = self._fp_by_rid.get(r.rid)
+            if memo is not None and memo[0] == versions:
+                self._fp_by_rid.move_to_end(r.rid)
+                return memo[1]
+        fp = boundary_fingerprint(r, org)
+        with self._lock:
+            self._fp_by_rid[r.rid] = (versions, fp)
+            self._fp_by_rid.move_to_end(r.rid)
+            if len(self._fp_by_rid) > self.maxsize:
+                self._fp_by_rid.popitem(last=False)
+        return fp
+
+    def get(self, r: RequirementNode, org: OrgPolicy) -> SafeBoundary:
+        key = self._fingerprint(r, org)
+        with self._lock:
+            sb = self._entries.get(key)
+            if sb is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return sb
+            self.misses += 1
+
+        # 计算放在锁外：并发未命中同一个 key 时可能重复计算，结果相同
+        sb = compute_safe_boundary(r, org)
+        with self._lock:
+            self._entries[key] = sb
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return sb
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fp_by_rid.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+_DEFAULT_CACHE = BoundaryCache()
+
+def cached_safe_boundary(r: RequirementNode, org: OrgPolicy) -> SafeBoundary:
+    """带缓存的 compute_safe_boundary（进程内共享一个默认缓存）"""
+    return _DEFAULT_CACHE.get(r, org)
+
+def boundary_cache() -> BoundaryCache:
+    return _DEFAULT_CACHE
@@ -0,0 +1,102 @@
+"""
+能力注册表：把能力名（"exec:test" 等）驻留成小整数 ID。
+
+- 同一个名字全进程只有一个 str 对象（sys.intern），一个固定 ID
+- Request / Lease 构造时记下 cid，热路径上按整数比较而不是字符串比较
+- 只有模板里的能力（templates.C_ALL）和代码里写死的名字会注册（register_cap）；
+  请求里出现的未知名字（例如 LLM 或守护进程客户端提出的）只查不注册，得到 UNKNOWN_CAP，
+  它不在任何位图里，注册表和位图不会被外部输入撑大
+- 能力集合可表示成 int 位图（mask_of / names_of），交并差都是位运算
+"""
+from __future__ import annotations
+import sys
+import threading
+from typing import Dict, Iterable, List
+
+# 未注册能力的 ID：不对应任何位，has_cap 恒为 False
+UNKNOWN_CAP = -1
+
+
+class CapabilityRegistry:
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._lock = threading.Lock()
+
+    def lookup(self, name: str) -> int:
+        """已注册能力的 ID；未注册返回 UNKNOWN_CAP（不注册）"""
+        return self._ids.get(name, UNKNOWN_CAP)
+
+    def intern(self, name: str) -> int:
+        """注册（已注册则直接返回 ID）；只用于可信的能力名"""
+        i = self._ids.get(name)
+        if i is None:
+            with self._lock:
+                i = self._ids.get(name)
+                if i is None:
+                    i = len(self._names)
+                    self._names.append(sys.intern(name))
+                    self._ids[self._names[i]] = i
+        return i
+
+    def name(self, cid: int) -> str:
+        return self._names[cid]
+
+    def canonical(self, name: str) -> str:
+        """返回驻留后的名字对象（未注册的原样返回）"""
+        i = self._ids.get(name)
+        return name if i is None else self._names[i]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._ids
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+_REGISTRY = CapabilityRegistry()
+
+
+def capability_registry() -> CapabilityRegistry:
+    return _REGISTRY
+
+
+def cap_id(name: str) -> int:
+    """能力名 -> ID；未注册的返回 UNKNOWN_CAP"""
+    return _REGISTRY.lookup(name)
+
+
+def register_cap(name: str) -> int:
+    return _REGISTRY.intern(name)
+
+
+def cap_name(cid: int) -> str:
+    return _REGISTRY.name(cid)
+
+
+# ---- 能力集合的位图表示：第 cid 位为 1 表示包含该能力 ----
+
+def mask_of(names: Iterable[str]) -> int:
+    """能力名 -> 位图；未注册的名字不占位"""
+    m = 0
+    for n in names:
+        cid = _REGISTRY.lookup(n)
+        if cid >= 0:
+            m |= 1 << cid
+    return m
+
+
+def names_of(mask: int) -> List[str]:
+    """位图 -> 能力名（按 ID 升序）"""
+    out: List[str] = []
+    cid = 0
+    while mask:
+        if mask & 1:
+            out.append(_REGISTRY.name(cid))
+        mask >>= 1
+        cid += 1
+    return out
+
+
+def has_cap(mask: int, cid: int) -> bool:
+    return cid >= 0 and (mask >> cid) & 1 == 1
@@ -0,0 +1,435 @@
+"""
+授权守护进程：一个常驻的 asyncio 服务，给一组 Agent 共用同一份“热”的边界引擎。
+
+进程内共享：RequirementGraph / OrgPolicy / 依赖图 / T_max 与边界缓存。
+Agent 通过 Unix socket（或 localhost TCP）发送按行分隔的 JSON 请求：
+
+  {"id": 1, "op": "authorize", "rid": "r0", "capability": "write:src", "scope": "repo_sim/src/auth/login.py"}
+  -> {"id": 1, "ok": true, "result": {"ok": true, "lease": {...}}}
+
+op：
+  - instruction     rid, goal, constraints, anchors   创建需求节点（rid 已存在时报错）
+  - add_constraints rid, constraints                  给已有节点追加约束（只增不减）
+  - run_tests       rid, ok, stdout                   证据写入（测试结果）
+  - code_patch      rid, path, diff                   证据写入（diff）
+  - authorize       rid, capability, scope, ttl
+  - authorize_many  rid, requests=[[capability, scope], ...], ttl
+  - stats / ping
+
+同一连接上的请求并发处理，响应按 id 对应（不保证顺序）。
+边界计算等 CPU 工作放到执行器里跑，事件循环只做 IO。
+需求图按节点加锁、授权读 view() 快照，执行器可以开多线程（--workers）。
+
+命令行：
+  python -m src.safe_boundary.daemon                 # 默认 $XDG_RUNTIME_DIR 或 /tmp/safe_boundary-<uid>/ 下
+  python -m src.safe_boundary.daemon --socket /run/user/1000/sb.sock
+  python -m src.safe_boundary.daemon --port 8765
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .audit import log_event
+from .authorize import Decision, authorize, authorize_many
+from .boundary import boundary_cache
+from .graph import RequirementGraph
+from .models import OrgPolicy, Request, RequirementNode
+from .scope_expand import dep_graph_handle
+from .templates import t_max, template_goals
+
+log = logging.getLogger("safe_boundary.daemon")
+
+# 默认 socket 放在只有当前用户可访问的目录里（0700），socket 文件本身 0600
+DEFAULT_SOCKET = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"safe_boundary-{os.getuid()}"),
+    "safe_boundary.sock",
+)
+# 单行请求上限（run_tests 会带完整测试日志）
+LINE_LIMIT = 16 * 1024 * 1024
+# 每条连接同时在处理的请求数上限：满了就暂停读该连接（背压），内存不随客户端发送速度增长
+MAX_INFLIGHT = 64
+
+
+class DaemonError(Exception):
+    """请求本身有问题（未知 op、缺字段、未知 rid）：返回给客户端，不影响连接"""
+
+
+def decision_to_dict(d: Decision) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"ok": d.ok}
+    if d.lease is not None:
+        out["lease"] = {
+            "capability": d.lease.capability,
+            "scope_patterns": d.lease.scope_patterns,
+            "expires_at": d.lease.expires_at,
+            "bound_rid": d.lease.bound_rid,
+        }
+    if d.reason is not None:
+        out["reason"] = d.reason
+    if d.suggestion is not None:
+        out["suggestion"] = d.suggestion
+    return out
+
+
+def _prepare_socket_path(path: str) -> None:
+    """
+    监听前检查 socket 路径：
+      - 父目录不存在时按 0700 创建；已存在时必须是当前用户所有、group/other 无任何权限的真实目录
+        （否则别的本地用户可以抢先建好目录、替换 socket）
+      - 已有文件不是 socket：拒绝（不删除别人的文件）
+      - 已有 socket 仍有进程在监听：拒绝；连不上（残留）才删除
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    if not os.path.lexists(parent):
+        os.makedirs(parent, mode=0o700)
+    pst = os.lstat(parent)
+    if not stat.S_ISDIR(pst.st_mode):
+        raise DaemonError(f"socket directory {parent} is not a directory")
+    if pst.st_uid != os.getuid():
+        raise DaemonError(f"socket directory {parent} is owned by uid {pst.st_uid}, not {os.getuid()}")
+    if pst.st_mode & 0o077:
+        raise DaemonError(f"socket directory {parent} has mode {stat.S_IMODE(pst.st_mode):o}, expected 700")
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise DaemonError(f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise DaemonError(f"another daemon is already listening on {path}")
+
+
+class _LineTooLong(Exception):
+    pass
+
+
+async def _read_line(reader: asyncio.StreamReader) -> bytes:
+    """读一行（含换行）；EOF 返回剩余数据（可能为 b""）；超过 LINE_LIMIT 的行整行丢弃后抛 _LineTooLong"""
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as exc:
+        return exc.partial
+    except asyncio.LimitOverrunError:
+        pass
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            break
+        except asyncio.IncompleteReadError:
+            break
+        except asyncio.LimitOverrunError as exc:
+            try:
+                await reader.readexactly(exc.consumed)
+            except asyncio.IncompleteReadError:
+                break
+    raise _LineTooLong()
+
+
+class AuthEngine:
+    """守护进程持有的共享状态；方法都是同步的，由 AuthDaemon 放到执行器里调用"""
+
+    def __init__(self, org: Optional[OrgPolicy] = None, graph: Optional[RequirementGraph] = None, *, audit: bool = False) -> None:
+        self.org = org or OrgPolicy()
+        self.graph = graph or RequirementGraph()
+        self.audit = audit
+        self.requests = 0
+        self._requests_lock = threading.Lock()   # 执行器多线程时计数不能丢
+
+    def warm(self) -> None:
+        """启动时预热：依赖图、各 goal 的 T_max"""
+        dep_graph_handle().warm()
+        for goal in template_goals():
+            t_max(goal)
+
+    def _node(self, rid: str) -> RequirementNode:
+        """rid 对应节点的一致快照；未知 rid 报 DaemonError"""
+        if rid not in self.graph.nodes:
+            raise DaemonError(f"unknown rid: {rid}")
+        return self.graph.view(rid)
+
+    def instruction(self, rid: str, goal: str, constraints: Optional[List[str]] = None,
+                    anchors: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        # 不允许覆盖已有节点：否则任何客户端都能用空 constraints 抹掉别的 Agent 的约束和证据
+        with self.graph.node_lock(rid):
+            if rid in self.graph.nodes:
+                raise DaemonError(f"rid already exists: {rid} (use add_constraints to tighten it)")
+            node = self.graph.on_user_instruction(rid, goal=goal, constraints=set(constraints or ()), anchors=anchors or {})
+        return {"rid": node.rid, "version": node.version}
+
+    def add_constraints(self, rid: str, constraints: List[str]) -> Dict[str, Any]:
+        """只能追加约束，不能删除"""
+        self._node(rid)
+        node = self.graph.on_add_constraints(rid, set(constraints))
+        view = self.graph.view(node.rid)
+        return {"constraints": sorted(view.constraints), "version": view.version}
+
+    def run_tests(self, rid: str, ok: bool, stdout: str = "") -> Dict[str, Any]:
+        # 必须是 JSON 布尔值：bool("false") 为 True，会把失败当成通过并完成节点
+        if not isinstance(ok, bool):
+            raise TypeError(f"ok must be a JSON boolean, got {type(ok).__name__}")
+        self._node(rid)
+        self.graph.on_run_tests(rid, ok=ok, stdout=stdout)
+        node = self.graph.view(rid)
+        return {"state": node.state, "anchors": dict(node.anchors), "version": node.version}
+
+    def code_patch(self, rid: str, path: str, diff: str = "") -> Dict[str, Any]:
+        self._node(rid)
+        self.graph.on_code_patch(rid, path=path, diff_summary=diff)
+        return {"version": self.graph.view(rid).version}
+
+    def _audit(self, rid: str, req: Request, d: Decision) -> None:
+        if not self.audit:
+            return
+        ev: Dict[str, Any] = {"type": "GRANT" if d.ok else "DENY", "rid": rid,
+                              "capability": req.capability, "scope": req.scope}
+        if d.lease is not None:
+            ev["lease_expires_at"] = d.lease.expires_at
+        else:
+            ev["reason"] = d.reason
+        log_event(ev)
+
+    def authorize(self, rid: str, capability: str, scope: str, ttl: int = 300) -> Dict[str, Any]:
+        node = self._node(rid)
+        req = Request(capability, scope)
+        d = authorize(req, node, self.org, ttl_seconds=ttl)
+        with self._requests_lock:
+            self.requests += 1
+        self._audit(rid, req, d)
+        return decision_to_dict(d)
+
+    def authorize_many(self, rid: str, requests: List[Tuple[str, str]], ttl: int = 300) -> List[Dict[str, Any]]:
+        node = self._node(rid)
+        reqs = [Request(c, s) for c, s in requests]
+        ds = authorize_many(reqs, node, self.org, ttl_seconds=ttl)
+        with self._requests_lock:
+            self.requests += len(reqs)
+        for req, d in zip(reqs, ds):
+            self._audit(rid, req, d)
+        return [decision_to_dict(d) for d in ds]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"nodes": len(self.graph.nodes), "requests": self.requests, "boundary_cache": boundary_cache().stats()}
+
+
+class AuthDaemon:
+    def __init__(self, engine: Optional[AuthEngine] = None, *, workers: int = 1) -> None:
+        self.engine = engine or AuthEngine()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth-engine")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._ops: Dict[str, Callable[..., Any]] = {
+            "instruction": self.engine.instruction,
+            "add_constraints": self.engine.add_constraints,
+            "run_tests": self.engine.run_tests,
+            "code_patch": self.engine.code_patch,
+            "authorize": self.engine.authorize,
+            "authorize_many": self.engine.authorize_many,
+            "stats": self.engine.stats,
+        }
+
+    async def start(self, *, path: Optional[str] = None, host: str = "127.0.0.1", port: Optional[int] = None) -> None:
+        """path 给定时监听 Unix socket，否则监听 host:port（port=0 表示随机端口）"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.engine.warm)
+        if path is not None:
+            _prepare_socket_path(path)
+            # bind 时 socket 就是 0600（不留先按默认 umask 创建、再 chmod 的窗口）
+            old_umask = os.umask(0o177)
+            try:
+                self._server = await asyncio.start_unix_server(self._handle, path=path, limit=LINE_LIMIT)
+            finally:
+                os.umask(old_umask)
+            os.chmod(path, 0o600)
+        else:
+            self._server = await asyncio.start_server(self._handle, host=host, port=port or 0, limit=LINE_LIMIT)
+        log.info("listening on %s", self.address)
+
+    @property
+    def address(self) -> Any:
+        assert self._server is not None
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self) -> None:
+        assert self._server is not None
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        write_lock = asyncio.Lock()
+        inflight = asyncio.Semaphore(MAX_INFLIGHT)
+        tasks = set()
+
+        def done(t: "asyncio.Task[None]") -> None:
+            tasks.discard(t)
+            inflight.release()
+
+        try:
+            while True:
+                try:
+                    line = await _read_line(reader)
+                except _LineTooLong:
+                    await self._reply(writer, write_lock,
+                                      {"id": None, "ok": False, "error": f"request line exceeds {LINE_LIMIT} bytes"})
+                    continue
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                await inflight.acquire()
+                t = asyncio.create_task(self._serve_one(line, writer, write_lock))
+                tasks.add(t)
+                t.add_done_callback(done)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_one(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock) -> None:
+        rid_: Any = None
+        try:
+            msg = json.loads(line)
+            if not isinstance(msg, dict):
+                raise TypeError(f"request must be a JSON object, got {type(msg).__name__}")
+            rid_ = msg.get("id")
+            resp = {"id": rid_, "ok": True, "result": await self.dispatch(msg)}
+        except DaemonError as exc:
+            resp = {"id": rid_, "ok": False, "error": str(exc)}
+        except (ValueError, TypeError, KeyError) as exc:
+            resp = {"id": rid_, "ok": False, "error": f"bad request: {exc}"}
+        except Exception as exc:
+            log.exception("request failed: %r", line[:200])
+            resp = {"id": rid_, "ok": False, "error": f"internal error: {exc}"}
+        await self._reply(writer, write_lock, resp)
+
+    async def _reply(self, writer: asyncio.StreamWriter, write_lock: asyncio.Lock, resp: Dict[str, Any]) -> None:
+        data = json.dumps(resp, ensure_ascii=False).encode("utf-8") + b"\n"
+        async with write_lock:
+            writer.write(data)
+            await writer.drain()
+
+    async def dispatch(self, msg: Dict[str, Any]) -> Any:
+        op = msg.get("op")
+        if op == "ping":
+            return "pong"
+        fn = self._ops.get(op or "")
+        if fn is None:
+            raise DaemonError(f"unknown op: {op}")
+        kwargs = {k: v for k, v in msg.items() if k not in ("id", "op")}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(**kwargs))
+
+
+class AuthClient:
+    """
+    asyncio 客户端：一条连接上可并发发多个请求（按 id 匹配响应）。
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._pending: Dict[int, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, *, path: Optional[str] = None, host: str = "127.0.0.1", port: Optional[int] = None) -> "AuthClient":
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                resp = json.loads(line)
+                fut = self._pending.pop(resp.get("id"), None)
+                if fut is not None and not fut.done():
+                    fut.set_result(resp)
+        finally:
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError("daemon connection closed"))
+            self._pending.clear()
+
+    async def call(self, op: str, **kwargs: Any) -> Any:
+        self._next_id += 1
+        mid = self._next_id
+        fut: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._pending[mid] = fut
+        self._writer.write(json.dumps({"id": mid, "op": op, **kwargs}, ensure_ascii=False).encode("utf-8") + b"\n")
+        await self._writer.drain()
+        resp = await fut
+        if not resp.get("ok"):
+            raise DaemonError(resp.get("error", "daemon error"))
+        return resp.get("result")
+
+    async def authorize(self, rid: str, capability: str, scope: str, ttl: int = 300) -> Dict[str, Any]:
+        return await self.call("authorize", rid=rid, capability=capability, scope=scope, ttl=ttl)
+
+    async def authorize_many(self, rid: str, requests: List[Tuple[str, str]], ttl: int = 300) -> List[Dict[str, Any]]:
+        return await self.call("authorize_many", rid=rid, requests=[list(r) for r in requests], ttl=ttl)
+
+    async def close(self) -> None:
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._reader_task.cancel()
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    daemon = AuthDaemon(AuthEngine(audit=args.audit), workers=args.workers)
+    if args.port is not None:
+        await daemon.start(host=args.host, port=args.port)
+    else:
+        await daemon.start(path=args.socket)
+    try:
+        await daemon.serve_forever()
+    finally:
+        await daemon.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="shared safe_boundary authorization daemon")
+    ap.add_argument("--socket", default=DEFAULT_SOCKET, help="unix socket path (default)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, help="listen on TCP host:port instead of a unix socket")
+    ap.add_argument("--workers", type=int, default=1, help="executor threads for boundary work")
+    ap.add_argument("--audit", action="store_true", help="write GRANT/DENY to the audit log")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+依赖图存储（增量 + 持久化）
+
+scope_expand 需要 deps / rev_deps 两张表。全量构建要 walk 整个仓库并 ast.parse 每个 .py，
+大仓库上很慢；而且 apply_patch 写文件后图就过期了。
+
+DepGraphStore 为每个文件记录 (mtime, size, content hash, imports)：
+  - refresh()：只对 stat 变化的文件重新读取；hash 也变了才重新 parse
+  - 修改/新增/删除文件时，原地修补 deps / rev_deps 的边
+  - save()/load()：落盘到 JSON 缓存文件，新进程从上次的图出发，只需一次 stat 扫描
+    refresh() 只标记 dirty，距上次落盘超过 save_interval 才写；进程退出前调用 flush() 写掉剩下的
+  - 冷启动文件很多时，读取/解析分片到进程池并行执行；小仓库自动退回串行
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+import ast
+import hashlib
+import json
+import os
+import threading
+import time
+
+_CACHE_FORMAT = 1
+_MAX_CHUNK = 512  # 进程池每个任务最多处理的文件数
+
+
+def imports_in_source(src: str) -> Set[str]:
+    """解析源码里 import / from ... import 的模块名（语法错误时返回空集）"""
+    try:
+        tree = ast.parse(src)
+    except SyntaxError:
+        return set()
+
+    mods: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                mods.add(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            if node.module:
+                mods.add(node.module)
+    return mods
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def scan_file(abs_path: str, known_hash: Optional[str] = None) -> Optional[Tuple[str, Optional[Set[str]]]]:
+    """
+    读取 + hash + 解析单个文件：
+      - 文件不存在：None
+      - hash 与 known_hash 相同：(hash, None)，跳过 parse
+      - 否则：(hash, imports)
+    放在模块顶层，便于进程池 pickle。
+    """
+    try:
+        with open(abs_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    h = content_hash(data)
+    if h == known_hash:
+        return h, None
+    return h, imports_in_source(data.decode("utf-8", errors="replace"))
+
+
+def _scan_batch(jobs: List[Tuple[str, Optional[str]]]) -> List[Optional[Tuple[str, Optional[Set[str]]]]]:
+    return [scan_file(path, known) for path, known in jobs]
+
+
+def module_name_for(rel_in_root: str) -> str:
+    """
+    仓库内相对路径 -> 模块名
+      e.g. "src/auth/login.py"    -> "src.auth.login"
+           "src/auth/__init__.py" -> "src.auth"
+    """
+    mod = rel_in_root[:-3] if rel_in_root.endswith(".py") else rel_in_root
+    parts = mod.split("/")
+    if parts and parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+@dataclass
+class FileEntry:
+    mtime: float
+    size: int
+    hash: str
+    imports: Set[str] = field(default_factory=set)
+
+
+class DepGraphStore:
+    """
+    deps[a] = {b1,b2} 表示 a 依赖 b
+    rev[b]  = {a1,a2} 表示 哪些文件依赖 b
+    key 都是带 prefix 的路径（如 "repo_sim/src/auth/login.py"）
+    """
+
+    def __init__(
+        self,
+        root: str,
+        prefix: Optional[str] = None,
+        cache_path: Optional[str] = None,
+        *,
+        workers: Optional[int] = None,
+        parallel_threshold: int = 2000,
+        save_interval: float = 5.0,
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.prefix = (prefix if prefix is not None else os.path.basename(self.root)).strip("/")
+        self.cache_path = cache_path
+        # 并行解析：待解析文件数 >= parallel_threshold 且 workers > 1 时使用进程池
+        # workers=None 表示 os.cpu_count()；workers=1 强制串行
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        # 缓存落盘节流：每次 apply_patch 都整份重写 JSON 太贵；0 表示每次变化都写
+        self.save_interval = save_interval
+        self.dirty = False
+        self._saved_at: Optional[float] = None
+        self.files: Dict[str, FileEntry] = {}
+        self.deps: Dict[str, Set[str]] = {}
+        self.rev: Dict[str, Set[str]] = {}
+        # 图内容每变一次 +1（边界缓存把它纳入 key）
+        self.version = 0
+        self._file_by_module: Dict[str, str] = {}
+        self._importers: Dict[str, Set[str]] = {}   # module -> 哪些文件 import 了它（含未解析的）
+
+    # ---- 路径换算 ----
+
+    def key_for(self, abs_path: str) -> str:
+        rel = os.path.relpath(os.path.abspath(abs_path), self.root).replace("\\", "/")
+        return f"{self.prefix}/{rel}" if self.prefix else rel
+
+    def abs_for(self, key: str) -> str:
+        key = key.replace("\\", "/")
+        if self.prefix and key.startswith(self.prefix + "/"):
+            key = key[len(self.prefix) + 1:]
+        return os.path.join(self.root, key.replace("/", os.sep))
+
+    def rel_in_root(self, key: str) -> str:
+        """带 prefix 的 key -> 仓库内相对路径（如 "repo_sim/src/a.py" -> "src/a.py"）"""
+        if self.prefix and key.startswith(self.prefix + "/"):
+            return key[len(self.prefix) + 1:]
+        return key
+
+    def list_py_files(self) -> List[str]:
+        out = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for fn in filenames:
+                if fn.endswith(".py"):
+                    out.append(self.key_for(os.path.join(dirpath, fn)))
+        return out
+
+    def has_file(self, key: str) -> bool:
+        return key in self.files
+
+    # ---- 边维护 ----
+
+    def _resolve(self, module: str) -> Optional[str]:
+        return self._file_by_module.get(module.replace("\\", ".").strip("."))
+
+    def _relink(self, key: str) -> None:
+        """按 files[key].imports 重新计算 key 的出边，并修补 rev"""
+        for old in self.deps.get(key, ()):
+            s = self.rev.get(old)
+            if s is not None:
+                s.discard(key)
+        targets: Set[str] = set()
+        entry = self.files.get(key)
+        if entry is not None:
+            for m in entry.imports:
+                tgt = self._resolve(m)
+                if tgt:
+                    targets.add(tgt)
+                    self.rev.setdefault(tgt, set()).add(key)
+        self.deps[key] = targets
+        self.rev.setdefault(key, set())
+
+    def _set_imports(self, key: str, imports: Set[str]) -> None:
+        entry = self.files[key]
+        for m in entry.imports - imports:
+            s = self._importers.get(m)
+            if s is not None:
+                s.discard(key)
+                if not s:
+                    del self._importers[m]
+        for m in imports - entry.imports:
+            self._importers.setdefault(m, set()).add(key)
+        entry.imports = imports
+
+    def _add_file(self, key: str, entry: FileEntry) -> Set[str]:
+        """登记新文件；返回需要重新连边的文件集合"""
+        imports = entry.imports
+        entry.imports = set()
+        self.files[key] = entry
+        self._set_imports(key, imports)
+        mod = module_name_for(self.rel_in_root(key))
+        self._file_by_module[mod] = key
+        # 之前 import 了这个模块但没解析到的文件，现在可以连上了
+        return {key} | set(self._importers.get(mod, ()))
+
+    def _remove_file(self, key: str) -> Set[str]:
+        entry = self.files.get(key)
+        if entry is None:
+            return set()
+        self._set_imports(key, set())
+        del self.files[key]
+        mod = module_name_for(self.rel_in_root(key))
+        if self._file_by_module.get(mod) == key:
+            del self._file_by_module[mod]
+        for old in self.deps.pop(key, ()):
+            s = self.rev.get(old)
+            if s is not None:
+                s.discard(key)
+        importers = self.rev.pop(key, set())
+        return importers | set(self._importers.get(mod, ()))
+
+    # ---- 构建 / 刷新 ----
+
+    def refresh(self, paths: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        增量刷新。paths=None 时 stat 扫描整个仓库；否则只检查给定文件（带 prefix 的 key）。
+        返回内容发生变化的文件集合。
+        """
+        if paths is None:
+            candidates = set(self.list_py_files()) | set(self.files)
+        else:
+            candidates = {p.replace("\\", "/") for p in paths if p.endswith(".py")}
+
+        changed: Set[str] = set()
+        relink: Set[str] = set()
+
+        # 1) stat：找出需要重新读取的文件
+        todo: List[Tuple[str, os.stat_result]] = []
+        for key in sorted(candidates):
+            try:
+                st = os.stat(self.abs_for(key))
+            except FileNotFoundError:
+                if key in self.files:
+                    relink |= self._remove_file(key)
+                    changed.add(key)
+                continue
+            old = self.files.get(key)
+            if old is not None and old.mtime == st.st_mtime and old.size == st.st_size:
+                continue
+            todo.append((key, st))
+
+        # 2) 读取 + hash + parse（文件多时走进程池）
+        jobs = [(self.abs_for(key), self.files[key].hash if key in self.files else None) for key, _ in todo]
+        results = self._scan(jobs)
+
+        # 3) 按 key 顺序合并，保证结果与串行一致
+        for (key, st), res in zip(todo, results):
+            if res is None:
+                continue
+            h, imports = res
+            old = self.files.get(key)
+            if imports is None:
+                # 内容没变，只是 mtime 变了
+                if old is not None:
+                    old.mtime, old.size = st.st_mtime, st.st_size
+                continue
+            if old is None:
+                relink |= self._add_file(key, FileEntry(mtime=st.st_mtime, size=st.st_size, hash=h, imports=imports))
+            else:
+                old.mtime, old.size, old.hash = st.st_mtime, st.st_size, h
+                self._set_imports(key, imports)
+                relink.add(key)
+            changed.add(key)
+
+        for key in relink:
+            if key in self.files:
+                self._relink(key)
+        if changed:
+            self.version += 1
+            self.dirty = True
+            if self.cache_path and (
+                self._saved_at is None or time.monotonic() - self._saved_at >= self.save_interval
+            ):
+                self.save()
+        return changed
+
+    def _scan(self, jobs: List[Tuple[str, Optional[str]]]) -> List[Optional[Tuple[str, Optional[Set[str]]]]]:
+        workers = self.workers if self.workers is not None else (os.cpu_count() or 1)
+        if workers <= 1 or len(jobs) < self.parallel_threshold:
+            return [scan_file(path, known) for path, known in jobs]
+
+        # 进程池只在真正需要时导入（multiprocessing 的导入开销不小）
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunk = max(1, min(_MAX_CHUNK, len(jobs) // (workers * 4) or 1))
+        batches = [jobs[i:i + chunk] for i in range(0, len(jobs), chunk)]
+        out: List[Optional[Tuple[str, Optional[Set[str]]]]] = []
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            # map 保序：合并顺序与串行路径相同
+            for part in ex.map(_scan_batch, batches):
+                out.extend(part)
+        return out
+
+    def build(self) -> None:
+        """从空图全量构建（等价于对所有文件 refresh 一次）"""
+        self.files.clear()
+        self.deps.clear()
+        self.rev.clear()
+        self._file_by_module.clear()
+        self._importers.clear()
+        self.refresh()
+
+    # ---- 持久化 ----
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.cache_path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        doc = {
+            "format": _CACHE_FORMAT,
+            "root": self.root,
+            "prefix": self.prefix,
+            "version": self.version,
+            "files": {
+                k: {"mtime": e.mtime, "size": e.size, "hash": e.hash, "imports": sorted(e.imports)}
+                for k, e in self.files.items()
+            },
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        if path == self.cache_path:
+            self.dirty = False
+            self._saved_at = time.monotonic()
+
+    def flush(self) -> None:
+        """有未落盘的变化时写缓存文件（进程退出 / 长时间空闲时调用）"""
+        if self.dirty and self.cache_path:
+            self.save()
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """读取缓存文件并重建边（不 parse 源码）；缓存不存在/不匹配时返回 False"""
+        path = path or self.cache_path
+        if not path or not os.path.isfile(path):
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if doc.get("format") != _CACHE_FORMAT or doc.get("root") != self.root or doc.get("prefix") != self.prefix:
+            return False
+
+        self.files.clear()
+        self.deps.clear()
+        self.rev.clear()
+        self._file_by_module.clear()
+        self._importers.clear()
+        for key, e in doc.get("files", {}).items():
+            self._add_file(key, FileEntry(mtime=e["mtime"], size=e["size"], hash=e["hash"], imports=set(e["imports"])))
+        for key in self.files:
+            self._relink(key)
+        self.version = int(doc.get("version", 0))
+        self.dirty = False
+        return True
+
+    def load_or_build(self) -> None:
+        """优先从缓存恢复，再做一次增量刷新；没有缓存时全量构建"""
+        if self.load():
+            self.refresh()
+        else:
+            self.build()
+
+
+class DepGraphHandle:
+    """
+    依赖图的显式句柄：首次使用时才构建（import 时不再 walk/parse 整个仓库）。
+
+    - get()：取图；未构建则调用 factory 构建
+    - warm()：提前构建（如服务启动时）
+    - swap(store)：换成另一张图（如后台重建好的新图），返回旧图
+    - discard()：丢弃当前图，下次 get() 重新构建
+    version 随 swap/discard 和图内容变化而变化，供边界缓存做失效判断。
+    """
+
+    def __init__(self, factory: Callable[[], DepGraphStore]) -> None:
+        self._factory = factory
+        self._store: Optional[DepGraphStore] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._store is not None
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        store = self._store
+        return (self._generation, store.version if store is not None else -1)
+
+    def get(self) -> DepGraphStore:
+        store = self._store
+        if store is not None:
+            return store
+        with self._lock:
+            if self._store is None:
+                self._store = self._factory()
+            return self._store
+
+    def warm(self) -> DepGraphStore:
+        return self.get()
+
+    def swap(self, store: DepGraphStore) -> Optional[DepGraphStore]:
+        with self._lock:
+            old, self._store = self._store, store
+            self._generation += 1
+        return old
+
+    def discard(self) -> None:
+        with self._lock:
+            self._store = None
+            self._generation += 1
@@ -10,15 +10,49 @@ demo 里给一个可运行的最小规则：
 - network:egress：即使模板允许，也可能被 no-network 约束禁止（在边界计算时就会剔除）
 """
 from __future__ import annotations
-from typing import List
+from collections import Counter
+from typing import List, Optional
+from .capabilities import register_cap
 from .models import Evidence, Request, RequirementNode
 
-def evidence_supported(req: Request, r: RequirementNode, evidences: List[Evidence]) -> bool:
-    if req.capability in ("exec:test", "read:repo", "exec:lint", "exec:format", "exec:build"):
+# 无需额外证据的能力（按能力 ID 判断；代码里写死的名字可信，直接注册）
+_NO_EVIDENCE_NEEDED = frozenset(register_cap(c) for c in ("exec:test", "read:repo", "exec:lint", "exec:format", "exec:build"))
+_WRITE_SRC = register_cap("write:src")
+
+class EvidenceIndex:
+    """
+    证据按 kind 计数的索引：批量授权时只扫描一次证据列表。
+    """
+    __slots__ = ("kinds",)
+
+    def __init__(self, evidences: List[Evidence]) -> None:
+        self.kinds: Counter[str] = Counter(e.kind for e in evidences)
+
+    @classmethod
+    def for_node(cls, r: RequirementNode) -> "EvidenceIndex":
+        """直接用节点维护的 kind 计数，不扫描证据列表"""
+        idx = cls.__new__(cls)
+        idx.kinds = Counter(r.evidence_counts())
+        return idx
+
+    def has(self, kind: str) -> bool:
+        return self.kinds[kind] > 0
+
+def evidence_supported(
+    req: Request,
+    r: RequirementNode,
+    evidences: List[Evidence],
+    index: Optional[EvidenceIndex] = None,
+) -> bool:
+    if req.cid in _NO_EVIDENCE_NEEDED:
         return True
 
-    if req.capability == "write:src":
+    if req.cid == _WRITE_SRC:
         # 需要至少一个失败测试证据即可（作用域相关性由 SafeBoundary 负责保证）
+        if index is not None:
+            return index.has("test_fail")
+        if evidences is r.evidences:
+            return r.evidence_count("test_fail") > 0
         has_fail = any(e.kind == "test_fail" for e in evidences)
         return has_fail
 
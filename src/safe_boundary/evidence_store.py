@@ -0,0 +1,159 @@
+"""
+内容寻址的证据存储：同一份原始输出（测试日志等）按 hash 只存一份。
+
+节点证据、RUN_TESTS 事件只保存引用（payload 里的 "<key>_ref" = digest），
+需要原文时用 resolve(payload, key) 取回；导出到磁盘时用 inline_refs 换回原文，
+保证 save_events 写出的 jsonl 不依赖本进程的存储。
+
+内存里只保留最近用过的 max_bytes 字节原文（LRU），更早的溢出到追加写的段文件，
+按记录的字节偏移读回 —— 和 EventLog 的溢出方式一样，进程内存不随日志总量增长。
+"""
+from __future__ import annotations
+import hashlib
+import os
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+REF_SUFFIX = "_ref"
+
+# 默认内存中最多保留的原文字节数
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def digest_of(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _close_segment(f: Any, path: str, owned: bool) -> None:
+    f.close()
+    if owned:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class EvidenceStore:
+    """
+    - max_bytes：内存层上限（按 UTF-8 字节计）；None 表示不溢出
+    - spill_path：溢出段文件；未指定时用临时文件，close()/回收时删除
+    """
+
+    def __init__(self, max_bytes: Optional[int] = DEFAULT_MAX_BYTES, spill_path: Optional[str] = None) -> None:
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._mem_bytes = 0
+        self._spilled: Dict[str, Tuple[int, int]] = {}   # ref -> (偏移, 长度)
+        self._f: Any = None
+        self._finalizer: Optional[weakref.finalize] = None
+        self._lock = threading.Lock()
+        self.puts = 0
+
+    def put(self, text: str) -> str:
+        """写入原文，返回 digest；已存在时直接复用"""
+        data = text.encode("utf-8")
+        ref = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            self.puts += 1
+            if ref in self._mem:
+                self._mem.move_to_end(ref)
+            elif ref not in self._spilled:
+                self._mem[ref] = data
+                self._mem_bytes += len(data)
+                self._evict()
+        return ref
+
+    def get(self, ref: str) -> str:
+        with self._lock:
+            data = self._mem.get(ref)
+            if data is not None:
+                self._mem.move_to_end(ref)
+                return data.decode("utf-8")
+            off, n = self._spilled[ref]
+            f = self._segment()
+            f.flush()
+            f.seek(off)
+            return f.read(n).decode("utf-8")
+
+    def _evict(self) -> None:
+        """超出内存上限：最久未用的原文写进段文件（只写一次，之后按偏移读）"""
+        if self.max_bytes is None:
+            return
+        while self._mem_bytes > self.max_bytes and self._mem:
+            ref, data = self._mem.popitem(last=False)
+            self._mem_bytes -= len(data)
+            f = self._segment()
+            f.seek(0, os.SEEK_END)
+            self._spilled[ref] = (f.tell(), len(data))
+            f.write(data)
+
+    def _segment(self) -> Any:
+        if self._f is None:
+            owned = self.spill_path is None
+            if owned:
+                fd, path = tempfile.mkstemp(prefix="sb_blobs_", suffix=".bin")
+                os.close(fd)
+                self.spill_path = path
+            assert self.spill_path is not None
+            self._f = open(self.spill_path, "a+b")
+            self._finalizer = weakref.finalize(self, _close_segment, self._f, self.spill_path, owned)
+        return self._f
+
+    def close(self) -> None:
+        with self._lock:
+            if self._finalizer is not None:
+                self._finalizer()
+                self._finalizer = None
+                self._f = None
+                self._spilled.clear()
+
+    def __contains__(self, ref: object) -> bool:
+        return ref in self._mem or ref in self._spilled
+
+    def __len__(self) -> int:
+        return len(self._mem) + len(self._spilled)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "blobs": len(self._mem) + len(self._spilled),
+                "mem_blobs": len(self._mem),
+                "mem_bytes": self._mem_bytes,
+                "spilled_blobs": len(self._spilled),
+                "puts": self.puts,
+            }
+
+
+_DEFAULT_STORE = EvidenceStore()
+
+
+def evidence_store() -> EvidenceStore:
+    return _DEFAULT_STORE
+
+
+def resolve(payload: Dict[str, Any], key: str, default: str = "", store: Optional[EvidenceStore] = None) -> str:
+    """取 payload 中 key 的原文：优先内联值，其次按 "<key>_ref" 查存储"""
+    if key in payload:
+        return payload[key]
+    ref = payload.get(key + REF_SUFFIX)
+    if ref is None:
+        return default
+    return (store or _DEFAULT_STORE).get(ref)
+
+
+def inline_refs(payload: Dict[str, Any], store: Optional[EvidenceStore] = None) -> Dict[str, Any]:
+    """把 "<key>_ref" 换回 "<key>": 原文（用于导出）；没有引用时原样返回"""
+    if not any(k.endswith(REF_SUFFIX) for k in payload):
+        return payload
+    s = store or _DEFAULT_STORE
+    out: Dict[str, Any] = {}
+    for k, v in payload.items():
+        if k.endswith(REF_SUFFIX) and isinstance(v, str) and v in s:
+            out[k[: -len(REF_SUFFIX)]] = s.get(v)
+        else:
+            out[k] = v
+    return out
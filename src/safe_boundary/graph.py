@@ -6,76 +6,511 @@
 - 代码修改：写入 diff 证据（可扩展：校验是否在 scope 内）
 - 任务完成：state=completed（后续可以回收 lease）
 
-demo 当前只维护 1 个节点，但结构上是 Graph，便于你扩展多节点 DAG。
+支持多个同时 active 的节点（并行子 Agent 各自处理兄弟需求）：
+- 每个节点一把锁，on_* 处理函数在节点锁内修改节点；不同节点之间互不阻塞
+- anchors 写时复制（整体替换 dict），读方拿到的 dict 不会再被改
+- 事件时间线 EventLog 自带锁，多线程追加安全，ts 按追加顺序单调
+- view(rid)：在节点锁内取一致快照，供 compute_safe_boundary / authorize 使用
+
+测试输出可以流式接入：begin_test_run(rid) 返回 TestRun，边 feed 边解析，
+每发现一个失败用例就更新 anchors（test/path，第 N 个为 test.N/path.N）；finish(ok) 写证据与 RUN_TESTS 事件。
+
+二级索引（由 on_* 处理函数维护，find / nodes_affected_by 查询，不扫描全部节点）：
+state / goal / 锚点文件 / 证据 kind -> rid 集合；节点自身维护按 kind 的证据计数。
 """
 from __future__ import annotations
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, Iterator, List, Optional, Any, Set, Union, overload
+import copy
+import json
+import os
+import tempfile
+import threading
 import time
+import weakref
+from contextlib import contextmanager
 
+from .evidence_store import evidence_store, inline_refs, resolve
 from .models import RequirementNode, Evidence
+from .scope_expand import anchor_files, is_file_anchor
+from .testlog import Failure, TestLogParser
 
-@dataclass
+@dataclass(slots=True)
 class GraphEvent:
     ts: float
     etype: str
     rid: str
     payload: Dict[str, Any] = field(default_factory=dict)
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ts": self.ts, "etype": self.etype, "rid": self.rid, "payload": self.payload}
+
+    def text(self, key: str, default: str = "") -> str:
+        """取 payload 字段原文（内联或按引用从 EvidenceStore 取）"""
+        return resolve(self.payload, key, default)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "GraphEvent":
+        return cls(ts=d["ts"], etype=d["etype"], rid=d["rid"], payload=d.get("payload") or {})
+
+def load_events(path: str) -> Iterator[GraphEvent]:
+    """逐行读取 save_events 写出的事件时间线（jsonl）"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield GraphEvent.from_dict(json.loads(line))
+
+def _close_segment(f: Any, path: str, owned: bool) -> None:
+    f.close()
+    if owned:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class EventLog:
+    """
+    事件时间线：内存里只保留最近 window 条，更早的事件溢出到追加写的段文件（jsonl）。
+
+    - 按序号访问：log[i] / log[-1] / page(offset, limit) / iter_range(start, stop)
+    - 溢出部分按记录的字节偏移直接 seek 读取，不需要整体加载
+    - window=None 表示不溢出（全部留在内存）
+    - spill_path 未指定时用临时文件，close()/回收时删除
+    - 所有读写都在 lock 内；迭代时先在锁内取出该段，再在锁外逐个返回
+    """
+
+    def __init__(self, window: Optional[int] = 10000, spill_path: Optional[str] = None) -> None:
+        self.window = window
+        self.spill_path = spill_path
+        self._mem: Deque[GraphEvent] = deque()
+        self._offsets: List[int] = []   # 溢出事件在段文件里的起始偏移
+        self._f: Any = None
+        self._finalizer: Optional[weakref.finalize] = None
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._offsets) + len(self._mem)
+
+    @property
+    def spilled(self) -> int:
+        return len(self._offsets)
+
+    def append(self, e: GraphEvent) -> None:
+        with self.lock:
+            self._mem.append(e)
+            if self.window is not None:
+                while len(self._mem) > self.window:
+                    self._spill(self._mem.popleft())
+
+    def _segment(self) -> Any:
+        if self._f is None:
+            owned = self.spill_path is None
+            if owned:
+                fd, path = tempfile.mkstemp(prefix="sb_events_", suffix=".jsonl")
+                os.close(fd)
+                self.spill_path = path
+            assert self.spill_path is not None
+            self._f = open(self.spill_path, "a+b")
+            self._finalizer = weakref.finalize(self, _close_segment, self._f, self.spill_path, owned)
+        return self._f
+
+    def _spill(self, e: GraphEvent) -> None:
+        f = self._segment()
+        f.seek(0, os.SEEK_END)
+        self._offsets.append(f.tell())
+        f.write(json.dumps(e.to_dict(), ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def _read_spilled(self, start: int, stop: int) -> Iterator[GraphEvent]:
+        if start >= stop:
+            return
+        f = self._segment()
+        f.flush()
+        f.seek(self._offsets[start])
+        for _ in range(start, stop):
+            yield GraphEvent.from_dict(json.loads(f.readline()))
+
+    def _slice(self, start: int, stop: Optional[int]) -> List[GraphEvent]:
+        with self.lock:
+            n = len(self)
+            stop = n if stop is None else min(stop, n)
+            start = max(0, start)
+            k = len(self._offsets)
+            out = list(self._read_spilled(start, min(stop, k)))
+            out.extend(self._mem[i - k] for i in range(max(start, k), stop))
+            return out
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None) -> Iterator[GraphEvent]:
+        if stop is not None:
+            yield from self._slice(start, stop)
+            return
+        # 不限终点时分块读取：迭代期间新追加的事件也会被读到
+        chunk = self.window or 1024
+        i = max(0, start)
+        while True:
+            part = self._slice(i, i + chunk)
+            if not part:
+                return
+            yield from part
+            i += len(part)
+
+    def __iter__(self) -> Iterator[GraphEvent]:
+        return self.iter_range()
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> List[GraphEvent]:
+        return self._slice(offset, None if limit is None else offset + limit)
+
+    @overload
+    def __getitem__(self, i: int) -> GraphEvent: ...
+    @overload
+    def __getitem__(self, i: slice) -> List[GraphEvent]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[GraphEvent, List[GraphEvent]]:
+        with self.lock:
+            n = len(self)
+            if isinstance(i, slice):
+                return [self[j] for j in range(*i.indices(n))]
+            if i < 0:
+                i += n
+            if not 0 <= i < n:
+                raise IndexError("event index out of range")
+            k = len(self._offsets)
+            if i >= k:
+                return self._mem[i - k]
+            return next(self._read_spilled(i, i + 1))
+
+    def close(self) -> None:
+        with self.lock:
+            if self._finalizer is not None:
+                self._finalizer()
+                self._finalizer = None
+                self._f = None
+
+# 一次测试最多写入多少组失败锚点；RUN_TESTS 事件里最多记录多少个失败用例
+MAX_FAILURE_ANCHORS = 8
+MAX_RECORDED_FAILURES = 200
+
+class TestRun:
+    """
+    一次测试运行的流式接入（由 RequirementGraph.begin_test_run 创建）。
+    - feed(chunk)：解析新输出，新失败立即写入节点 anchors（节点版本随之变化，边界实时收紧/放宽）
+    - finish(ok)：写证据 + RUN_TESTS 事件；证据原文只保留日志末尾 tail_chars 个字符
+    """
+
+    __test__ = False  # 不是 pytest 用例
+
+    def __init__(self, graph: "RequirementGraph", rid: str, fmt: Optional[str] = None,
+                 tail_chars: int = 64 * 1024) -> None:
+        self.graph = graph
+        self.rid = rid
+        self.failures: List[Failure] = []
+        self.anchored = 0
+        self.anchors_changed = False
+        self._parser = TestLogParser(fmt)
+        self._tail: Deque[str] = deque()
+        self._tail_len = 0
+        self._tail_chars = tail_chars
+
+    def _keep_tail(self, chunk: str) -> None:
+        self._tail.append(chunk)
+        self._tail_len += len(chunk)
+        while self._tail and self._tail_len - len(self._tail[0]) >= self._tail_chars:
+            self._tail_len -= len(self._tail.popleft())
+
+    def tail(self) -> str:
+        return "".join(self._tail)[-self._tail_chars:]
+
+    def feed(self, chunk: str) -> List[Failure]:
+        self._keep_tail(chunk)
+        new = self._parser.feed(chunk)
+        if new:
+            self.graph._apply_failures(self, new)
+        return new
+
+    def finish(self, ok: bool, raw: Optional[str] = None) -> None:
+        """raw 给定时用它作为证据原文（调用方已有完整输出），否则用日志末尾"""
+        new = self._parser.close()
+        if new:
+            self.graph._apply_failures(self, new)
+        self.graph._finish_test_run(self, ok, self.tail() if raw is None else raw)
+
 @dataclass
 class RequirementGraph:
     nodes: Dict[str, RequirementNode] = field(default_factory=dict)
-    active_rid: Optional[str] = None
-    events: List[GraphEvent] = field(default_factory=list)
+    active_rid: Optional[str] = None          # 最近创建的节点（单节点用法的兼容入口）
+    events: EventLog = field(default_factory=EventLog)
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+    _node_locks: Dict[str, threading.RLock] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # 二级索引：索引名 -> 取值 -> rid 集合（state / goal / anchor_file / evidence_kind）
+    _indexes: Dict[str, Dict[str, Set[str]]] = field(
+        default_factory=lambda: {"state": {}, "goal": {}, "anchor_file": {}, "evidence_kind": {}},
+        init=False, repr=False, compare=False,
+    )
+
+    # ---- 二级索引维护 ----
+
+    def _index_add(self, index: str, key: str, rid: str) -> None:
+        self._indexes[index].setdefault(key, set()).add(rid)
+
+    def _index_discard(self, index: str, key: str, rid: str) -> None:
+        rids = self._indexes[index].get(key)
+        if rids is not None:
+            rids.discard(rid)
+            if not rids:
+                del self._indexes[index][key]
+
+    def _set_state(self, node: RequirementNode, state: str) -> None:
+        with self._lock:
+            self._index_discard("state", node.state, node.rid)
+            node.state = state
+            self._index_add("state", state, node.rid)
+
+    def _set_anchors(self, node: RequirementNode, anchors: Dict[str, str]) -> None:
+        old, new = anchor_files(node.anchors), anchor_files(anchors)
+        with self._lock:
+            for f in old - new:
+                self._index_discard("anchor_file", f, node.rid)
+            for f in new - old:
+                self._index_add("anchor_file", f, node.rid)
+        # 写时复制：整体替换 anchors，并发读方拿到的旧 dict 不受影响
+        node.anchors = anchors
+
+    def _add_evidence(self, node: RequirementNode, e: Evidence) -> None:
+        first = node.evidence_count(e.kind) == 0
+        node.add_evidence(e)
+        if first:
+            with self._lock:
+                self._index_add("evidence_kind", e.kind, node.rid)
 
     def add_node(self, node: RequirementNode) -> None:
-        self.nodes[node.rid] = node
-        self.active_rid = node.rid
+        with self._lock:
+            old = self.nodes.get(node.rid)
+            if old is not None:
+                self._unindex(old)
+            self.nodes[node.rid] = node
+            self._node_locks.setdefault(node.rid, threading.RLock())
+            self._index_add("state", node.state, node.rid)
+            self._index_add("goal", node.goal, node.rid)
+            for f in anchor_files(node.anchors):
+                self._index_add("anchor_file", f, node.rid)
+            for kind in node.evidence_counts():
+                self._index_add("evidence_kind", kind, node.rid)
+            self.active_rid = node.rid
+
+    def _unindex(self, node: RequirementNode) -> None:
+        self._index_discard("state", node.state, node.rid)
+        self._index_discard("goal", node.goal, node.rid)
+        for f in anchor_files(node.anchors):
+            self._index_discard("anchor_file", f, node.rid)
+        for kind in node.evidence_counts():
+            self._index_discard("evidence_kind", kind, node.rid)
+
+    # ---- 查询 ----
+
+    @property
+    def active(self) -> Set[str]:
+        """所有 state=active 的节点"""
+        with self._lock:
+            return set(self._indexes["state"].get("active", ()))
+
+    def find(
+        self,
+        *,
+        state: Optional[str] = None,
+        goal: Optional[str] = None,
+        anchor_path: Optional[str] = None,
+        evidence_kind: Optional[str] = None,
+    ) -> List[RequirementNode]:
+        """
+        按索引查节点（多个条件取交集），如 find(state="active", anchor_path="src/auth/login.py")。
+        anchor_path 与锚点写法一致（可带或不带 repo_sim/ 前缀、::test 选择器）。
+        """
+        conds = [("state", state), ("goal", goal), ("evidence_kind", evidence_kind)]
+        if anchor_path is not None:
+            conds.append(("anchor_file", anchor_files({"path": anchor_path}).pop()))
+        with self._lock:
+            sets = [self._indexes[name].get(key, set()) for name, key in conds if key is not None]
+            if not sets:
+                rids = set(self.nodes)
+            else:
+                sets.sort(key=len)
+                rids = set(sets[0]).intersection(*sets[1:])
+            return [self.nodes[rid] for rid in sorted(rids)]
+
+    def count(self, index: str, key: str) -> int:
+        """某个索引取值下的节点数，如 count("evidence_kind", "test_fail")"""
+        with self._lock:
+            return len(self._indexes[index].get(key, ()))
+
+    def nodes_affected_by(self, path: str, depth: int = 2, state: Optional[str] = "active") -> List[RequirementNode]:
+        """
+        文件变化时受影响的需求：锚点就是该文件，或锚点文件（经 depth 层反向依赖）依赖该文件。
+        state=None 时不限状态。
+        """
+        from .scope_expand import dep_graph_handle
+        start = anchor_files({"path": path}).pop()
+        files = {start}
+        frontier = {start}
+        rev = dep_graph_handle().get().rev
+        for _ in range(depth):
+            nxt: Set[str] = set()
+            for f in frontier:
+                nxt |= rev.get(f, set())
+            frontier = nxt - files
+            if not frontier:
+                break
+            files |= frontier
+        with self._lock:
+            index = self._indexes["anchor_file"]
+            rids: Set[str] = set()
+            for f in files:
+                rids |= index.get(f, set())
+            if state is not None:
+                rids &= self._indexes["state"].get(state, set())
+            return [self.nodes[rid] for rid in sorted(rids)]
 
     def active_node(self) -> RequirementNode:
-        if not self.active_rid or self.active_rid not in self.nodes:
+        rid = self.active_rid
+        if not rid or rid not in self.nodes:
             raise RuntimeError("No active requirement node")
-        return self.nodes[self.active_rid]
+        return self.nodes[rid]
+
+    def active_nodes(self) -> List[RequirementNode]:
+        return self.find(state="active")
+
+    @contextmanager
+    def node_lock(self, rid: str) -> Iterator[None]:
+        """节点级锁：同一节点的修改串行，不同节点并行"""
+        lock = self._node_locks.get(rid)
+        if lock is None:
+            with self._lock:
+                lock = self._node_locks.setdefault(rid, threading.RLock())
+        with lock:
+            yield
+
+    def view(self, rid: str) -> RequirementNode:
+        """
+        节点的一致快照（浅拷贝）：goal / anchors / constraints / state / evidences / version 同属一个版本。
+        anchors 是写时复制的，直接共享；evidences 复制列表。
+        """
+        with self.node_lock(rid):
+            n = self.nodes[rid]
+            v = copy.copy(n)
+            v.evidences = list(n.evidences)
+            v._kind_counts = dict(n._kind_counts)
+            return v
 
     def log(self, etype: str, rid: str, payload: Dict[str, Any] | None = None) -> None:
-        self.events.append(GraphEvent(ts=time.time(), etype=etype, rid=rid, payload=payload or {}))
+        # ts 在事件日志锁内取，保证时间线上 ts 单调
+        with self.events.lock:
+            self.events.append(GraphEvent(ts=time.time(), etype=etype, rid=rid, payload=payload or {}))
 
     # ---- 事件驱动更新 ----
 
     def on_user_instruction(self, rid: str, goal: str, constraints: set[str], anchors: dict[str, str]) -> RequirementNode:
         node = RequirementNode(rid=rid, goal=goal, anchors=dict(anchors), constraints=set(constraints), state="active")
-        self.add_node(node)
-        self.log("USER_INSTRUCTION", rid, {"goal": goal, "constraints": sorted(list(constraints)), "anchors": anchors})
+        with self.node_lock(rid):
+            self.add_node(node)
+            self.log("USER_INSTRUCTION", rid, {"goal": goal, "constraints": sorted(list(constraints)), "anchors": anchors})
         return node
 
-    def on_run_tests(self, rid: str, ok: bool, stdout: str) -> None:
-        node = self.nodes[rid]
-        node.evidences.append(Evidence(kind=("test_pass" if ok else "test_fail"), payload={"raw": stdout}))
-        payload: Dict[str, Any] = {"ok": ok, "stdout": stdout}
+    def on_add_constraints(self, rid: str, constraints: set[str]) -> RequirementNode:
+        """给已有节点追加约束（只增不减）；constraints 整体替换，已发出的 view() 不受影响"""
+        with self.node_lock(rid):
+            node = self.nodes[rid]
+            added = set(constraints) - node.constraints
+            if added:
+                node.constraints = node.constraints | added
+                node.touch()
+                self.log("ADD_CONSTRAINTS", rid, {"constraints": sorted(added)})
+        return node
 
+    def on_run_tests(self, rid: str, ok: bool, stdout: str) -> None:
+        """一次性给出完整输出（等价于 begin_test_run + feed + finish）"""
+        run = self.begin_test_run(rid)
         if not ok:
-            import re
-            m = re.search(r"FAILED\s+(\S+\.py)::([A-Za-z_]\w*)", stdout)
-            if m:
-                test_file = m.group(1)
-                test_name = m.group(2)
-                node.anchors["test"] = f"{test_file}::{test_name}"
-                node.anchors["path"] = test_file
+            run.feed(stdout)
+        run.finish(ok, raw=stdout)
+
+    def begin_test_run(self, rid: str, fmt: Optional[str] = None) -> TestRun:
+        """fmt：None 自动识别 / pytest / junit"""
+        if rid not in self.nodes:
+            raise KeyError(rid)
+        return TestRun(self, rid, fmt)
+
+    def _apply_failures(self, run: TestRun, failures: List[Failure]) -> None:
+        run.failures.extend(failures)
+        with self.node_lock(run.rid):
+            node = self.nodes[run.rid]
+            anchors = dict(node.anchors)
+            for f in failures:
+                if run.anchored >= MAX_FAILURE_ANCHORS:
+                    break
+                if run.anchored == 0:
+                    # 本次运行的第一个失败：替换掉上一次运行留下的失败锚点
+                    for k in [k for k in anchors if is_file_anchor(k) and "." in k]:
+                        del anchors[k]
+                suffix = "" if run.anchored == 0 else f".{run.anchored + 1}"
+                anchors["path" + suffix] = f.path
+                if f.name:
+                    anchors["test" + suffix] = f.nodeid
+                else:
+                    anchors.pop("test" + suffix, None)
+                run.anchored += 1
+            if anchors != node.anchors:
+                self._set_anchors(node, anchors)
+                node.touch()
+                run.anchors_changed = True
+
+    def _finish_test_run(self, run: TestRun, ok: bool, raw: str) -> None:
+        rid = run.rid
+        # 原始日志只在 EvidenceStore 存一份，证据与事件都只保存引用
+        ref = evidence_store().put(raw)
+        payload: Dict[str, Any] = {"ok": ok, "stdout_ref": ref}
+        if run.failures:
+            payload["failures"] = [f.nodeid for f in run.failures[:MAX_RECORDED_FAILURES]]
+
+        with self.node_lock(rid):
+            node = self.nodes[rid]
+            self._add_evidence(node, Evidence(kind=("test_pass" if ok else "test_fail"), payload={"raw_ref": ref}))
+            if run.anchors_changed:
                 payload["anchors_update"] = dict(node.anchors)
 
-        self.log("RUN_TESTS", rid, payload)
+            node.touch()
+            self.log("RUN_TESTS", rid, payload)
 
-        if ok and node.goal == "fix_failing_test":
-            node.state = "completed"
-            self.log("TASK_COMPLETE", rid, {"reason": "tests passed"})
+            if ok and node.goal == "fix_failing_test":
+                self._set_state(node, "completed")
+                node.touch()
+                self.log("TASK_COMPLETE", rid, {"reason": "tests passed"})
 
     def on_code_patch(self, rid: str, path: str, diff_summary: str) -> None:
-        node = self.nodes[rid]
-        node.evidences.append(Evidence(kind="diff", payload={"file": path, "summary": diff_summary}))
-        self.log("CODE_PATCH", rid, {"path": path, "diff": diff_summary})
+        with self.node_lock(rid):
+            node = self.nodes[rid]
+            self._add_evidence(node, Evidence(kind="diff", payload={"file": path, "summary": diff_summary}))
+            node.touch()
+            self.log("CODE_PATCH", rid, {"path": path, "diff": diff_summary})
+
+    # ---- 事件时间线落盘（供回放） ----
+    def save_events(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for e in self.events:
+                # 导出时把证据引用换回原文，文件可在其他进程里回放
+                d = e.to_dict()
+                d["payload"] = inline_refs(e.payload)
+                f.write(json.dumps(d, ensure_ascii=False) + "\n")
 
     # ---- 图快照 ----
-    def snapshot(self) -> Dict[str, Any]:
+    def iter_events(self, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """流式读取事件视图（不一次性复制整个时间线）"""
+        for e in self.events.iter_range(start):
+            yield {"etype": e.etype, "rid": e.rid, "payload": e.payload}
+
+    def snapshot(self, events_from: int = 0, events_limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        events_from / events_limit：只取时间线的一页（默认全部）；
+        events_total 给出总事件数，便于继续翻页或用 iter_events 流式读取。
+        """
         def node_view(n: RequirementNode) -> Dict[str, Any]:
             return {
                 "rid": n.rid,
@@ -85,8 +520,16 @@ class RequirementGraph:
                 "constraints": sorted(list(n.constraints)),
                 "evidences": [e.kind for e in n.evidences],
             }
+        with self._lock:
+            rids = list(self.nodes)
+        active = sorted(self.active)
         return {
             "active_rid": self.active_rid,
-            "nodes": {rid: node_view(n) for rid, n in self.nodes.items()},
-            "events": [{"etype": e.etype, "rid": e.rid, "payload": e.payload} for e in self.events],
+            "active": active,
+            "nodes": {rid: node_view(self.view(rid)) for rid in rids},
+            "events": [
+                {"etype": e.etype, "rid": e.rid, "payload": e.payload}
+                for e in self.events.page(events_from, events_limit)
+            ],
+            "events_total": len(self.events),
         }
@@ -0,0 +1,94 @@
+"""
+LeaseStore：租约的索引 + 到期管理
+
+- 按 (bound_rid, 能力 ID) 索引：check(req, rid) 只看同一节点同一能力下的少数几个 lease
+- 到期用最小堆：每次只看堆顶，未到期时 O(1)
+- revoke_rid(rid)：节点 state=completed 时一次性回收该节点的所有 lease
+
+check 命中时直接复用已发放的 lease，不再重新计算 SafeBoundary。
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .models import Lease, Request
+
+
+class LeaseStore:
+    def __init__(self, clock: Callable[[], float] = time.time) -> None:
+        self._clock = clock
+        self._by_rid: Dict[str, Dict[int, List[Lease]]] = {}
+        self._heap: List[Tuple[float, int, Lease]] = []
+        self._seq = itertools.count()
+        self._live: Set[int] = set()   # id(lease)：堆里被撤销/已移除的条目惰性跳过
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __iter__(self) -> Iterator[Lease]:
+        for caps in self._by_rid.values():
+            for leases in caps.values():
+                yield from leases
+
+    def add(self, lease: Lease) -> None:
+        self._by_rid.setdefault(lease.bound_rid, {}).setdefault(lease.cid, []).append(lease)
+        heapq.heappush(self._heap, (lease.expires_at, next(self._seq), lease))
+        self._live.add(id(lease))
+
+    def _unlink(self, lease: Lease) -> None:
+        caps = self._by_rid.get(lease.bound_rid)
+        if caps is None:
+            return
+        leases = caps.get(lease.cid)
+        if leases is None:
+            return
+        try:
+            leases.remove(lease)
+        except ValueError:
+            return
+        if not leases:
+            del caps[lease.cid]
+            if not caps:
+                del self._by_rid[lease.bound_rid]
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """移除所有已到期的 lease，返回移除数量"""
+        now = self._clock() if now is None else now
+        n = 0
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            _, _, lease = heapq.heappop(heap)
+            if id(lease) not in self._live:
+                continue
+            self._live.discard(id(lease))
+            self._unlink(lease)
+            n += 1
+        return n
+
+    def check(self, req: Request, rid: str, now: Optional[float] = None) -> Optional[Lease]:
+        """
+        快速路径：若 rid 名下已有未到期 lease 覆盖该请求，直接返回它；否则 None（需要走 authorize）。
+        """
+        now = self._clock() if now is None else now
+        self.expire(now)
+        caps = self._by_rid.get(rid)
+        if not caps:
+            return None
+        for lease in caps.get(req.cid, ()):
+            if lease.expires_at > now and lease.covers(req):
+                return lease
+        return None
+
+    def revoke_rid(self, rid: str) -> int:
+        """回收某个节点名下的全部 lease（堆里的条目惰性清理）"""
+        caps = self._by_rid.pop(rid, None)
+        if not caps:
+            return 0
+        n = 0
+        for leases in caps.values():
+            for lease in leases:
+                self._live.discard(id(lease))
+                n += 1
+        return n
@@ -0,0 +1,37 @@
+"""
+日志开关
+
+库代码只通过 logging 输出（logger 名以 "safe_boundary" 开头），默认挂 NullHandler、什么都不打印；
+消息用 %-参数惰性格式化，logger 未开启对应级别时不做任何字符串拼接。
+
+- enable_tmax_trace(path)：把 T_max 求解的 DP 轨迹写到文件（不占用终端）
+- disable_tmax_trace(handler)：关闭
+"""
+from __future__ import annotations
+import logging
+from typing import Optional
+
+TMAX_LOGGER = "safe_boundary.tmax"
+
+logging.getLogger("safe_boundary").addHandler(logging.NullHandler())
+
+
+def enable_tmax_trace(path: Optional[str] = None, level: int = logging.DEBUG) -> logging.Handler:
+    """
+    开启 DP 轨迹：path 为文件路径时写文件，None 时写 stderr。
+    返回 handler，交给 disable_tmax_trace 关闭。
+    """
+    handler: logging.Handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger = logging.getLogger(TMAX_LOGGER)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    return handler
+
+
+def disable_tmax_trace(handler: logging.Handler) -> None:
+    logger = logging.getLogger(TMAX_LOGGER)
+    logger.removeHandler(handler)
+    handler.close()
+    if not any(not isinstance(h, logging.NullHandler) for h in logger.handlers):
+        logger.setLevel(logging.NOTSET)
@@ -1,43 +1,125 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Set, Tuple
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
+import itertools
 import time
-import fnmatch
+
+from .capabilities import UNKNOWN_CAP, cap_id, cap_name, has_cap, mask_of, names_of
+from .evidence_store import resolve
+from .pathmatch import PatternSet, compile_pattern
 
 Capability = str  # e.g. "exec:test", "read:repo", "write:src", "network:egress"
 PathPattern = str # e.g. "src/auth/**", "tests/**"
 
-@dataclass
+# 全局单调版本号：节点/策略每次被修改都取一个新值，保证不同对象之间也不会撞号
+_VERSION_COUNTER = itertools.count(1)
+
+def next_version() -> int:
+    return next(_VERSION_COUNTER)
+
+# 模型都用 slots=True：没有 per-instance __dict__，高频对象（Request/Evidence/Lease/事件）更省内存
+@dataclass(frozen=True, slots=True, eq=True, unsafe_hash=False)
 class Evidence:
     """
     证据：来自工具输出（测试日志、构建日志、diff 等）。
     demo 里我们只放最小字段，实际可扩展：hash、原始日志、CI 链接等。
+    大块原文（如测试日志）放在 EvidenceStore 里，payload 只存 "<key>_ref" 引用。
+    frozen 只防止字段被重新赋值；payload 是 dict，所以 Evidence 按值比较但不可哈希，
+    不要放进 set / 用作 dict key（需要去重时用 kind + payload 里的 *_ref）。
     """
     kind: str                    # "test_fail", "test_pass", "diff", ...
     payload: Dict[str, str]      # 结构化内容
 
-@dataclass
+    # 显式声明不可哈希：否则 frozen + eq 生成的 __hash__ 会在哈希 dict 时才报 TypeError
+    __hash__ = None  # type: ignore[assignment]
+
+    def text(self, key: str, default: str = "") -> str:
+        """取 payload 字段原文（内联或按引用从 EvidenceStore 取）"""
+        return resolve(self.payload, key, default)
+
+# 影响 SafeBoundary 的节点字段：赋值即换版本号
+_BOUNDARY_FIELDS = frozenset({"goal", "anchors", "constraints"})
+
+@dataclass(slots=True)
 class RequirementNode:
     """
     需求节点：把 goal / anchors / constraints / state 汇聚起来，作为“语境容器”。
+    决定边界的 anchors / constraints 存为只读 mapping / frozenset，不能原地修改；
+    goal / anchors / constraints 整体赋值会自动换版本号（边界缓存据此失效）。
     """
     rid: str
     goal: str
-    anchors: Dict[str, str] = field(default_factory=dict)       # e.g. {"test": "test_login", "path": "src/auth/"}
-    constraints: Set[str] = field(default_factory=set)          # e.g. {"no-network"}
+    anchors: Mapping[str, str] = field(default_factory=dict)    # e.g. {"test": "test_login", "path": "src/auth/"}
+    constraints: FrozenSet[str] = frozenset()                   # e.g. {"no-network"}
     state: str = "active"                                       # active / completed / stale
     evidences: List[Evidence] = field(default_factory=list)     # 绑定到该需求的证据集合
+    version: int = field(default_factory=next_version)          # 每次事件更新后递增（边界缓存据此失效）
+    # 证据按 kind 计数：evidences 只追加，计数按“已计到第几条”增量补齐
+    _kind_counts: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _counted: int = field(default=0, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        if name in _BOUNDARY_FIELDS:
+            if name == "anchors":
+                value = MappingProxyType(dict(value))  # type: ignore[arg-type]
+            elif name == "constraints":
+                value = frozenset(value)  # type: ignore[arg-type]
+            object.__setattr__(self, name, value)
+            # 构造 / copy 时 version 字段排在后面，会被随后的赋值覆盖回原值
+            object.__setattr__(self, "version", next_version())
+        else:
+            object.__setattr__(self, name, value)
+
+    def touch(self) -> None:
+        """节点内容被修改后调用：换一个新版本号"""
+        self.version = next_version()
 
-@dataclass
+    def add_evidence(self, e: Evidence) -> None:
+        self.evidences.append(e)
+        self._sync_counts()
+
+    def _sync_counts(self) -> None:
+        ev = self.evidences
+        n = len(ev)
+        if n == self._counted:
+            return
+        if n < self._counted:
+            # 列表被整体替换/截断：重数
+            self._kind_counts = {}
+            self._counted = 0
+        counts = self._kind_counts
+        for e in ev[self._counted:n]:
+            counts[e.kind] = counts.get(e.kind, 0) + 1
+        self._counted = n
+
+    def evidence_count(self, kind: str) -> int:
+        """某类证据的条数（O(1)，不扫描证据列表）"""
+        self._sync_counts()
+        return self._kind_counts.get(kind, 0)
+
+    def evidence_counts(self) -> Dict[str, int]:
+        self._sync_counts()
+        return dict(self._kind_counts)
+
+@dataclass(frozen=True, slots=True)
 class Request:
     """
     Agent 的权限请求：能力 + 作用域（文件/命令/资源）。
     scope 在 demo 里用路径或简写命令字符串表示。
+    不可变、可哈希，可直接作为缓存 key；cid 是能力在注册表里的整数 ID（未知能力为 UNKNOWN_CAP）。
     """
     capability: Capability
     scope: str
+    cid: int = field(init=False, repr=False, compare=False)
 
-@dataclass
+    def __post_init__(self) -> None:
+        cid = cap_id(self.capability)
+        if cid != UNKNOWN_CAP:
+            object.__setattr__(self, "capability", cap_name(cid))
+        object.__setattr__(self, "cid", cid)
+
+@dataclass(slots=True)
 class Lease:
     """
     Capability Lease：临时授权（scope + TTL + evidence 绑定），到期自动失效。
@@ -46,53 +128,115 @@ class Lease:
     scope_patterns: List[PathPattern]
     expires_at: float
     bound_rid: str
-    evidence_snapshot: List[Evidence] = field(default_factory=list)
+    # 证据快照：节点证据列表只追加不删除，记下发放时的长度即可（O(1)，不复制列表）
+    evidence_upto: int = 0
+    cid: int = field(init=False, repr=False, compare=False)
+    _matcher: Optional[PatternSet] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.cid = cap_id(self.capability)
+        if self.cid != UNKNOWN_CAP:
+            self.capability = cap_name(self.cid)
 
     def is_expired(self) -> bool:
         return time.time() >= self.expires_at
 
-@dataclass
+    def evidence_snapshot(self, r: "RequirementNode") -> List[Evidence]:
+        """发放该 lease 时节点上已有的证据"""
+        return r.evidences[: self.evidence_upto]
+
+    def covers(self, req: Request) -> bool:
+        """该 lease 是否覆盖请求（同一能力 + scope 落在 scope_patterns 内）"""
+        if req.cid != self.cid or req.cid == UNKNOWN_CAP:
+            return False
+        if self._matcher is None:
+            self._matcher = PatternSet(self.scope_patterns)
+        return self._matcher.matches(req.scope)
+
+@dataclass(slots=True)
 class OrgPolicy:
     """
     组织策略：全局硬约束。
     demo 里只示范：敏感路径禁止访问。
+    forbidden_paths 存为 tuple，不能原地修改；整体赋值会自动换版本号（边界缓存据此失效）。
     """
-    forbidden_paths: List[PathPattern] = field(default_factory=lambda: [".env", "secrets/**", "**/*.pem"])
+    forbidden_paths: Tuple[PathPattern, ...] = (".env", "secrets/**", "**/*.pem")
+    version: int = field(default_factory=next_version)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        if name == "forbidden_paths":
+            # 整体赋值（含构造时）：转成 tuple 并换版本号
+            object.__setattr__(self, name, tuple(value))  # type: ignore[arg-type]
+            object.__setattr__(self, "version", next_version())
+        else:
+            object.__setattr__(self, name, value)
+
+    def touch(self) -> None:
+        """修改策略后调用：换一个新版本号"""
+        self.version = next_version()
 
-@dataclass
+    def fingerprint(self) -> Tuple[int, Tuple[PathPattern, ...]]:
+        return (self.version, self.forbidden_paths)
+
+@dataclass(slots=True)
 class ConstraintBound:
     """
     约束边界：能力禁区 + 路径禁区 + 组合禁区。
-    demo 里做了最小实现。
+    demo 里做了最小实现。能力禁区是能力位图（见 capabilities.mask_of）。
     """
-    forbidden_capabilities: Set[Capability] = field(default_factory=set)
+    forbidden_caps: int = 0
     forbidden_paths: List[PathPattern] = field(default_factory=list)
     forbidden_combinations: List[Tuple[Capability, PathPattern]] = field(default_factory=list)
 
-@dataclass
+    @property
+    def forbidden_capabilities(self) -> Set[Capability]:
+        return set(names_of(self.forbidden_caps))
+
+    def forbid(self, capability: Capability) -> None:
+        self.forbidden_caps |= mask_of((capability,))
+
+@dataclass(slots=True)
 class SafeBoundary:
     """
     安全边界：允许的 (capability -> [path patterns])。
     """
     allowed: Dict[Capability, List[PathPattern]] = field(default_factory=dict)
+    # allowed 的能力位图（构造时算好）
+    cap_mask: int = field(default=0, init=False, repr=False, compare=False)
+    # 每个 capability 的编译后匹配器（首次 allows 时构建；allowed 构造后视为只读）
+    _matchers: Dict[Capability, PatternSet] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.cap_mask = mask_of(self.allowed)
+
+    def has(self, cid: int) -> bool:
+        """能力层判定：该能力是否在边界内（不看作用域）"""
+        return has_cap(self.cap_mask, cid)
+
+    def matcher(self, capability: Capability) -> Optional[PatternSet]:
+        patterns = self.allowed.get(capability)
+        if patterns is None:
+            return None
+        m = self._matchers.get(capability)
+        if m is None:
+            m = PatternSet(patterns)
+            self._matchers[capability] = m
+        return m
 
     def allows(self, req: Request) -> bool:
-        if req.capability not in self.allowed:
-            return False
         # scope 可能是路径，也可能是命令；demo 按“路径匹配”处理
-        patterns = self.allowed[req.capability]
-        return any(match_path(req.scope, p) for p in patterns)
+        if not has_cap(self.cap_mask, req.cid):
+            return False
+        m = self.matcher(req.capability)
+        if m is None:
+            return False
+        return m.matches(req.scope)
 
 def match_path(path: str, pattern: str) -> bool:
     """
     支持简化版 glob：
-      - "**" 表示任意层级
-      - "*" 表示一层
-    我们用 fnmatch 做近似：把 ** 转成 * 的多层近似匹配。
-    """
-    # 统一斜杠
-    path = path.replace("\\", "/")
-    pattern = pattern.replace("\\", "/")
-    # 粗略处理 **：转成 *，以便 fnmatch 工作（demo 够用）
-    pattern = pattern.replace("**", "*")
-    return fnmatch.fnmatch(path, pattern)
+      - "**" 表示任意层级（0 个或多个路径段）
+      - "*" 表示一层（不跨越 "/"）
+    大量 pattern 的场景请用 pathmatch.PatternSet 一次编译后复用。
+    """
+    return compile_pattern(pattern).matches(path)
@@ -0,0 +1,142 @@
+"""
+路径模式编译器：把一组 glob pattern 编译成“按路径分段的前缀树”（segment trie）。
+
+语义（与 .gitignore / bash globstar 一致）：
+  - "*" / "?" / "[...]"：只在单个路径段内匹配，不跨越 "/"
+  - "**"：匹配任意层级（0 个或多个路径段）
+  - 其他：字面量，按段精确比较
+
+匹配时按 path 的每一段在 trie 上做 NFA 式推进：
+  - 字面量子节点：dict 查找，O(1)
+  - 通配段子节点：只扫描“当前节点下出现过的不同通配段”
+  - "**" 节点：可以吞掉任意段并停留在原地
+因此 allows() 的耗时取决于路径深度和通配结构，而不是 pattern 数量。
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern, Set, Tuple
+import fnmatch
+import re
+
+_WILDCARD_CHARS = ("*", "?", "[")
+
+
+def normalize_path(path: str) -> str:
+    """统一斜杠，去掉多余的 "/"（保留前导 "/" 以区分绝对路径）"""
+    path = path.replace("\\", "/")
+    if "//" in path:
+        path = re.sub(r"/{2,}", "/", path)
+    return path
+
+
+def _split(path: str) -> List[str]:
+    path = normalize_path(path)
+    if path.endswith("/") and len(path) > 1:
+        path = path[:-1]
+    return path.split("/")
+
+
+class _Node:
+    __slots__ = ("literal", "wild", "globstar", "loop", "terminal")
+
+    def __init__(self, loop: bool = False) -> None:
+        self.literal: Dict[str, _Node] = {}
+        self.wild: Dict[str, Tuple[Pattern[str], _Node]] = {}
+        self.globstar: Optional[_Node] = None
+        self.loop = loop          # True 表示这是 "**" 节点：可吞掉任意段
+        self.terminal = False     # 有 pattern 在此结束
+
+
+class PatternSet:
+    """
+    一组 glob pattern 的编译结果；构建一次，之后 matches() 只沿路径分段推进。
+    """
+    __slots__ = ("_root", "_exact", "_size")
+
+    def __init__(self, patterns: Iterable[str] = ()) -> None:
+        self._root = _Node()
+        self._exact: Set[str] = set()   # 不含通配符的 pattern：直接集合命中
+        self._size = 0
+        for p in patterns:
+            self.add(p)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, pattern: str) -> None:
+        self._size += 1
+        pattern = normalize_path(pattern)
+        if not any(ch in pattern for ch in _WILDCARD_CHARS):
+            self._exact.add(pattern.rstrip("/") if len(pattern) > 1 else pattern)
+            return
+
+        node = self._root
+        prev_globstar = False
+        for seg in _split(pattern):
+            if seg == "**":
+                # 连续的 "**/**" 等价于一个 "**"
+                if prev_globstar:
+                    continue
+                if node.globstar is None:
+                    node.globstar = _Node(loop=True)
+                node = node.globstar
+                prev_globstar = True
+                continue
+            prev_globstar = False
+            if any(ch in seg for ch in _WILDCARD_CHARS):
+                hit = node.wild.get(seg)
+                if hit is None:
+                    hit = (re.compile(fnmatch.translate(seg)), _Node())
+                    node.wild[seg] = hit
+                node = hit[1]
+            else:
+                child = node.literal.get(seg)
+                if child is None:
+                    child = _Node()
+                    node.literal[seg] = child
+                node = child
+        node.terminal = True
+
+    @staticmethod
+    def _closure(states: List[_Node]) -> List[_Node]:
+        # "**" 可以匹配 0 段：把 globstar 子节点并入当前状态集
+        out: List[_Node] = []
+        seen: Set[int] = set()
+        stack = list(states)
+        while stack:
+            n = stack.pop()
+            if id(n) in seen:
+                continue
+            seen.add(id(n))
+            out.append(n)
+            if n.globstar is not None:
+                stack.append(n.globstar)
+        return out
+
+    def matches(self, path: str) -> bool:
+        path = normalize_path(path)
+        if path in self._exact or (len(path) > 1 and path.rstrip("/") in self._exact):
+            return True
+
+        states = self._closure([self._root])
+        for seg in _split(path):
+            nxt: List[_Node] = []
+            for n in states:
+                child = n.literal.get(seg)
+                if child is not None:
+                    nxt.append(child)
+                for rx, wnode in n.wild.values():
+                    if rx.match(seg):
+                        nxt.append(wnode)
+                if n.loop:
+                    nxt.append(n)
+            if not nxt:
+                return False
+            states = self._closure(nxt)
+        return any(n.terminal for n in states)
+
+
+@lru_cache(maxsize=4096)
+def compile_pattern(pattern: str) -> PatternSet:
+    """单个 pattern 的编译缓存（供 match_path 这类逐条调用的场景使用）"""
+    return PatternSet((pattern,))
@@ -5,19 +5,33 @@
 - 组织策略：比如禁止访问 secrets/**
 """
 from __future__ import annotations
-from typing import Set
+from typing import Dict, Iterable, Set
+from .capabilities import mask_of
 from .models import ConstraintBound, OrgPolicy
 
+# 用户约束 -> 被禁止的能力（demo 只示范 no-network）
+CONSTRAINT_CAPABILITIES: Dict[str, Set[str]] = {
+    "no-network": {"network:egress"},
+}
+
+# 任务隐含约束（demo 做一个例子：不允许 deploy）
+IMPLICIT_FORBIDDEN: Set[str] = {"exec:deploy"}
+
+def forbidden_capability_mask(user_constraints: Iterable[str]) -> int:
+    """约束集合 -> 能力禁区位图"""
+    m = mask_of(IMPLICIT_FORBIDDEN)
+    for c in user_constraints:
+        caps = CONSTRAINT_CAPABILITIES.get(c)
+        if caps:
+            m |= mask_of(caps)
+    return m
+
 def build_constraint_bound(user_constraints: Set[str], org: OrgPolicy) -> ConstraintBound:
     cb = ConstraintBound()
     # 组织策略：敏感路径
     cb.forbidden_paths.extend(org.forbidden_paths)
 
-    # 用户约束：能力禁区（demo 只示范 no-network）
-    if "no-network" in user_constraints:
-        cb.forbidden_capabilities.add("network:egress")
-
-    # 任务隐含约束（demo 做一个例子：不允许 deploy）
-    cb.forbidden_capabilities.add("exec:deploy")
+    # 用户约束 + 任务隐含约束：能力禁区
+    cb.forbidden_caps = forbidden_capability_mask(user_constraints)
 
     return cb
@@ -0,0 +1,166 @@
+"""
+审计回放：用录制的会话重新驱动 authorize，测吞吐 / 延迟，并找出决策变化。
+
+输入：
+  - RequirementGraph 事件时间线（graph.save_events 写出的 jsonl）
+  - 审计日志（.audit/audit.jsonl 及轮转文件；GRANT / DENY 记录）
+
+过程：两路事件按 ts 归并，
+  - 图事件：通过 on_user_instruction / on_run_tests / on_code_patch 重建需求图
+  - 审计事件：还原成 Request，用“当前”的 authorize / compute_safe_boundary 重新判定，
+    与录制时的 GRANT / DENY 对比
+
+命令行：
+  python -m src.safe_boundary.replay --graph .audit/graph_events.jsonl --audit-dir .audit
+"""
+from __future__ import annotations
+import argparse
+import heapq
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .audit import AUDIT_DIR
+from .audit_index import AuditStore
+from .authorize import authorize
+from .boundary import boundary_cache
+from .graph import GraphEvent, RequirementGraph, load_events
+from .models import OrgPolicy, Request
+
+
+@dataclass
+class ChangedDecision:
+    ts: float
+    rid: str
+    capability: str
+    scope: str
+    recorded: str      # GRANT / DENY
+    replayed: str
+    reason: Optional[str] = None
+
+
+@dataclass
+class ReplayReport:
+    decisions: int = 0
+    graph_events: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    changed: List[ChangedDecision] = field(default_factory=list)
+
+    @property
+    def decisions_per_sec(self) -> float:
+        return self.decisions / self.elapsed if self.elapsed > 0 else 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        xs = sorted(self.latencies)
+        return xs[min(len(xs) - 1, int(q / 100.0 * len(xs)))]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "decisions": self.decisions,
+            "graph_events": self.graph_events,
+            "skipped": self.skipped,
+            "decisions_per_sec": round(self.decisions_per_sec, 1),
+            "latency_ms": {f"p{q}": round(self.percentile(q) * 1000, 4) for q in (50, 90, 99)},
+            "changed": len(self.changed),
+        }
+
+
+def _apply_graph_event(graph: RequirementGraph, e: GraphEvent) -> None:
+    p = e.payload
+    if e.etype == "USER_INSTRUCTION":
+        graph.on_user_instruction(e.rid, goal=p["goal"], constraints=set(p.get("constraints", [])), anchors=p.get("anchors", {}))
+    elif e.etype == "RUN_TESTS":
+        stdout = e.text("stdout")
+        if p.get("failures"):
+            # 流式运行只保存了日志末尾：把记录下的失败用例补在前面（解析器会去重）
+            stdout = "".join(f"FAILED {f}\n" for f in p["failures"]) + stdout
+        graph.on_run_tests(e.rid, ok=bool(p["ok"]), stdout=stdout)
+    elif e.etype == "ADD_CONSTRAINTS":
+        graph.on_add_constraints(e.rid, set(p.get("constraints", [])))
+    elif e.etype == "CODE_PATCH":
+        graph.on_code_patch(e.rid, path=p.get("path", ""), diff_summary=p.get("diff", ""))
+    # TASK_COMPLETE 等由上面的处理函数自动派生，不需要重放
+
+
+def _merge(graph_events: Iterable[GraphEvent], audit_events: Iterable[Dict[str, Any]]) -> Iterator[Tuple[float, int, Any]]:
+    # 两路各自按时间有序：heapq.merge 流式归并；同一时刻图事件优先
+    g = ((e.ts, 0, e) for e in graph_events)
+    a = ((float(ev.get("ts", 0.0)), 1, ev) for ev in audit_events if ev.get("type") in ("GRANT", "DENY"))
+    return heapq.merge(g, a, key=lambda x: (x[0], x[1]))
+
+
+def replay(
+    graph_events: Iterable[GraphEvent],
+    audit_events: Iterable[Dict[str, Any]],
+    org: Optional[OrgPolicy] = None,
+    *,
+    cold: bool = False,
+) -> ReplayReport:
+    """
+    cold=True 时每次判定前清空边界缓存（测 compute_safe_boundary 全量路径）。
+    """
+    org = org or OrgPolicy()
+    graph = RequirementGraph()
+    report = ReplayReport()
+    cache = boundary_cache()
+
+    t_start = time.perf_counter()
+    for _, kind, item in _merge(graph_events, audit_events):
+        if kind == 0:
+            _apply_graph_event(graph, item)
+            report.graph_events += 1
+            continue
+
+        node = graph.nodes.get(item.get("rid", ""))
+        if node is None:
+            report.skipped += 1
+            continue
+        req = Request(item["capability"], item["scope"])
+        if cold:
+            cache.clear()
+        t0 = time.perf_counter()
+        d = authorize(req, node, org)
+        report.latencies.append(time.perf_counter() - t0)
+        report.decisions += 1
+
+        replayed = "GRANT" if d.ok else "DENY"
+        if replayed != item["type"]:
+            report.changed.append(ChangedDecision(
+                ts=float(item.get("ts", 0.0)), rid=node.rid, capability=req.capability, scope=req.scope,
+                recorded=item["type"], replayed=replayed, reason=d.reason,
+            ))
+    report.elapsed = time.perf_counter() - t_start
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="replay a recorded session against the current authorize")
+    ap.add_argument("--graph", required=True, help="graph events jsonl (RequirementGraph.save_events)")
+    ap.add_argument("--audit-dir", default=AUDIT_DIR)
+    ap.add_argument("--cold", action="store_true", help="clear boundary cache before every decision")
+    ap.add_argument("--repeat", type=int, default=1, help="replay the session N times (throughput)")
+    args = ap.parse_args(argv)
+
+    store = AuditStore(args.audit_dir)
+    report = ReplayReport()
+    for _ in range(args.repeat):
+        r = replay(load_events(args.graph), store.query(), cold=args.cold)
+        report.decisions += r.decisions
+        report.graph_events += r.graph_events
+        report.skipped += r.skipped
+        report.elapsed += r.elapsed
+        report.latencies.extend(r.latencies)
+        report.changed.extend(r.changed)
+
+    print(json.dumps(report.summary(), ensure_ascii=False, indent=2))
+    for c in report.changed:
+        print(f"[CHANGED] ts={c.ts} rid={c.rid} {c.capability} scope={c.scope}: {c.recorded} -> {c.replayed}  {c.reason or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,130 +14,83 @@ Algorithm: ExpandAnchors(anchors, depth_limit=2)
 8. return scope
 
 demo 里我们对 Python 项目做一个可运行版本：
-- GetDependencies: 解析该文件的 import，找 repo_sim/src 下对应模块文件
-- GetReverseDeps: 反向依赖（哪些文件 import 了它）
+- GetDependencies / GetReverseDeps: 查 depgraph.DepGraphStore 的 deps / rev 表
+  （整个 repo_sim 下所有 .py 的 import 图，按模块名解析，增量刷新 + 磁盘缓存）
 - 对 scope 输出：以 “repo_sim/...” 的路径/模式列表表示
 """
 from __future__ import annotations
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Hashable, Iterable, List, Set
+import atexit
 import os
-import ast
 
-from .models import OrgPolicy, match_path
+from .depgraph import DepGraphHandle, DepGraphStore
+from .models import OrgPolicy
+from .pathmatch import PatternSet
 
 _REPO_ROOT = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "..", "repo_sim")
 )
-
-def _repo_rel(abs_path: str) -> str:
-    p = os.path.abspath(abs_path).replace("\\", "/")
-    root = _REPO_ROOT.replace("\\", "/").rstrip("/")
-    if p.startswith(root + "/"):
-        return "repo_sim/" + p[len(root) + 1:]
-    return p
-
-def _abs_from_repo_rel(repo_rel: str) -> str:
-    repo_rel = repo_rel.replace("\\", "/")
-    if repo_rel.startswith("repo_sim/"):
-        repo_rel = repo_rel[len("repo_sim/"):]
-    return os.path.join(_REPO_ROOT, repo_rel.replace("/", os.sep))
+# 依赖图的磁盘缓存（新进程从上次的图出发，只做增量刷新）
+_CACHE_PATH = os.path.join(os.path.dirname(_REPO_ROOT), ".cache", "depgraph.json")
 
 def _strip_test_selector(s: str) -> str:
     # "tests/test_auth.py::test_login" -> "tests/test_auth.py"
     return s.split("::", 1)[0]
 
-def _is_file_path(repo_rel: str) -> bool:
-    abs_p = _abs_from_repo_rel(repo_rel)
-    return os.path.isfile(abs_p)
+def anchor_file(value: str) -> str:
+    """锚点值 -> 依赖图里的文件 key（repo_sim/ 前缀，去掉 ::test 选择器）"""
+    p = _strip_test_selector(value.replace("\\", "/"))
+    if not p.startswith("repo_sim/"):
+        p = "repo_sim/" + p.lstrip("/")
+    return p
 
-def _list_py_files() -> List[str]:
-    out = []
-    for dirpath, _, filenames in os.walk(_REPO_ROOT):
-        for fn in filenames:
-            if fn.endswith(".py"):
-                out.append(_repo_rel(os.path.join(dirpath, fn)))
-    return out
+def is_file_anchor(key: str) -> bool:
+    """path / test 以及多失败时追加的 path.N / test.N"""
+    return key in ("path", "test") or key.startswith(("path.", "test."))
 
-def _module_to_file(module: str) -> str | None:
-    """
-    把 import 的 module 名映射到 repo_sim/src 下的 .py 文件
-      e.g. "src.auth.login" -> repo_sim/src/auth/login.py
-           "src.utils.crypto" -> repo_sim/src/utils/crypto.py
-    """
-    module = module.replace("\\", ".").strip(".")
-    if not module.startswith("src."):
-        return None
-    parts = module.split(".")
-    rel = "/".join(parts) + ".py"         # src/auth/login.py
-    cand = "repo_sim/" + rel
-    if _is_file_path(cand):
-        return cand
-    # 也可能是包：src/auth/__init__.py
-    rel2 = "/".join(parts) + "/__init__.py"
-    cand2 = "repo_sim/" + rel2
-    if _is_file_path(cand2):
-        return cand2
-    return None
-
-def _imports_in_file(repo_rel: str) -> Set[str]:
-    abs_p = _abs_from_repo_rel(repo_rel)
-    try:
-        src = open(abs_p, "r", encoding="utf-8").read()
-    except FileNotFoundError:
-        return set()
-    try:
-        tree = ast.parse(src)
-    except SyntaxError:
-        return set()
+def anchor_files(anchors: Dict[str, str]) -> Set[str]:
+    """path / test（含 .N）锚点指向的文件集合"""
+    return {anchor_file(v) for k, v in anchors.items() if is_file_anchor(k)}
 
-    mods: Set[str] = set()
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                mods.add(alias.name)
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                mods.add(node.module)
-    return mods
-
-def _build_dep_graph() -> Tuple[dict[str, Set[str]], dict[str, Set[str]]]:
-    """
-    返回：(deps, rev_deps)
-    deps[a] = {b1,b2} 表示 a 依赖 b
-    rev_deps[b] = {a1,a2} 表示 哪些文件依赖 b
-    """
-    deps: dict[str, Set[str]] = {}
-    rev: dict[str, Set[str]] = {}
+def _default_store() -> DepGraphStore:
+    # 优先从磁盘缓存恢复，再按 mtime/hash 增量刷新
+    store = DepGraphStore(_REPO_ROOT, prefix="repo_sim", cache_path=_CACHE_PATH)
+    store.load_or_build()
+    return store
+
+# 依赖图句柄：第一次真正用到 deps/rev_deps 时才构建（import 本模块不做任何 I/O）
+_HANDLE = DepGraphHandle(_default_store)
 
-    for f in _list_py_files():
-        deps.setdefault(f, set())
-        for m in _imports_in_file(f):
-            tgt = _module_to_file(m)
-            if tgt:
-                deps[f].add(tgt)
-                rev.setdefault(tgt, set()).add(f)
-        rev.setdefault(f, set())
-    return deps, rev
+def _flush_dep_graph() -> None:
+    # refresh 只按间隔落盘：退出前把当前图剩下的变化写掉
+    if _HANDLE.loaded:
+        _HANDLE.get().flush()
 
-# 缓存图（demo 足够；真实系统要做增量更新）
-_DEPS, _REV = _build_dep_graph()
+atexit.register(_flush_dep_graph)
 
-def get_dependencies(repo_rel: str) -> Set[str]:
-    return set(_DEPS.get(repo_rel, set()))
+def dep_graph_handle() -> DepGraphHandle:
+    return _HANDLE
 
-def get_reverse_deps(repo_rel: str) -> Set[str]:
-    return set(_REV.get(repo_rel, set()))
+def graph_version() -> Hashable:
+    """依赖图版本：图内容变化 / 句柄 swap 时变化（边界缓存把它纳入 key）"""
+    return _HANDLE.version
+
+def refresh_dep_graph(paths: Iterable[str] | None = None) -> Set[str]:
+    """
+    文件被修改后调用（如 apply_patch）：只重新解析变化的文件并修补边。
+    paths 为 repo_sim/ 前缀的路径；None 表示 stat 扫描整个仓库。
+    图还没构建时什么都不做（之后首次构建会从磁盘拿到最新内容）。
+    """
+    if not _HANDLE.loaded:
+        return set()
+    return _HANDLE.get().refresh(paths)
 
 def _remove_sensitive(scope: Set[str], org: OrgPolicy) -> Set[str]:
     """
     从 scope 中排除敏感路径（org.forbidden_paths）
     """
-    cleaned: Set[str] = set()
-    for p in scope:
-        blocked = any(match_path(p, pat) for pat in org.forbidden_paths)
-        if not blocked:
-            cleaned.add(p)
-    return cleaned
+    forbidden = PatternSet(org.forbidden_paths)
+    return {p for p in scope if not forbidden.matches(p)}
 
 def _add_dir_wildcards(scope: Set[str]) -> Set[str]:
     """
@@ -159,47 +112,34 @@ def expand_scope(anchors: Dict[str, str], org: OrgPolicy, depth_limit: int = 2)
     anchors: 可能包含
       - path: "tests/test_auth.py" 或 "src/auth/login.py" 等（无 repo_sim 前缀）
       - test: "tests/test_auth.py::test_login"
+      - path.N / test.N：同一次测试里的第 N 个失败
     返回：ScopeBound（repo_sim/ 前缀的路径/模式列表）
     """
-    # 1) 初始 scope = anchors
-    scope: Set[str] = set()
-
     # 允许 anchors 为空：此时只允许 repo 根读/跑测试（写权限仍需更具体 anchors 才会 EvidenceSupported）
     if not anchors:
         scope = {"repo_sim/**"}
         scope = _remove_sensitive(scope, org)
         return sorted(scope)
 
-    # 优先使用 path 锚点
-    if "path" in anchors:
-        p = anchors["path"].replace("\\", "/")
-        p = _strip_test_selector(p)
-        if not p.startswith("repo_sim/"):
-            p = "repo_sim/" + p.lstrip("/")
-        scope.add(p)
-
-    # 如果有 test 锚点，也加入其文件路径
-    if "test" in anchors:
-        t = anchors["test"].replace("\\", "/")
-        tfile = _strip_test_selector(t)
-        if not tfile.startswith("repo_sim/"):
-            tfile = "repo_sim/" + tfile.lstrip("/")
-        scope.add(tfile)
+    # 1) 初始 scope = anchors 指向的文件
+    scope: Set[str] = anchor_files(anchors)
 
     # 去敏感
     scope = _remove_sensitive(scope, org)
 
     # 2) 迭代扩展
+    store = _HANDLE.get()
     for _depth in range(depth_limit):
         new_nodes: Set[str] = set()
         for p in list(scope):
             # 只对“具体文件”做依赖扩展；对 ** 模式不扩展
             if p.endswith("/**") or p.endswith("*"):
                 continue
-            if not _is_file_path(p):
+            # 依赖图里没有的（非 .py / 不存在的文件）没有依赖可扩展
+            if not store.has_file(p):
                 continue
-            new_nodes |= get_dependencies(p)
-            new_nodes |= get_reverse_deps(p)
+            new_nodes |= store.deps.get(p, set())
+            new_nodes |= store.rev.get(p, set())
 
         before = set(scope)
         scope |= new_nodes
@@ -1,5 +1,5 @@
 """
-最大安全模板的“搜索/优化”求解器（带终端日志）
+最大安全模板的“搜索/优化”求解器（DP 轨迹走 logging，默认关闭）
 
 优化目标（字典序）：
 1) 最大化 count（选中能力数量，Max Power）
@@ -11,12 +11,20 @@
 
 算法：
 - 0/1 DP
-- dp[b] = (count, utility_sum, chosen_caps)
+- dp[b] = (count, utility_sum)；每个能力一张选择表 take[i] = bytearray(budget+1)（take[i][b] 表示 dp[b] 是否选了它）
+- 结束后从最优 budget 沿选择表回溯出 chosen_caps
+  时间 O(items × budget)，额外内存 O(items × budget) 字节
+  （不用 int 位图：每次置位都会复制整个大整数，实际退化成 O(items × budget²)）
 """
 
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+from . import logutil  # noqa: F401  挂 NullHandler
+
+log = logging.getLogger(logutil.TMAX_LOGGER)
 
 
 @dataclass(frozen=True)
@@ -25,114 +33,193 @@ class CapAttr:
     utility: int
 
 
-def _better(a: Tuple[int, int, List[str]], b: Tuple[int, int, List[str]]) -> bool:
-    """
-    判断 a 是否比 b 更优（字典序：count 优先，其次 utility）
-    """
-    return (a[0] > b[0]) or (a[0] == b[0] and a[1] > b[1])
-
-
-def _dp_summary(dp: List[Tuple[int, int, List[str]]]) -> str:
+def _dp_summary(cnt: List[int], util: List[int]) -> str:
     """
     简短展示 dp 状态：每个 budget 下 (count, utility)
     """
     parts = []
-    for b, (cnt, util, _) in enumerate(dp):
-        parts.append(f"b={b}:(cnt={cnt},u={util})")
+    for b, (c, u) in enumerate(zip(cnt, util)):
+        parts.append(f"b={b}:(cnt={c},u={u})")
     return "  " + " | ".join(parts)
 
 
-def solve_tmax_knapsack(
-    goal: str,
+def _collect_items(
     C: List[str],
-    attrs_by_goal: Dict[str, Dict[str, CapAttr]],
-    risk_budget_by_goal: Dict[str, int],
+    attrs: Dict[str, CapAttr],
     hard_ban: Set[str],
-    *,
-    debug: bool = True,
-    verbose_items: bool = True,
-    print_dp_each_item: bool = False,
-) -> List[str]:
-    """
-    返回：该 goal 的 T_max（能力列表）
-    """
-    budget = risk_budget_by_goal.get(goal, 3)
-    attrs = attrs_by_goal.get(goal, {})
-
-    # 1) 过滤 hard_ban，并为每个能力取 (risk, utility)
+    debug: bool,
+) -> List[Tuple[str, int, int]]:
+    """过滤 hard_ban，并为每个能力取 (risk, utility)"""
     items: List[Tuple[str, int, int]] = []
     for cap in C:
         if cap in hard_ban:
             if debug:
-                print(f"[TMAX] HARD_BAN skip cap={cap}")
+                log.debug("[TMAX] HARD_BAN skip cap=%s", cap)
             continue
         a = attrs.get(cap, CapAttr(risk=2, utility=0))
         items.append((cap, a.risk, a.utility))
+    return items
 
-    if debug:
-        print("\n" + "=" * 80)
-        print(f"[TMAX] goal={goal}  budget={budget}")
-        print(f"[TMAX] |C|={len(C)}  items_after_ban={len(items)}  hard_ban={sorted(list(hard_ban))}")
-        print("[TMAX] items (cap, risk, utility):")
-        for cap, r, u in items:
-            print(f"  - {cap:15s}  risk={r}  util={u}")
-        print("=" * 80 + "\n")
 
-    # 2) 初始化 DP
-    dp: List[Tuple[int, int, List[str]]] = [(0, 0, []) for _ in range(budget + 1)]
+def _run_dp(
+    items: List[Tuple[str, int, int]],
+    budget: int,
+    *,
+    debug: bool = False,
+    verbose_items: bool = False,
+    print_dp_each_item: bool = False,
+) -> Tuple[List[int], List[int], List[bytearray]]:
+    """
+    0/1 背包。返回 (cnt, util, take)：
+      cnt[b] / util[b]：风险和 ≤ b 时的最优 (count, utility)
+      take[i][b] = 1 表示处理第 i 个能力时 dp[b] 选择了它
+    dp[b] 只依赖 dp[0..b]，所以预算 B 的表的前缀就是任何更小预算的表。
+    """
+    cnt = [0] * (budget + 1)
+    util = [0] * (budget + 1)
+    take: List[bytearray] = []
     if debug:
-        print("[TMAX][DP] init:", _dp_summary(dp))
+        log.debug("[TMAX][DP] init: %s", _dp_summary(cnt, util))
 
-    # 3) 0/1 背包：逐个能力尝试加入
-    for i, (cap, risk, util) in enumerate(items, start=1):
+    for i, (cap, risk, u) in enumerate(items, start=1):
         if debug and verbose_items:
-            print("\n" + "-" * 80)
-            print(f"[TMAX][ITEM {i}/{len(items)}] cap={cap}  risk={risk}  util={util}")
+            log.debug("-" * 80)
+            log.debug("[TMAX][ITEM %d/%d] cap=%s  risk=%d  util=%d", i, len(items), cap, risk, u)
 
         # 从后往前遍历 budget，保证 0/1（每个能力最多选一次）
-        updated_any = False
-        for b in range(budget, -1, -1):
+        row = bytearray(budget + 1)
+        improved = False
+        for b in range(budget, risk - 1, -1):
             nb = b - risk
-            if nb < 0:
-                continue
-
-            prev_cnt, prev_u, prev_list = dp[nb]
-            cand = (prev_cnt + 1, prev_u + util, prev_list + [cap])
-
-            cur = dp[b]
-
-            if _better(cand, cur):
-                dp[b] = cand
-                updated_any = True
+            cand_cnt = cnt[nb] + 1
+            cand_u = util[nb] + u
+            # 字典序：count 优先，其次 utility（严格更优才替换）
+            if cand_cnt > cnt[b] or (cand_cnt == cnt[b] and cand_u > util[b]):
                 if debug and verbose_items:
-                    print(
-                        f"[TMAX][DP UPDATE] budget={b}: "
-                        f"old=(cnt={cur[0]},u={cur[1]},caps={cur[2]})  ->  "
-                        f"new=(cnt={cand[0]},u={cand[1]},caps={cand[2]}) "
-                        f"(from nb={nb})"
+                    log.debug(
+                        "[TMAX][DP UPDATE] budget=%d: old=(cnt=%d,u=%d)  ->  new=(cnt=%d,u=%d) (take %s from nb=%d)",
+                        b, cnt[b], util[b], cand_cnt, cand_u, cap, nb,
                     )
+                cnt[b] = cand_cnt
+                util[b] = cand_u
+                row[b] = 1
+                improved = True
+        take.append(row)
 
         if debug and verbose_items:
-            if not updated_any:
-                print("[TMAX][ITEM] no dp state improved by this cap.")
+            if not improved:
+                log.debug("[TMAX][ITEM] no dp state improved by this cap.")
 
         if debug and print_dp_each_item:
-            print("[TMAX][DP] after item:", _dp_summary(dp))
+            log.debug("[TMAX][DP] after item: %s", _dp_summary(cnt, util))
+    return cnt, util, take
 
-    # 4) 从 dp[0..budget] 里选最优
-    best = max(dp, key=lambda x: (x[0], x[1]))
-    chosen = best[2]
+
+def _backtrack(items: List[Tuple[str, int, int]], take: List[bytearray], b: int) -> List[str]:
+    """从 dp[b] 沿选择表回溯出选中的能力（按 items 顺序）"""
+    chosen: List[str] = []
+    for i in range(len(items) - 1, -1, -1):
+        if take[i][b]:
+            cap, risk, _ = items[i]
+            chosen.append(cap)
+            b -= risk
+    chosen.reverse()
+    return chosen
+
+
+def solve_tmax_knapsack(
+    goal: str,
+    C: List[str],
+    attrs_by_goal: Dict[str, Dict[str, CapAttr]],
+    risk_budget_by_goal: Dict[str, int],
+    hard_ban: Set[str],
+    *,
+    debug: Optional[bool] = None,
+    verbose_items: bool = True,
+    print_dp_each_item: bool = False,
+) -> List[str]:
+    """
+    返回：该 goal 的 T_max（能力列表）
+
+    DP 轨迹写到 logger "safe_boundary.tmax"（DEBUG 级别）。
+    debug=None：仅当该 logger 开启 DEBUG 时才生成轨迹（库默认关闭，求解不做任何格式化）；
+    debug=False：强制不生成。见 logutil.enable_tmax_trace。
+    """
+    debug = log.isEnabledFor(logging.DEBUG) if debug is None else (debug and log.isEnabledFor(logging.DEBUG))
+    budget = risk_budget_by_goal.get(goal, 3)
+    attrs = attrs_by_goal.get(goal, {})
+
+    # 1) 过滤 hard_ban，并为每个能力取 (risk, utility)
+    items = _collect_items(C, attrs, hard_ban, debug)
+
+    if debug:
+        log.debug("=" * 80)
+        log.debug("[TMAX] goal=%s  budget=%d", goal, budget)
+        log.debug("[TMAX] |C|=%d  items_after_ban=%d  hard_ban=%s", len(C), len(items), sorted(hard_ban))
+        log.debug("[TMAX] items (cap, risk, utility):")
+        for cap, r, u in items:
+            log.debug("  - %-15s  risk=%d  util=%d", cap, r, u)
+        log.debug("=" * 80)
+
+    # 2) DP：每个 budget 只存 (count, utility)；选择信息放在 take[i] 的选择表里
+    cnt, util, take = _run_dp(
+        items, budget, debug=debug, verbose_items=verbose_items, print_dp_each_item=print_dp_each_item
+    )
+
+    # 3) 从 dp[0..budget] 里选最优（同分取最小 budget，与逐格比较的 max 一致）
+    best_b = 0
+    for b in range(1, budget + 1):
+        if cnt[b] > cnt[best_b] or (cnt[b] == cnt[best_b] and util[b] > util[best_b]):
+            best_b = b
+
+    # 4) 沿选择表回溯出选中的能力
+    chosen = _backtrack(items, take, best_b)
     chosen_set = set(chosen)
 
     # 输出顺序：按 C 原始顺序（更稳定）
     ordered = [cap for cap in C if cap in chosen_set]
 
     if debug:
-        print("\n" + "=" * 80)
-        print("[TMAX][RESULT]")
-        print(f"best_count={best[0]}  best_utility={best[1]}")
-        print("chosen (dp raw order):", chosen)
-        print("chosen (ordered by C):", ordered)
-        print("=" * 80 + "\n")
+        log.debug("=" * 80)
+        log.debug("[TMAX][RESULT]")
+        log.debug("best_count=%d  best_utility=%d", cnt[best_b], util[best_b])
+        log.debug("chosen (dp raw order): %s", chosen)
+        log.debug("chosen (ordered by C): %s", ordered)
+        log.debug("=" * 80)
 
     return ordered
+
+
+@dataclass(frozen=True)
+class BudgetPoint:
+    budget: int
+    count: int
+    utility: int
+    caps: Tuple[str, ...]   # 按 C 原始顺序
+
+
+def sweep_tmax_budgets(
+    goal: str,
+    C: List[str],
+    attrs_by_goal: Dict[str, Dict[str, CapAttr]],
+    max_budget: int,
+    hard_ban: Set[str],
+) -> List[BudgetPoint]:
+    """
+    一次 DP 得到 0..max_budget 每个风险预算下的 T_max：
+      result[b] 与 solve_tmax_knapsack(预算=b) 的结果完全一致（含同分取舍）。
+    """
+    items = _collect_items(C, attrs_by_goal.get(goal, {}), hard_ban, debug=False)
+    cnt, util, take = _run_dp(items, max_budget)
+    order = {cap: i for i, cap in enumerate(C)}
+
+    out: List[BudgetPoint] = []
+    best_b = 0
+    for b in range(max_budget + 1):
+        # 前缀最优：同分取最小 budget
+        if cnt[b] > cnt[best_b] or (cnt[b] == cnt[best_b] and util[b] > util[best_b]):
+            best_b = b
+        caps = tuple(sorted(_backtrack(items, take, best_b), key=order.__getitem__))
+        out.append(BudgetPoint(budget=b, count=cnt[best_b], utility=util[best_b], caps=caps))
+    return out
+
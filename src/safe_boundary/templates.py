@@ -10,13 +10,22 @@ T_max 通过“搜索/优化”动态计算得到。
 """
 
 from __future__ import annotations
-from typing import Dict, List, Set
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Mapping, Optional, Tuple
+from urllib.parse import quote
+import hashlib
+import json
+import os
 
-from .template_search import CapAttr, solve_tmax_knapsack
+from .capabilities import mask_of, register_cap
+from .template_search import BudgetPoint, CapAttr, solve_tmax_knapsack, sweep_tmax_budgets
+
+# 模板表都是不可变对象（tuple / frozenset / 只读 mapping），只能通过下面的 set_* 整体替换：
+# 指纹按表对象的身份缓存，表被替换即重新计算，不存在“改了表但缓存没失效”的情况
 
 # 1) 全能力集合 C
 # demo 里先放一组常见能力；后续可以把它扩成你系统完整 capability taxonomy。
-C_ALL: List[str] = [
+C_ALL: Tuple[str, ...] = (
     "exec:test",
     "read:repo",
     "write:src",
@@ -27,21 +36,24 @@ C_ALL: List[str] = [
     "exec:deploy",
     "write:secrets",
     "exec:arbitrary",
-]
+)
+# 先按 C_ALL 顺序注册，能力 ID（位图的位）与 C_ALL 下标一致
+for _c in C_ALL:
+    register_cap(_c)
 
 # 2) 硬禁止能力（等价于你截图里的“非常高风险且通常不需要”）
 # 它们不会被搜索纳入 T_max（相当于永远在 C_risky(goal) 中）
-HARD_BAN: Set[str] = {
+HARD_BAN: FrozenSet[str] = frozenset({
     "exec:deploy",
     "write:secrets",
     "exec:arbitrary",
-}
+})
 
 # 3) goal 的风险预算（预算越大 => T_max 越“宽”）
 # 这是一个可调超参：论文里可以说“由组织安全策略/环境可信度决定”
-RISK_BUDGET_BY_GOAL: Dict[str, int] = {
+RISK_BUDGET_BY_GOAL: Mapping[str, int] = MappingProxyType({
     "fix_failing_test": 7,
-}
+})
 
 # 4) 每个 goal 下每个能力的 (risk, utility) 估计
 # - risk：能力本身的危险程度（越大越危险）
@@ -49,7 +61,10 @@ RISK_BUDGET_BY_GOAL: Dict[str, int] = {
 # “不是从用了什么出发，而是从什么是安全的出发”可以落地的地方：
 #   - risk 可来自：静态安全分级、历史事故、权限可逆性、影响面等
 #   - utility 可来自：历史轨迹统计、任务类型先验、规则/模型估计
-ATTRS_BY_GOAL: Dict[str, Dict[str, CapAttr]] = {
+def _freeze_attrs(attrs: Mapping[str, Mapping[str, CapAttr]]) -> Mapping[str, Mapping[str, CapAttr]]:
+    return MappingProxyType({g: MappingProxyType(dict(a)) for g, a in attrs.items()})
+
+ATTRS_BY_GOAL: Mapping[str, Mapping[str, CapAttr]] = _freeze_attrs({
     "fix_failing_test": {
         "exec:test":      CapAttr(risk=1, utility=10),
         "read:repo":      CapAttr(risk=1, utility=8),
@@ -60,7 +75,7 @@ ATTRS_BY_GOAL: Dict[str, Dict[str, CapAttr]] = {
         "network:egress": CapAttr(risk=3, utility=2),  # 注意：允许进入 T_max，但会被 constraint (no-network) 在边界计算时剔除
         # deploy/secrets/arbitrary 在 HARD_BAN 里，不参与搜索
     }
-}
+})
 
 # 仍然保留一个最小必要模板（如果你要对比 Min Power）
 T_MIN: Dict[str, List[str]] = {
@@ -72,23 +87,173 @@ T_MIN: Dict[str, List[str]] = {
 }
 
 # 结果缓存：避免每次都 DP（工程上很必要）
-_TMAX_CACHE: Dict[str, List[str]] = {}
+# key = (模板表指纹, goal)：C_ALL / HARD_BAN / RISK_BUDGET_BY_GOAL / ATTRS_BY_GOAL 任一变化都会换 key
+_TMAX_CACHE: Dict[tuple[str, str], List[str]] = {}
+_TMAX_MASK_CACHE: Dict[tuple[str, str], int] = {}
+
+# 磁盘缓存目录：<dir>/<fingerprint>/<goal>.json，多个 worker 进程共享（None 表示只用进程内缓存）
+TMAX_CACHE_DIR: Optional[str] = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".cache", "tmax")
+)
+
+# 求解器语义变化时递增，使旧的磁盘缓存失效
+_SOLVER_VERSION = 1
+
+
+# 指纹缓存：(计算时的四张表对象, 指纹)；表不可变，对象没换内容就没变
+_FP_MEMO: Optional[Tuple[tuple, str]] = None
+
+
+def _tables() -> tuple:
+    return (C_ALL, HARD_BAN, RISK_BUDGET_BY_GOAL, ATTRS_BY_GOAL)
+
+
+def set_risk_budget(goal: str, budget: int) -> None:
+    global RISK_BUDGET_BY_GOAL
+    RISK_BUDGET_BY_GOAL = MappingProxyType({**RISK_BUDGET_BY_GOAL, goal: budget})
+
+
+def set_cap_attr(goal: str, cap: str, risk: int, utility: int) -> None:
+    """设置 goal 下某能力的 (risk, utility)；新能力同时加入 C_ALL 并注册 ID"""
+    global C_ALL, ATTRS_BY_GOAL
+    if cap not in C_ALL:
+        register_cap(cap)
+        C_ALL = (*C_ALL, cap)
+    attrs = {g: dict(a) for g, a in ATTRS_BY_GOAL.items()}
+    attrs.setdefault(goal, {})[cap] = CapAttr(risk=risk, utility=utility)
+    ATTRS_BY_GOAL = _freeze_attrs(attrs)
+
+
+def set_hard_ban(cap: str, banned: bool = True) -> None:
+    global HARD_BAN
+    HARD_BAN = HARD_BAN | {cap} if banned else HARD_BAN - {cap}
+
+
+def template_goals() -> List[str]:
+    """有能力模板的 goal"""
+    return list(ATTRS_BY_GOAL)
+
+
+def template_fingerprint() -> str:
+    """模板表的稳定哈希（与 dict/set 的迭代顺序无关）；表对象没被替换时直接复用"""
+    global _FP_MEMO
+    tables = _tables()
+    memo = _FP_MEMO
+    if memo is not None and all(a is b for a, b in zip(memo[0], tables)):
+        return memo[1]
+    c_all, hard_ban, budget, attrs_by_goal = tables
+    doc = {
+        "solver": _SOLVER_VERSION,
+        "C": list(c_all),
+        "hard_ban": sorted(hard_ban),
+        "budget": sorted(budget.items()),
+        "attrs": sorted(
+            (g, sorted((c, a.risk, a.utility) for c, a in attrs.items()))
+            for g, attrs in attrs_by_goal.items()
+        ),
+    }
+    raw = json.dumps(doc, ensure_ascii=False, separators=(",", ":"))
+    fp = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+    _FP_MEMO = (tables, fp)
+    return fp
+
+
+def _disk_path(fp: str, goal: str) -> Optional[str]:
+    if not TMAX_CACHE_DIR:
+        return None
+    return os.path.join(TMAX_CACHE_DIR, fp, quote(goal, safe="") + ".json")
+
+
+def _disk_load(fp: str, goal: str) -> Optional[List[str]]:
+    path = _disk_path(fp, goal)
+    if path is None or not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if doc.get("fingerprint") != fp or doc.get("goal") != goal:
+        return None
+    tmax = doc.get("t_max")
+    if not isinstance(tmax, list):
+        return None
+    # 缓存文件可能过期或被改过：只保留本 goal 模板里有、且不在 HARD_BAN 里的能力，不能让它放宽 T_max
+    attrs = ATTRS_BY_GOAL.get(goal, {})
+    tmax = [c for c in tmax if isinstance(c, str) and c in C_ALL and c in attrs and c not in HARD_BAN]
+    if sum(attrs[c].risk for c in tmax) > RISK_BUDGET_BY_GOAL.get(goal, 3):
+        return None
+    return tmax
+
+
+def _disk_store(fp: str, goal: str, tmax: List[str]) -> None:
+    path = _disk_path(fp, goal)
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再原子替换：并发的 worker 不会读到半个文件
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fp, "goal": goal, "t_max": tmax}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        # 磁盘缓存只是加速手段，写失败不影响结果
+        pass
 
 
 def t_max(goal: str) -> List[str]:
     """
     通过优化搜索求 T_max(goal)
+    查找顺序：进程内缓存 -> 磁盘缓存（同一模板指纹）-> 求解并写回两级缓存
     """
-    if goal in _TMAX_CACHE:
-        return list(_TMAX_CACHE[goal])
-
-    tmax = solve_tmax_knapsack(
-        goal=goal,
-        C=C_ALL,
-        attrs_by_goal=ATTRS_BY_GOAL,
-        risk_budget_by_goal=RISK_BUDGET_BY_GOAL,
-        hard_ban=HARD_BAN,
-    )
-    _TMAX_CACHE[goal] = list(tmax)
+    fp = template_fingerprint()
+    key = (fp, goal)
+    if key in _TMAX_CACHE:
+        return list(_TMAX_CACHE[key])
+
+    tmax = _disk_load(fp, goal)
+    if tmax is None:
+        tmax = solve_tmax_knapsack(
+            goal=goal,
+            C=C_ALL,
+            attrs_by_goal=ATTRS_BY_GOAL,
+            risk_budget_by_goal=RISK_BUDGET_BY_GOAL,
+            hard_ban=HARD_BAN,
+        )
+        _disk_store(fp, goal, tmax)
+    _TMAX_CACHE[key] = list(tmax)
     return list(tmax)
 
+
+def t_max_mask(goal: str) -> int:
+    """T_max(goal) 的能力位图（与 t_max 共用同一指纹失效规则）"""
+    key = (template_fingerprint(), goal)
+    m = _TMAX_MASK_CACHE.get(key)
+    if m is None:
+        m = mask_of(t_max(goal))
+        _TMAX_MASK_CACHE[key] = m
+    return m
+
+
+def t_min_mask(goal: str) -> int:
+    return mask_of(T_MIN.get(goal, ()))
+
+
+def hard_ban_mask() -> int:
+    return mask_of(HARD_BAN)
+
+
+def t_max_curve(goal: str, max_budget: int | None = None) -> List[BudgetPoint]:
+    """
+    goal 的预算敏感性曲线：budget -> (count, utility, T_max)，一次 DP 求出。
+    max_budget 默认取 RISK_BUDGET_BY_GOAL 里的预算。
+    """
+    if max_budget is None:
+        max_budget = RISK_BUDGET_BY_GOAL.get(goal, 3)
+    return sweep_tmax_budgets(goal, C_ALL, ATTRS_BY_GOAL, max_budget, HARD_BAN)
+
+
+def t_max_curves(max_budget: int | None = None) -> Dict[str, List[BudgetPoint]]:
+    """ATTRS_BY_GOAL 里所有 goal 的预算曲线"""
+    return {g: t_max_curve(g, max_budget) for g in ATTRS_BY_GOAL}
@@ -0,0 +1,172 @@
+"""
+流式测试日志解析：边跑测试边解析，抽出所有失败用例（不需要整份日志在内存里）。
+
+支持：
+  - pytest 文本输出：short summary（"FAILED tests/x.py::test_a - ..."、"ERROR tests/x.py"）、
+    -v 逐条输出（"tests/x.py::test_a FAILED [ 50%]"）、xdist 前缀（"[gw0] FAILED ..."）；
+    只认行首的这些形式（captured log 里的 "ERROR    x.py:3 ..." 不算）
+  - JUnit XML（pytest --junitxml 等）：<testcase> 下有 <failure>/<error> 即为失败
+
+内存只和“单行长度上限 + 不同失败用例数”有关，与日志总长度无关：
+  - 文本按行解析，只保留未结束的半行（超长行截断）
+  - XML 用 XMLPullParser 增量解析，每个 testcase 处理完即从树上摘掉
+同一用例在日志里出现多次（-v 行 + summary 行）只报告一次。
+"""
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Set
+from xml.etree import ElementTree as ET
+
+# 单行最多保留的字符数（更长的行只看开头）
+MAX_LINE = 64 * 1024
+
+# 行首锚定（可带 xdist 的 "[gw0] " / "[ 50%] " 前缀），否则 captured log 里的
+# "ERROR    app.core:test_x.py:3 db down" 这类日志行也会被当成失败
+_PREFIX = r"^(?:\[gw\d+\]\s+)?(?:\[\s*\d+%\]\s+)?"
+_SUMMARY_RE = re.compile(_PREFIX + r"(FAILED|ERROR)\s+(\S+\.py)(?:::(.+?))?(?:\s+-\s|\s*$)")
+_VERBOSE_RE = re.compile(_PREFIX + r"(\S+\.py)::(\S+)\s+(FAILED|ERROR)\b")
+
+
+@dataclass(frozen=True, slots=True)
+class Failure:
+    path: str                    # 测试文件（相对仓库，如 "tests/test_auth.py"）
+    name: Optional[str] = None   # 用例名（可含类名/参数，如 "TestX::test_a[1]"）；收集错误时为 None
+    kind: str = "failed"         # failed / error
+
+    @property
+    def nodeid(self) -> str:
+        return f"{self.path}::{self.name}" if self.name else self.path
+
+
+class PytestLogParser:
+    def __init__(self) -> None:
+        self._buf = ""
+        self._seen: Set[str] = set()
+
+    def feed(self, chunk: str) -> List[Failure]:
+        """喂入一段输出（可以在任意位置截断），返回本段新发现的失败"""
+        data = self._buf + chunk
+        lines = data.split("\n")
+        self._buf = lines.pop()
+        if len(self._buf) > MAX_LINE:
+            self._buf = self._buf[:MAX_LINE]
+        out: List[Failure] = []
+        for line in lines:
+            self._parse_line(line[:MAX_LINE], out)
+        return out
+
+    def close(self) -> List[Failure]:
+        out: List[Failure] = []
+        if self._buf:
+            self._parse_line(self._buf, out)
+            self._buf = ""
+        return out
+
+    def _parse_line(self, line: str, out: List[Failure]) -> None:
+        if "FAILED" not in line and "ERROR" not in line:
+            return
+        m = _SUMMARY_RE.match(line)
+        if m:
+            kind, path, name = m.group(1), m.group(2), m.group(3)
+            # 只有路径没有用例名的只可能是收集错误（"ERROR tests/x.py - ..."）
+            if name is None and kind != "ERROR":
+                return
+        else:
+            m = _VERBOSE_RE.match(line)
+            if not m:
+                return
+            path, name, kind = m.group(1), m.group(2), m.group(3)
+        f = Failure(path=path.replace("\\", "/"), name=name, kind="error" if kind == "ERROR" else "failed")
+        if f.nodeid not in self._seen:
+            self._seen.add(f.nodeid)
+            out.append(f)
+
+
+def junit_path(classname: str, file_attr: Optional[str]) -> tuple[str, List[str]]:
+    """classname（如 "tests.test_auth.TestLogin"）-> (文件路径, 类名部分)"""
+    parts = [p for p in classname.split(".") if p]
+    classes: List[str] = []
+    while parts and parts[-1][:1].isupper():
+        classes.insert(0, parts.pop())
+    if file_attr:
+        return file_attr.replace("\\", "/"), classes
+    return "/".join(parts) + ".py", classes
+
+
+class JUnitXMLParser:
+    def __init__(self) -> None:
+        self._pp = ET.XMLPullParser(events=("start", "end"))
+        self._stack: List[ET.Element] = []
+        self._seen: Set[str] = set()
+
+    def feed(self, chunk: str) -> List[Failure]:
+        self._pp.feed(chunk)
+        return self._drain()
+
+    def close(self) -> List[Failure]:
+        try:
+            self._pp.close()
+        except ET.ParseError:
+            pass
+        return self._drain()
+
+    def _drain(self) -> List[Failure]:
+        out: List[Failure] = []
+        for event, elem in self._pp.read_events():
+            if event == "start":
+                self._stack.append(elem)
+                continue
+            self._stack.pop()
+            if elem.tag != "testcase":
+                continue
+            bad = next((c for c in elem if c.tag in ("failure", "error")), None)
+            if bad is not None:
+                path, classes = junit_path(elem.get("classname", ""), elem.get("file"))
+                name = "::".join(classes + [elem.get("name", "")])
+                f = Failure(path=path, name=name or None, kind="error" if bad.tag == "error" else "failed")
+                if f.nodeid not in self._seen:
+                    self._seen.add(f.nodeid)
+                    out.append(f)
+            # 处理完就从父节点摘掉，树不随用例数增长
+            if self._stack:
+                self._stack[-1].remove(elem)
+            elem.clear()
+        return out
+
+
+class TestLogParser:
+    """按开头内容自动选择格式（XML 或 pytest 文本）"""
+
+    __test__ = False  # 不是 pytest 用例
+
+    def __init__(self, fmt: Optional[str] = None) -> None:
+        self._inner: Optional[PytestLogParser | JUnitXMLParser] = None
+        self._head = ""
+        if fmt == "junit":
+            self._inner = JUnitXMLParser()
+        elif fmt == "pytest":
+            self._inner = PytestLogParser()
+
+    def feed(self, chunk: str) -> List[Failure]:
+        if self._inner is None:
+            self._head += chunk
+            s = self._head.lstrip()
+            if not s:
+                return []
+            self._inner = JUnitXMLParser() if s.startswith("<") else PytestLogParser()
+            chunk, self._head = self._head, ""
+        return self._inner.feed(chunk)
+
+    def close(self) -> List[Failure]:
+        if self._inner is None:
+            return []
+        return self._inner.close()
+
+
+def parse_failures(chunks: Iterable[str], fmt: Optional[str] = None) -> Iterator[Failure]:
+    """对一串输出块（如逐行读取的子进程 stdout）流式产出失败用例"""
+    p = TestLogParser(fmt)
+    for chunk in chunks:
+        yield from p.feed(chunk)
+    yield from p.close()
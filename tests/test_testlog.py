@@ -0,0 +1,41 @@
+from src.safe_boundary.graph import RequirementGraph
+from src.safe_boundary.testlog import Failure, parse_failures
+
+LOG = """\
+============================= test session starts ==============================
+tests/test_x.py::test_a FAILED                                           [ 50%]
+tests/test_x.py::test_b PASSED                                           [100%]
+=================================== FAILURES ===================================
+___________________________________ test_a _____________________________________
+------------------------------ Captured log call -------------------------------
+ERROR    app.core:test_x.py:3 db down
+WARNING  app.core:helpers.py:10 retrying
+=========================== short test summary info ============================
+FAILED tests/test_x.py::test_a - AssertionError: db down
+ERROR tests/test_broken.py - ModuleNotFoundError: No module named 'nope'
+[gw1] [ 50%] FAILED tests/test_y.py::test_c[a b]
+========================= 2 failed, 1 error in 0.12s ==========================
+"""
+
+
+def test_captured_log_lines_are_not_failures():
+    assert list(parse_failures([LOG], "pytest")) == [
+        Failure("tests/test_x.py", "test_a"),
+        Failure("tests/test_broken.py", None, "error"),
+        Failure("tests/test_y.py", "test_c[a b]"),
+    ]
+
+
+def test_chunk_boundaries_do_not_matter():
+    chunks = [LOG[i:i + 7] for i in range(0, len(LOG), 7)]
+    assert list(parse_failures(chunks)) == list(parse_failures([LOG]))
+
+
+def test_anchors_come_from_real_failures():
+    g = RequirementGraph()
+    g.on_user_instruction("r1", "fix_failing_test", {"no-network"}, {})
+    g.on_run_tests("r1", ok=False, stdout=LOG)
+    anchors = g.nodes["r1"].anchors
+    assert anchors["path"] == "tests/test_x.py"
+    assert anchors["test"] == "tests/test_x.py::test_a"
+    assert not any(":" in v.split("::")[0] for v in anchors.values())